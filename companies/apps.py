@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CompaniesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'companies'
+
+    def ready(self):
+        # Dashboard totals and the report data version follow invoice, bank account and cash ledger writes
+        from .summary import connect_signals
+        connect_signals()
@@ -0,0 +1,129 @@
+"""
+The dashboard parts that are not running totals (those come from
+CompanySummary): per-party balances, due purchase invoices and the sales /
+purchase trend. Each is a single query on Invoice, using conditional
+aggregation (Sum/Count with filter=Q(...)) instead of one trip per figure.
+
+The trend is bucketed by day in the database (local dates) over the longest
+window, then rolled up into weeks and months here, so the three series cost
+one grouped query of at most a year of rows per company.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from invoice.models import Invoice
+from .summary import invoice_type_ids
+
+
+TREND_DAYS = 30
+TREND_WEEKS = 12
+TREND_MONTHS = 12
+
+
+def live_invoices(company_id):
+    return Invoice.objects.filter(company_id=company_id, is_deleted=False)
+
+
+#! parties and invoices
+def party_balances(company_id):
+    """(advance_customers, payable_parties) from one query grouped by party."""
+    sales = Q(invoice_type_id__in=invoice_type_ids("sales"))
+    purchase = Q(invoice_type_id__in=invoice_type_ids("purchase"))
+    rows = (
+        live_invoices(company_id)
+        .filter(sales | purchase)
+        .values("party_id", "party__name")
+        .annotate(
+            total_advance=Sum(F("amount_paid") - F("total"), filter=sales & Q(amount_paid__gt=F("total")), output_field=FloatField()),
+            total_due=Sum(F("total") - F("amount_paid"), filter=purchase, output_field=FloatField()),
+        )
+        .filter(Q(total_advance__gt=0) | Q(total_due__gt=0))
+        .order_by("party_id")
+    )
+    advance_customers, payable_parties = [], []
+    for row in rows:
+        party = {"party_id": row["party_id"], "party__name": row["party__name"]}
+        if row["total_advance"]:
+            advance_customers.append({**party, "total_advance": row["total_advance"]})
+        if row["total_due"] is not None and row["total_due"] > 0:
+            payable_parties.append({**party, "total_due": row["total_due"]})
+    return advance_customers, payable_parties
+
+
+def payable_invoices(company_id):
+    return list(
+        live_invoices(company_id)
+        .filter(invoice_type_id__in=invoice_type_ids("purchase"))
+        .annotate(due_amount=F("total") - F("amount_paid"))
+        .filter(due_amount__gt=0)
+        .values("id", "invoice_number", "party__name", "total", "amount_paid", "due_amount", "created_at")
+    )
+
+
+#! trend
+def trend_windows(today):
+    """First day of the daily, weekly (Monday) and monthly windows ending today."""
+    month_index = today.year * 12 + today.month - 1 - (TREND_MONTHS - 1)
+    return {
+        "daily": today - timedelta(days=TREND_DAYS - 1),
+        "weekly": today - timedelta(days=today.weekday() + 7 * (TREND_WEEKS - 1)),
+        "monthly": today.replace(year=month_index // 12, month=month_index % 12 + 1, day=1),
+    }
+
+
+def daily_totals(company_id, start):
+    """{local date: {sales, sales_amount, purchases, purchase_amount}} from `start` on, in one query."""
+    sales = Q(invoice_type_id__in=invoice_type_ids("sales"))
+    purchase = Q(invoice_type_id__in=invoice_type_ids("purchase"))
+    rows = (
+        live_invoices(company_id)
+        .filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+        .annotate(day=TruncDate("created_at"))
+        .values("day")
+        .annotate(
+            sales=Count("pk", filter=sales),
+            sales_amount=Sum("total", filter=sales),
+            purchases=Count("pk", filter=purchase),
+            purchase_amount=Sum("total", filter=purchase),
+        )
+        .order_by("day")
+    )
+    return {row.pop("day"): row for row in rows}
+
+
+def period_of(day, granularity):
+    if granularity == "weekly":
+        return day - timedelta(days=day.weekday())
+    if granularity == "monthly":
+        return day.replace(day=1)
+    return day
+
+
+def sales_purchase_trend(company_id, today=None):
+    """Zero-filled daily, weekly and monthly series, oldest first."""
+    today = today or timezone.localdate()
+    windows = trend_windows(today)
+    days = daily_totals(company_id, min(windows.values()))
+
+    trend = {}
+    for granularity, start in windows.items():
+        buckets, day = {}, start
+        while day <= today:
+            buckets.setdefault(period_of(day, granularity), {
+                "sales": 0, "sales_amount": 0.0, "purchases": 0, "purchase_amount": 0.0,
+            })
+            day += timedelta(days=1)
+        for day, totals in days.items():
+            # Rows dated after today (clock or timezone skew) have no bucket: left out
+            if start <= day <= today:
+                bucket = buckets[period_of(day, granularity)]
+                for field, value in totals.items():
+                    bucket[field] += value or 0
+        trend[granularity] = [
+            {"period": period.isoformat(), **{field: round(value, 2) for field, value in bucket.items()}}
+            for period, bucket in buckets.items()
+        ]
+    return trend
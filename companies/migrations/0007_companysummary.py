@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0006_company_owner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('purchase_count', models.PositiveIntegerField(default=0)),
+                ('sales_day', models.DateField(blank=True, null=True)),
+                ('sales_today', models.PositiveIntegerField(default=0)),
+                ('total_received', models.FloatField(default=0.0)),
+                ('total_paid', models.FloatField(default=0.0)),
+                ('sales_due', models.FloatField(default=0.0)),
+                ('purchase_due', models.FloatField(default=0.0)),
+                ('cash_balance', models.FloatField(default=0.0)),
+                ('bank_balance', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='companies.company')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0007_companysummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companysummary',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0008_companysummary_data_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='companysummary',
+            name='purchase_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='companysummary',
+            name='sales_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='companysummary',
+            name='sales_today',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from customer.models import Customer
 from django.db.models import Q
@@ -24,8 +24,50 @@ class Company(models.Model):
   
     def __str__(self):
         return self.name
-    
 
 
+class SummarizedSaveMixin:
+    """
+    Saves in a transaction, so companies/summary.py can lock the stored row in
+    pre_save and move the totals in post_save before another write gets in.
+    """
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class CompanySummary(models.Model):
+    """
+    Dashboard totals of one company, kept up to date by companies/summary.py
+    in the same transaction as the invoice, payment and transfer writes.
+    Soft-deleted invoices, bank accounts and cash ledgers are left out.
+    """
+    company = models.OneToOneField(Company, on_delete=models.CASCADE, related_name='summary')
+
+    # Signed: moved by +/- deltas, so a drifted row goes negative instead of failing the
+    # invoice save on a CHECK constraint (rebuild_dashboard_summary repairs it)
+    sales_count = models.IntegerField(default=0)
+    purchase_count = models.IntegerField(default=0)
+    # Sales invoices created on sales_day (local date); stale once the day is over
+    sales_day = models.DateField(null=True, blank=True)
+    sales_today = models.IntegerField(default=0)
+
+    total_received = models.FloatField(default=0.0)
+    total_paid = models.FloatField(default=0.0)
+    # Sum of (total - amount_paid): positive is receivable/payable, negative is advance
+    sales_due = models.FloatField(default=0.0)
+    purchase_due = models.FloatField(default=0.0)
+
+    cash_balance = models.FloatField(default=0.0)
+    bank_balance = models.FloatField(default=0.0)
+
+    # Moves on every write to the rows the reports read; cached report files are keyed on it
+    data_version = models.PositiveBigIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary of {self.company_id}"
 
-    
@@ -0,0 +1,244 @@
+"""
+Per-company dashboard totals (CompanySummary), maintained incrementally.
+
+Every saved or deleted invoice, bank account and cash ledger moves the totals
+by the difference between what the row contributed before and after the
+write, applied in post_save with one UPDATE ... SET x = x + delta, inside
+the same transaction as the write (SummarizedSaveMixin). The "before" is the
+stored row, read with select_for_update() in pre_save / pre_delete, not the
+values the instance was loaded with: two writes from stale instances would
+otherwise both apply their deltas. An update_fields save that leaves the
+summarized columns alone reads nothing. Paths that
+skip signals (bulk_create, queryset.update) call record_created() or
+rebuild_summary() themselves; a company without a row gets one rebuilt from
+scratch on first use.
+
+The same writes, and those to companies, parties and bank transactions (which
+only show up in reports), move data_version by one; payments/exports.py keys its
+cached report files on it.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Subquery, Sum, Value, When
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.utils import timezone
+
+from invoice.models import BankAccount, Invoice, InvoiceType
+from invoice.reference import reference_rows
+from parties.models import Party
+from payments.models import BankTransaction, CashLedger
+from .models import Company, CompanySummary
+
+
+def invoice_type_ids(code):
+    return [t.id for t in reference_rows(InvoiceType) if t.code.lower() == code]
+
+
+def invoice_kind(invoice_type_id):
+    for t in reference_rows(InvoiceType):
+        if t.id == invoice_type_id:
+            return t.code.lower()
+    return None
+
+
+#! contributions: what one stored row adds to its company's totals
+def invoice_contribution(row, today):
+    if row["is_deleted"]:
+        return {}
+    kind = invoice_kind(row["invoice_type_id"])
+    paid = row["amount_paid"] or 0.0
+    due = (row["total"] or 0.0) - paid
+    if kind == "sales":
+        created_today = row["created_at"] is not None and timezone.localdate(row["created_at"]) == today
+        return {"sales_count": 1, "sales_today": int(created_today), "total_received": paid, "sales_due": due}
+    if kind == "purchase":
+        return {"purchase_count": 1, "total_paid": paid, "purchase_due": due}
+    return {}
+
+
+def bank_account_contribution(row, today):
+    return {} if row["deleted"] else {"bank_balance": row["current_balance"] or 0.0}
+
+
+def cash_ledger_contribution(row, today):
+    return {} if row["deleted"] else {"cash_balance": row["current_balance"] or 0.0}
+
+
+# model -> (company field, fields read, contribution)
+SOURCES = {
+    Invoice: ("company_id", ("invoice_type_id", "is_deleted", "total", "amount_paid", "created_at"), invoice_contribution),
+    BankAccount: ("company_id", ("deleted", "current_balance"), bank_account_contribution),
+    CashLedger: ("company_name_id", ("deleted", "current_balance"), cash_ledger_contribution),
+}
+
+# Rows that only feed the reports: model -> the company of an instance (an id or a subquery)
+VERSIONED = {
+    Company: lambda company: company.pk,
+    Party: lambda party: party.company_id,
+    BankTransaction: lambda txn: Subquery(
+        BankAccount._base_manager.filter(pk=txn.bank_account_id).values("company_id")
+    ),
+}
+
+
+def row_of(instance):
+    company_field, fields, _ = SOURCES[type(instance)]
+    return {field: getattr(instance, field) for field in (company_field,) + fields}
+
+
+def stored_row(instance):
+    """The row as stored, locked until the write's transaction ends."""
+    company_field, fields, _ = SOURCES[type(instance)]
+    return (
+        type(instance)._base_manager.select_for_update()
+        .filter(pk=instance.pk).values(company_field, *fields).first()
+    )
+
+
+def touches_summary(model, update_fields):
+    """Whether a save limited to `update_fields` (names or attnames) can move the totals."""
+    company_field, fields, _ = SOURCES[model]
+    summarized = set()
+    for attname in (company_field,) + fields:
+        summarized.update((attname, attname.removesuffix("_id")))
+    return not summarized.isdisjoint(update_fields)
+
+
+def delta_between(model, before, after):
+    """{company_id: {field: delta}} for a row going from `before` to `after` (None = absent)."""
+    company_field, _, contribution = SOURCES[model]
+    today = timezone.localdate()
+    deltas = {}
+    for row, sign in ((before, -1), (after, 1)):
+        if row is None or row[company_field] is None:
+            continue
+        delta = deltas.setdefault(row[company_field], {})
+        for field, value in contribution(row, today).items():
+            delta[field] = delta.get(field, 0) + sign * value
+    return deltas
+
+
+#! writes
+UNCHANGED = object()
+
+
+def apply_delta(company_id, delta):
+    """Moves the totals by `delta` and the data version by one (also for an empty delta)."""
+    delta = {field: value for field, value in delta.items() if value}
+    updates = {field: F(field) + value for field, value in delta.items() if field != "sales_today"}
+    if "sales_today" in delta:
+        today = timezone.localdate()
+        updates["sales_today"] = Case(
+            When(sales_day=today, then=F("sales_today") + delta["sales_today"]),
+            default=Value(max(delta["sales_today"], 0)),
+        )
+        updates["sales_day"] = Value(today)
+    updates["data_version"] = F("data_version") + 1
+    if not CompanySummary.objects.filter(company_id=company_id).update(updated_at=timezone.now(), **updates):
+        # No row yet: the fresh totals already include this write
+        rebuild_summary(company_id)
+
+
+def record_created(model, objs):
+    """For rows added through bulk_create."""
+    totals = {}
+    for obj in objs:
+        for company_id, delta in delta_between(model, None, row_of(obj)).items():
+            merged = totals.setdefault(company_id, {})
+            for field, value in delta.items():
+                merged[field] = merged.get(field, 0) + value
+    for company_id, delta in totals.items():
+        apply_delta(company_id, delta)
+
+
+def on_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if instance._state.adding or instance.pk is None:
+        instance._summary_before = None
+    elif update_fields is not None and not touches_summary(sender, update_fields):
+        # Nothing summarized is written: no delta, and no need to know the old row
+        instance._summary_before = UNCHANGED
+    else:
+        instance._summary_before = stored_row(instance)
+
+
+def on_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before = instance.__dict__.pop("_summary_before", None)
+    after = row_of(instance)
+    if before is UNCHANGED:
+        before = after
+    for company_id, delta in delta_between(sender, before, after).items():
+        apply_delta(company_id, delta)
+
+
+def on_pre_delete(sender, instance, **kwargs):
+    # delete() runs its signals inside the collector's transaction
+    instance._summary_before = stored_row(instance)
+
+
+def on_post_delete(sender, instance, **kwargs):
+    before = instance.__dict__.pop("_summary_before", None)
+    for company_id, delta in delta_between(sender, before, None).items():
+        apply_delta(company_id, delta)
+
+
+def bump_data_version(company_id):
+    CompanySummary.objects.filter(company_id=company_id).update(data_version=F("data_version") + 1)
+
+
+def on_versioned_write(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_data_version(VERSIONED[sender](instance))
+
+
+def connect_signals():
+    for model in SOURCES:
+        pre_save.connect(on_pre_save, sender=model, dispatch_uid=f"summary-pre-save-{model.__name__}")
+        post_save.connect(on_post_save, sender=model, dispatch_uid=f"summary-save-{model.__name__}")
+        pre_delete.connect(on_pre_delete, sender=model, dispatch_uid=f"summary-pre-delete-{model.__name__}")
+        post_delete.connect(on_post_delete, sender=model, dispatch_uid=f"summary-delete-{model.__name__}")
+    for model in VERSIONED:
+        post_save.connect(on_versioned_write, sender=model, dispatch_uid=f"summary-version-save-{model.__name__}")
+        post_delete.connect(on_versioned_write, sender=model, dispatch_uid=f"summary-version-delete-{model.__name__}")
+
+
+#! from scratch
+def compute_summary(company_id):
+    """The totals straight from the tables: one aggregate query per table."""
+    sales = Q(invoice_type_id__in=invoice_type_ids("sales"))
+    purchase = Q(invoice_type_id__in=invoice_type_ids("purchase"))
+    today = timezone.localdate()
+    due = F("total") - F("amount_paid")
+
+    invoices = Invoice.objects.filter(company_id=company_id, is_deleted=False).aggregate(
+        sales_count=Count("pk", filter=sales),
+        purchase_count=Count("pk", filter=purchase),
+        sales_today=Count("pk", filter=sales & Q(created_at__date=today)),
+        total_received=Sum("amount_paid", filter=sales),
+        total_paid=Sum("amount_paid", filter=purchase),
+        sales_due=Sum(due, filter=sales, output_field=FloatField()),
+        purchase_due=Sum(due, filter=purchase, output_field=FloatField()),
+    )
+    bank = BankAccount.objects.filter(company_id=company_id, deleted=False).aggregate(total=Sum("current_balance"))
+    cash = CashLedger.objects.filter(company_name_id=company_id, deleted=False).aggregate(total=Sum("current_balance"))
+
+    totals = {field: value or 0 for field, value in invoices.items()}
+    totals.update(sales_day=today, bank_balance=bank["total"] or 0.0, cash_balance=cash["total"] or 0.0)
+    return totals
+
+
+def rebuild_summary(company_id):
+    with transaction.atomic():
+        summary, _ = CompanySummary.objects.update_or_create(company_id=company_id, defaults=compute_summary(company_id))
+        # Whatever made the rebuild necessary may have changed report data too
+        bump_data_version(company_id)
+    summary.refresh_from_db(fields=["data_version"])
+    return summary
+
+
+def company_summary(company_id):
+    summary = CompanySummary.objects.filter(company_id=company_id).first()
+    return summary or rebuild_summary(company_id)
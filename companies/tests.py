@@ -1,3 +1,206 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from companies.models import CompanySummary
+from companies.summary import compute_summary
+from company.testing import company_client, create_invoice_fixture
+from invoice.models import BankAccount, Invoice, PaymentType
+from items.models import Item, UnitType
+from parties.models import Party
+
+
+class DashboardSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+        unit = UnitType.objects.get(code="pcs")
+        cls.item = Item.objects.create(
+            name="Widget", code="W1", quantity=100, unit=unit, price=10.0, sales_price=20.0,
+            tax_percent=0.0, company=cls.company,
+        )
+        cls.banks = [
+            BankAccount.objects.create(bank_name=name, company=cls.company, current_balance=1000.0)
+            for name in ("HDFC", "SBI")
+        ]
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def assertSummaryCurrent(self):
+        stored = CompanySummary.objects.get(company=self.company)
+        for field, value in compute_summary(self.company.id).items():
+            self.assertAlmostEqual(getattr(stored, field), value, places=6, msg=field)
+
+    def stats(self):
+        return self.client.get("/company/dashboard/").data["stats"]
+
+    def test_dashboard_reads_the_summary_row(self):
+        self.stats()  # builds the row
+        with CaptureQueriesContext(connection) as queries:
+            stats = self.stats()
+        self.assertEqual(stats["total_sales"], 3)
+        self.assertEqual(stats["today_sales"], 3)
+        self.assertEqual(stats["receivables"], 300.0)
+        self.assertEqual(stats["bank_balance"], 2000.0)
+        sums = [q for q in queries if "SUM(" in q["sql"] and "total_advance" not in q["sql"] and "total_due" not in q["sql"]]
+        self.assertEqual(sums, [])
+
+    def test_writes_keep_the_summary_current(self):
+        self.stats()
+
+        self.client.post("/invoice/create/", {
+            "company": self.company.id, "party": self.party.id, "invoice_type": self.purchase.id,
+            "amount_paid": 50.0, "payment_type": PaymentType.objects.get(name__iexact="bank").id,
+            "bank_account": self.banks[0].id, "items": [{"item": self.item.id, "quantity": 10}],
+        }, format="json")
+        self.assertSummaryCurrent()
+
+        Invoice.objects.filter(pk=self.invoices[0].pk).update(remaining_balance=100.0)
+        response = self.client.post("/payments/payment-in/", {
+            "company": self.company.id, "invoice": self.invoices[0].id, "amount": 40.0, "bank_account": self.banks[1].id,
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertSummaryCurrent()
+
+        self.client.post("/payments/bank-transfer/", {
+            "company": self.company.id, "from_account": self.banks[0].id, "to_account": self.banks[1].id, "amount": 25.0,
+        }, format="json")
+        self.client.post("/payments/cash-ledger/create/", {
+            "company_name": self.company.id, "ledger_name": "Cash in hand", "opening_balance": 500.0,
+        }, format="json")
+        self.client.delete(f"/invoice/{self.invoices[1].id}/delete/")
+        self.assertSummaryCurrent()
+
+        stats = self.stats()
+        self.assertEqual(stats["total_sales"], 2)
+        self.assertEqual(stats["total_purchases"], 1)
+        self.assertEqual(stats["total_received"], 40.0)
+        self.assertEqual(stats["receivables"], 160.0)
+        self.assertEqual(stats["cash_balance"], 500.0)
+
+        # Hard deletes and bulk imports
+        self.invoices[2].delete()
+        record = {"party": self.party.id, "invoice_type": "sales", "items": [{"item": self.item.id, "quantity": 1}]}
+        response = self.client.post("/invoice/import/", json.dumps(record), content_type="application/x-ndjson")
+        self.assertEqual(response.data["created"], 1)
+        self.assertSummaryCurrent()
+
+    def test_rebuild_command(self):
+        self.stats()
+        CompanySummary.objects.filter(company=self.company).update(sales_count=99, bank_balance=0.0)
+        out = StringIO()
+        call_command("rebuild_dashboard_summary", company=[self.company.id], stdout=out)
+        self.assertIn("1 company summaries rebuilt", out.getvalue())
+        self.assertSummaryCurrent()
+        self.assertEqual(self.stats()["total_sales"], 3)
+
+    def test_stale_instances_do_not_count_twice(self):
+        self.stats()
+        # Two payment requests that both loaded the invoice unpaid
+        first = Invoice.objects.get(pk=self.invoices[0].pk)
+        second = Invoice.objects.get(pk=self.invoices[0].pk)
+        first.amount_paid = 50.0
+        first.save()
+        second.amount_paid = 30.0
+        second.save()
+        self.assertSummaryCurrent()
+        self.assertEqual(CompanySummary.objects.get(company=self.company).total_received, 30.0)
+
+        stale = Invoice.objects.get(pk=self.invoices[1].pk)
+        fresh = Invoice.objects.get(pk=self.invoices[1].pk)
+        fresh.amount_paid = 40.0
+        fresh.save()
+        stale.delete()
+        self.assertSummaryCurrent()
+
+    def test_saves_that_skip_summarized_columns_do_not_read_the_row(self):
+        self.stats()
+        invoice = Invoice.objects.get(pk=self.invoices[0].pk)
+        invoice.notes = "checked"
+        with CaptureQueriesContext(connection) as queries:
+            invoice.save(update_fields=["notes"])
+        self.assertEqual([q["sql"] for q in queries if q["sql"].startswith("SELECT")], [])
+        self.assertSummaryCurrent()
+
+    def test_drifted_counters_do_not_block_writes(self):
+        self.stats()
+        CompanySummary.objects.filter(company=self.company).update(sales_count=0, sales_today=0)
+        response = self.client.delete(f"/invoice/{self.invoices[0].id}/delete/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CompanySummary.objects.get(company=self.company).sales_count, -1)
+
+        call_command("rebuild_dashboard_summary", company=[self.company.id], stdout=StringIO())
+        self.assertSummaryCurrent()
+
+
+class DashboardTrendTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def stats(self):
+        return self.client.get("/company/dashboard/").data["stats"]
+
+    def test_one_query_per_figure_group_and_cache(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.stats()
+        # party balances, payable invoices and the trend; the totals come from the summary row
+        invoice_queries = [q for q in queries if 'FROM "invoice_invoice"' in q["sql"] and "companies_companysummary" not in q["sql"]]
+        self.assertEqual(len([q for q in invoice_queries if "GROUP BY" in q["sql"]]), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.stats()
+        self.assertFalse([q for q in queries if 'FROM "invoice_invoice"' in q["sql"]])
+
+        # A write that moves the totals is visible at once
+        Invoice.objects.create(
+            company=self.company, party=self.party, created_by=self.owner_user,
+            invoice_number="INV-9", invoice_type=self.sales, total=50.0,
+        )
+        self.assertEqual(self.stats()["total_sales"], 4)
+
+    def test_party_balances(self):
+        Invoice.objects.filter(pk=self.invoices[0].pk).update(amount_paid=130.0)
+        supplier = Party.objects.create(name="Supplier", company=self.company)
+        Invoice.objects.create(
+            company=self.company, party=supplier, created_by=self.owner_user,
+            invoice_number="P-1", invoice_type=self.purchase, total=80.0, amount_paid=30.0,
+        )
+        stats = self.stats()
+        self.assertEqual(stats["advance_customers"], [{"party_id": self.party.id, "party__name": "Buyer", "total_advance": 30.0}])
+        self.assertEqual(stats["payable_parties"], [{"party_id": supplier.id, "party__name": "Supplier", "total_due": 50.0}])
+        self.assertEqual([row["invoice_number"] for row in stats["payable_invoices"]], ["P-1"])
+
+    def test_daily_weekly_monthly_series(self):
+        old = Invoice.objects.create(
+            company=self.company, party=self.party, created_by=self.owner_user,
+            invoice_number="P-OLD", invoice_type=self.purchase, total=70.0,
+        )
+        Invoice.objects.filter(pk=old.pk).update(created_at=timezone.now() - timezone.timedelta(days=40))
+
+        trend = self.stats()["chart_data"]["sales_trend"]
+        self.assertEqual([len(trend[key]) for key in ("daily", "weekly", "monthly")], [30, 12, 12])
+        today = timezone.localdate().isoformat()
+        self.assertEqual(trend["daily"][-1], {"period": today, "sales": 3, "sales_amount": 300.0, "purchases": 0, "purchase_amount": 0.0})
+        self.assertEqual(sum(bucket["purchases"] for bucket in trend["daily"]), 0)
+        self.assertEqual(sum(bucket["purchase_amount"] for bucket in trend["weekly"]), 70.0)
+        self.assertEqual(sum(bucket["sales"] for bucket in trend["monthly"]), 3)
+        self.assertEqual(trend["monthly"][-1]["period"], timezone.localdate().replace(day=1).isoformat())
 
-# Create your tests here.
+    def test_rows_dated_after_today_are_left_out(self):
+        Invoice.objects.filter(pk=self.invoices[0].pk).update(created_at=timezone.now() + timezone.timedelta(days=2))
+        response = self.client.get("/company/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        trend = response.data["stats"]["chart_data"]["sales_trend"]
+        self.assertEqual(sum(bucket["sales"] for bucket in trend["daily"]), 2)
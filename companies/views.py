@@ -4,7 +4,6 @@ from .serializers import *
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Count, Q,F,FloatField
 
 from companies.models import *
 from customer.models import *
@@ -18,6 +17,11 @@ from staff.models import *
 from invoice.models import *
 from payments.models import *
 from items.models import *
+from staff.tokens import bump_user_auth_version
+from .summary import company_summary
+from .dashboard import party_balances, payable_invoices, sales_purchase_trend
+from django.conf import settings
+from django.core.cache import cache
 
 
 class IsCustomer(BasePermission):
@@ -64,6 +68,7 @@ class CreateCompanyView(APIView):
             user=request.user,
             owner=customer,
         )
+        bump_user_auth_version(request.user.id)
 
         # Assign default roles and permissions
         # from staff.constant import DEFAULT_ROLES
@@ -116,6 +121,8 @@ class CompanyListView(APIView):
 
 class CompanyDetailView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned]
+    # pk is the company itself
+    company_lookup = (Company, "id")
    
 
     def get(self, request, pk):
@@ -130,6 +137,8 @@ class CompanyDetailView(APIView):
 
 class CompanyUpdateView(APIView):
     permission_classes =[IsAuthenticated, IsCompanyAdminOrAssigned]
+    # pk is the company itself
+    company_lookup = (Company, "id")
   
 
     def put(self, request, pk):
@@ -148,6 +157,8 @@ class CompanyUpdateView(APIView):
 
 class CompanyDeleteView(APIView):
     permission_classes =[IsAuthenticated, IsCompanyAdminOrAssigned]
+    # pk is the company itself
+    company_lookup = (Company, "id")
    
     def delete(self, request, pk):
         customer = get_customer(request.user)
@@ -158,6 +169,7 @@ class CompanyDeleteView(APIView):
 
         company.is_active = False
         company.save()
+        bump_user_auth_version(customer.user_id)
         return Response({'msg': 'Company soft deleted successfully'}, status=204)
 
 
@@ -185,6 +197,12 @@ class SelectCompanyView(APIView):
 #! DASHBOARD
 
 class DashboardStatsView(APIView):
+    """
+    Totals from the company's summary row, party balances, due purchases and
+    the sales/purchase trend. The whole payload is cached per company for
+    DASHBOARD_CACHE_TTL seconds, keyed on the summary row's last update so
+    that totals never lag behind a write.
+    """
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned]
 
     def get(self, request):
@@ -192,27 +210,27 @@ class DashboardStatsView(APIView):
         if not company_id:
             return Response({"error": "Invalid company"}, status=400)
 
-        today = timezone.now().date()
-
-        # Invoice Stats
-        total_sales = Invoice.objects.filter(company_id=company_id, invoice_type=1, is_deleted=False).count()
-        total_purchases = Invoice.objects.filter(company_id=company_id, invoice_type=2, is_deleted=False).count()
-        today_sales = Invoice.objects.filter(company_id=company_id, invoice_type=1, created_at__date=today, is_deleted=False).count()
-
-        # Amounts
-        total_received = Invoice.objects.filter(company_id=company_id, invoice_type=1).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-
-        total_paid = Invoice.objects.filter(company_id=company_id, invoice_type=2).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
+        summary = company_summary(company_id)
+        today = timezone.localdate()
+        cache_key = f"dashboard:{summary.company_id}:{today.isoformat()}:{summary.updated_at.timestamp()}"
+        stats = cache.get(cache_key)
+        if stats is None:
+            stats = self.build_stats(summary, today)
+            cache.set(cache_key, stats, timeout=settings.DASHBOARD_CACHE_TTL)
+        return Response({"stats": stats})
+
+    def build_stats(self, summary, today):
+        company_id = summary.company_id
+
+        # Counts, totals and balances: one row, kept current by the writes
+        total_sales = summary.sales_count
+        total_purchases = summary.purchase_count
+        today_sales = summary.sales_today if summary.sales_day == today else 0
+        total_received = round(summary.total_received, 2)
+        total_paid = round(summary.total_paid, 2)
 
         # Receivables & Advances from customers
-        receivable_agg = Invoice.objects.filter(company_id=company_id, invoice_type=1).aggregate(
-            due=Sum(F('total') - F('amount_paid'), output_field=FloatField())
-        )
-        receivable_due = receivable_agg['due'] or 0
+        receivable_due = round(summary.sales_due, 2)
         if receivable_due >= 0:
             receivables = receivable_due
             advance_from_customers = 0
@@ -220,19 +238,8 @@ class DashboardStatsView(APIView):
             receivables = 0
             advance_from_customers = abs(receivable_due)
 
-        advance_customers = (
-            Invoice.objects.filter(company_id=company_id, invoice_type=1, is_deleted=False)
-            .annotate(extra_paid=F('amount_paid') - F('total'))
-            .filter(extra_paid__gt=0)
-            .values('party_id', 'party__name')
-            .annotate(total_advance=Sum('extra_paid'))
-        )
-
         # Payables & Advances to suppliers
-        payable_agg = Invoice.objects.filter(company_id=company_id, invoice_type=2).aggregate(
-            due=Sum(F('total') - F('amount_paid'), output_field=FloatField())
-        )
-        payable_due = payable_agg['due'] or 0
+        payable_due = round(summary.purchase_due, 2)
         if payable_due >= 0:
             payables = payable_due
             advance_to_suppliers = 0
@@ -241,39 +248,12 @@ class DashboardStatsView(APIView):
             advance_to_suppliers = abs(payable_due)
 
         # Cash & Bank
-        cash_balance = CashLedger.objects.filter(company_name_id=company_id).aggregate(
-            balance=Sum('current_balance')
-        )['balance'] or 0
-
-        bank_balance = BankAccount.objects.filter(company_id=company_id).aggregate(
-            balance=Sum('current_balance')
-        )['balance'] or 0
-
-        # Party-wise payables
-        payable_parties = (
-            Invoice.objects.filter(company_id=company_id, invoice_type=2, is_deleted=False)
-            .values('party_id', 'party__name')
-            .annotate(
-                total_due=Sum(F('total') - F('amount_paid'), output_field=FloatField())
-            )
-            .filter(total_due__gt=0)
-        )
+        cash_balance = round(summary.cash_balance, 2)
+        bank_balance = round(summary.bank_balance, 2)
 
-        # Invoice-wise payables
-        payable_invoices = (
-            Invoice.objects.filter(company_id=company_id, invoice_type=2, is_deleted=False)
-            .annotate(due_amount=F('total') - F('amount_paid'))
-            .filter(due_amount__gt=0)
-            .values(
-                'id',
-                'invoice_number',  # Ensure this field exists; otherwise, replace with 'id'
-                'party__name',
-                'total',
-                'amount_paid',
-                'due_amount',
-                'created_at',
-            )
-        )
+        # Party-wise advances and payables (one grouped query), invoice-wise payables
+        advance_customers, payable_parties = party_balances(company_id)
+        due_invoices = payable_invoices(company_id)
 
         # Chart-ready data for graphs
         chart_data = {
@@ -295,24 +275,24 @@ class DashboardStatsView(APIView):
                 {"name": "Cash Balance", "value": round(float(cash_balance), 2), "fill": "#27ae60"},
                 {"name": "Bank Balance", "value": round(float(bank_balance), 2), "fill": "#34495e"},
             ],
+            # Daily (30 days), weekly (12 weeks) and monthly (12 months) series
+            "sales_trend": sales_purchase_trend(company_id, today),
         }
 
-        return Response({
-            "stats": {
-                "total_sales": total_sales,
-                "total_purchases": total_purchases,
-                "today_sales": today_sales,
-                "total_received": total_received,
-                "total_paid": total_paid,
-                "receivables": receivables,
-                "advance_from_customers": advance_from_customers,
-                "advance_customers": advance_customers,
-                "payables": payables,
-                "advance_to_suppliers": advance_to_suppliers,
-                "cash_balance": cash_balance,
-                "bank_balance": bank_balance,
-                "payable_parties": payable_parties,
-                "payable_invoices": list(payable_invoices),
-                "chart_data": chart_data,
-            }
-        })
+        return {
+            "total_sales": total_sales,
+            "total_purchases": total_purchases,
+            "today_sales": today_sales,
+            "total_received": total_received,
+            "total_paid": total_paid,
+            "receivables": receivables,
+            "advance_from_customers": advance_from_customers,
+            "advance_customers": advance_customers,
+            "payables": payables,
+            "advance_to_suppliers": advance_to_suppliers,
+            "cash_balance": cash_balance,
+            "bank_balance": bank_balance,
+            "payable_parties": payable_parties,
+            "payable_invoices": due_invoices,
+            "chart_data": chart_data,
+        }
@@ -0,0 +1,238 @@
+"""
+In-process load test for the REST API.
+
+Simulated users drive the real URLconf through the DRF test client, one client
+and one thread per user, and every request is timed per endpoint. The summary
+(p50/p95/p99 latency and requests per second) is plain JSON so two runs can be
+compared with compare_results().
+"""
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from rest_framework.test import APIClient
+
+from companies.models import Company
+from customer.models import Customer
+from items.models import Item
+from parties.models import Party
+
+from .dataset import load_reference_data
+
+
+BENCH_PASSWORD = "bench-pass-1234"
+
+
+#! fixture
+def create_bench_users(count, tag=None):
+    """
+    Creates `count` owners, each with a company, a party and two stocked items.
+    Returns the plain dicts the simulated users need; names are tagged so
+    repeated runs against the same database never collide on unique fields.
+    """
+    tag = tag or str(int(time.time()))
+    reference = load_reference_data()
+    unit = reference["units"][0]
+    sales = reference["sales"]
+
+    users = []
+    for n in range(count):
+        name = f"bench-{tag}-{n}"
+        user = User.objects.create_user(username=name, email=f"{name}@bench.local", password=BENCH_PASSWORD)
+        customer = Customer.objects.create(user=user, phone=f"{tag}{n}"[-20:])
+        company = Company.objects.create(
+            user=user,
+            owner=customer,
+            name=f"Bench Co {tag} {n}",
+            address="Bench street",
+            phone=f"{tag}{n:05d}"[-20:],
+            gst_number=f"GST{tag}{n:05d}"[-30:],
+        )
+        party = Party.objects.create(name=f"Bench Party {tag} {n}", company=company, created_by=user)
+        items = [
+            Item.objects.create(
+                name=f"Bench Item {tag} {n} {i}",
+                code=f"B{tag}-{n}-{i}",
+                quantity=10 ** 6,
+                unit=unit,
+                price=80.0,
+                sales_price=100.0,
+                tax_applied=True,
+                tax_percent=18.0,
+                company=company,
+                created_by=user,
+            )
+            for i in range(2)
+        ]
+        users.append({
+            "username": name,
+            "company_id": company.id,
+            "party_id": party.id,
+            "item_ids": [item.id for item in items],
+            "invoice_type_id": sales.id,
+        })
+    return users
+
+
+#! scenario
+class SimulatedUser:
+    """One logged-in client walking the scenario; every request lands in self.samples."""
+
+    def __init__(self, account):
+        self.account = account
+        # A failing view counts as an error sample instead of stopping the user
+        self.client = APIClient(raise_request_exception=False)
+        self.samples = []
+        self.invoice_id = None
+
+    def request(self, endpoint, method, path, data=None):
+        started = time.perf_counter()
+        response = getattr(self.client, method)(path, data, format="json")
+        elapsed = time.perf_counter() - started
+        self.samples.append((endpoint, elapsed, is_error(response)))
+        return response
+
+    def login(self):
+        response = self.request("token_login", "post", "/api/token/", {
+            "username": self.account["username"],
+            "password": BENCH_PASSWORD,
+        })
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response_data(response).get('access')}",
+            HTTP_COMPANY=str(self.account["company_id"]),
+        )
+
+    def iteration(self):
+        company_id = self.account["company_id"]
+
+        response = self.request("invoice_create", "post", "/invoice/create/", {
+            "company": company_id,
+            "party": self.account["party_id"],
+            "invoice_type": self.account["invoice_type_id"],
+            "items": [{"item": item_id, "quantity": 1} for item_id in self.account["item_ids"]],
+        })
+        self.invoice_id = response_data(response).get("invoice_id") or self.invoice_id
+
+        self.request("invoice_list", "post", "/invoice/list/", {})
+        if self.invoice_id:
+            self.request("invoice_detail", "get", f"/invoice/{self.invoice_id}/")
+            self.request("invoice_pdf", "get", f"/invoice/{self.invoice_id}/pdf/")
+            self.request("payment_in", "post", "/payments/payment-in/", {
+                "company": company_id,
+                "invoice": self.invoice_id,
+                "amount": 1.0,
+            })
+        self.request("payments_list", "post", "/payments/list/", {})
+        self.request("dashboard", "get", "/company/dashboard/")
+
+    def run(self, iterations):
+        try:
+            self.login()
+            for _ in range(iterations):
+                self.iteration()
+        finally:
+            # Worker threads own their connections
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+        return self.samples
+
+
+def response_data(response):
+    data = getattr(response, "data", None)
+    return data if isinstance(data, dict) else {}
+
+
+def is_error(response):
+    if response.status_code >= 400:
+        return True
+    # Most views report failures in the body with HTTP 200
+    try:
+        return int(response_data(response).get("status", 200)) >= 400
+    except (TypeError, ValueError):
+        return False
+
+
+#! run + report
+def run_benchmark(accounts, iterations=10):
+    """Runs one simulated user per account concurrently and returns the summary dict."""
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=len(accounts)) as pool:
+        runs = list(pool.map(lambda account: SimulatedUser(account).run(iterations), accounts))
+
+    duration = time.perf_counter() - started
+    samples = [sample for run in runs for sample in run]
+
+    result = summarize(samples, duration)
+    result.update({
+        "started_at": started_at.isoformat(),
+        "users": len(accounts),
+        "iterations": iterations,
+        "database": connection.vendor,
+    })
+    return result
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def _stats(timings, errors, duration):
+    timings = sorted(timings)
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "rps": round(len(timings) / duration, 2) if duration else 0.0,
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 2) if timings else 0.0,
+        "p50_ms": round(percentile(timings, 50) * 1000, 2),
+        "p95_ms": round(percentile(timings, 95) * 1000, 2),
+        "p99_ms": round(percentile(timings, 99) * 1000, 2),
+        "max_ms": round(timings[-1] * 1000, 2) if timings else 0.0,
+    }
+
+
+def summarize(samples, duration):
+    """samples: (endpoint, seconds, is_error) tuples -> per-endpoint and total stats."""
+    by_endpoint = {}
+    for endpoint, elapsed, error in samples:
+        timings, errors = by_endpoint.setdefault(endpoint, ([], [0]))
+        timings.append(elapsed)
+        errors[0] += int(error)
+
+    return {
+        "duration_s": round(duration, 3),
+        "endpoints": {
+            endpoint: _stats(timings, errors[0], duration)
+            for endpoint, (timings, errors) in by_endpoint.items()
+        },
+        "total": _stats([s[1] for s in samples], sum(int(s[2]) for s in samples), duration),
+    }
+
+
+def compare_results(previous, current):
+    """Per-endpoint p95 and rps deltas of `current` against an earlier run."""
+    rows = {}
+    for endpoint, stats in current["endpoints"].items():
+        before = previous.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        rows[endpoint] = {
+            "p95_ms": [before["p95_ms"], stats["p95_ms"], round(stats["p95_ms"] - before["p95_ms"], 2)],
+            "rps": [before["rps"], stats["rps"], round(stats["rps"] - before["rps"], 2)],
+        }
+    return rows
+
+
+def save_results(result, path):
+    with open(path, "w") as fh:
+        json.dump(result, fh, indent=2)
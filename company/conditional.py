@@ -0,0 +1,84 @@
+"""
+Conditional requests (ETag / If-None-Match) for the catalog lists.
+
+A catalog's version is max(updated_at) and the row count of the company's
+live rows: one aggregate query served from a (company, updated_at) partial
+index. Edits and stock moves bump updated_at; creates and (soft) deletes
+change the count or the max. The ETag also covers the request parameters
+(pagination, fields, ...), and a matching If-None-Match gets a 304 before
+anything is loaded or serialized.
+
+The list views are POST endpoints that only read, so If-None-Match is honoured
+there as for a GET.
+"""
+import hashlib
+import json
+
+from django.db.models import CharField, Count, Max, Subquery, Value
+from django.db.models.functions import Cast, Concat
+from django.http import HttpResponseNotModified
+
+from companies.models import Company
+
+
+def catalog_version(queryset):
+    stats = queryset.aggregate(last=Max("updated_at"), count=Count("pk"))
+    last = stats["last"].isoformat() if stats["last"] else "-"
+    return f"{stats['count']}:{last}"
+
+
+def catalog_versions(company_id, **querysets):
+    """catalog_version() of several of a company's catalogs, in one query: {name: version}."""
+    columns = {
+        f"{name}_version": Subquery(
+            queryset.order_by().values("company").annotate(
+                version=Concat(
+                    Cast(Count("pk"), CharField()), Value(":"), Cast(Max("updated_at"), CharField()),
+                    output_field=CharField(),
+                )
+            ).values("version")
+        )
+        for name, queryset in querysets.items()
+    }
+    row = Company.objects.filter(pk=company_id).values(**columns).first() or {}
+    # An empty catalog has no group, so no row
+    return {name: row.get(f"{name}_version") or "0:-" for name in querysets}
+
+
+def request_variant(request):
+    """Everything in the request that shapes the response body."""
+    body = request.data if hasattr(request.data, "items") else {}
+    return json.dumps(
+        [sorted(request.query_params.lists()), sorted((key, str(value)) for key, value in body.items())],
+        separators=(",", ":"),
+    )
+
+
+def catalog_etag(request, queryset):
+    digest = hashlib.md5(
+        f"{queryset.model._meta.label}|{catalog_version(queryset)}|{request_variant(request)}".encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as for GET
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def not_modified(etag):
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
+
+
+def with_etag(response, etag):
+    response["ETag"] = etag
+    return response
@@ -0,0 +1,344 @@
+"""
+Synthetic dataset at production scale.
+
+Everything is derived from a seed and an end date (DEFAULT_END_DATE unless
+given): company n always gets the same parties, items, invoices and payments
+for a given seed, whatever the batch sizes or the day it runs. Invoice
+numbers are the exception: they come from the live per-company sequence, so
+they carry the current fiscal year like the API's.
+Rows go in through chunked bulk_create, one transaction per batch of companies.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from companies.models import Company
+from companies.summary import rebuild_summary
+from customer.models import Customer
+from invoice.models import BankAccount, Invoice, InvoiceItem, InvoiceType, PaymentMode, PaymentStatus, PaymentType
+from invoice.reference import reference_by_code
+from invoice.utils import allocate_invoice_numbers
+from items.models import Item, UnitType
+from items.search import ITEM_SEARCH
+from parties.models import Party, PartyType
+from parties.search import PARTY_SEARCH
+from payments.models import BankToBankTransfer, BankTransaction, CashLedger, CashTransaction, PaymentIn, PaymentOut
+
+
+DATASET_PASSWORD = "dataset-pass-1234"
+# Dates are spread over the `days` before this one
+DEFAULT_END_DATE = date(2025, 12, 31)
+
+UNIT_CODES = ["pcs", "kg", "box", "pack"]
+WORDS = [
+    "Steel", "Cotton", "Copper", "Paper", "Glass", "Plastic", "Rubber", "Timber",
+    "Cement", "Paint", "Wire", "Bolt", "Pipe", "Sheet", "Tile", "Valve",
+]
+CITIES = ["Pune", "Mumbai", "Nagpur", "Nashik", "Surat", "Indore", "Delhi", "Chennai"]
+
+# Fields filled by auto_now/auto_now_add that the generator spreads over time
+BACKDATED_FIELDS = {
+    Invoice: "created_at",
+    Party: "created_at",
+    PaymentIn: "payment_date",
+    PaymentOut: "payment_date",
+    BankTransaction: "created_at",
+    CashTransaction: "created_at",
+    BankToBankTransfer: "created_at",
+}
+
+
+def load_reference_data():
+    """The lookup rows the generator needs, from the reference registry (seeded by migrations)."""
+    return {
+        "sales": reference_by_code(InvoiceType, "sales"),
+        "purchase": reference_by_code(InvoiceType, "purchase"),
+        "cash": reference_by_code(PaymentType, "cash"),
+        "bank": reference_by_code(PaymentType, "bank"),
+        "on_account": reference_by_code(PaymentMode, "on_account"),
+        "customer": reference_by_code(PartyType, "customer"),
+        "supplier": reference_by_code(PartyType, "supplier"),
+        "units": [reference_by_code(UnitType, code) for code in UNIT_CODES],
+        "unpaid": reference_by_code(PaymentStatus, "Unpaid"),
+        "partially_paid": reference_by_code(PaymentStatus, "Partially Paid"),
+        "paid": reference_by_code(PaymentStatus, "Paid"),
+    }
+
+
+class DatasetGenerator:
+
+    def __init__(self, seed=42, tag=None, batch_size=2000, days=365, end_date=None, log=None):
+        self.seed = seed
+        self.tag = tag or f"s{seed}"
+        self.batch_size = batch_size
+        self.days = days
+        self.log = log or (lambda message: None)
+        self.counts = {}
+        self.password = make_password(DATASET_PASSWORD)
+        self.end_date = end_date or DEFAULT_END_DATE
+
+    #! helpers
+    def rng_for(self, company_index):
+        # One stream per company keeps the output independent of batching (and of the tag)
+        return random.Random(f"{self.seed}-{company_index}")
+
+    def random_moment(self, rng):
+        day = self.end_date - timedelta(days=rng.randrange(self.days))
+        moment = datetime.combine(day, time(rng.randrange(9, 20), rng.randrange(60)))
+        return timezone.make_aware(moment)
+
+    def bulk_create(self, model, objs):
+        backdated = BACKDATED_FIELDS.get(model)
+        if backdated:
+            # auto_now_add stamps now() on insert; the generated dates go back in with one bulk UPDATE
+            wanted = [getattr(obj, backdated) for obj in objs]
+        created = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        if backdated and created:
+            self.backdate(model, backdated, created, wanted)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(created)
+        return created
+
+    @staticmethod
+    def backdate(model, name, objs, values):
+        """One prepared UPDATE run for every row (executemany): far cheaper than bulk_update's CASE."""
+        field = model._meta.get_field(name)
+        quote = connection.ops.quote_name
+        sql = (
+            f"UPDATE {quote(model._meta.db_table)} SET {quote(field.column)} = %s "
+            f"WHERE {quote(model._meta.pk.column)} = %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                (field.get_db_prep_value(value, connection), obj.pk) for obj, value in zip(objs, values)
+            ])
+        for obj, value in zip(objs, values):
+            setattr(obj, name, value)
+
+    #! entry point
+    def generate(self, companies, parties=50, items=50, invoices=1000, lines=3,
+                 companies_per_batch=10, transfers=10):
+        if parties < 1 or items < 1:
+            raise ValueError("Every company needs at least one party and one item.")
+        reference = load_reference_data()
+        # Throwaway bulk load: skip the fsync per commit on SQLite
+        if connection.vendor == "sqlite" and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA synchronous = OFF")
+
+        for start in range(0, companies, companies_per_batch):
+            indexes = range(start, min(start + companies_per_batch, companies))
+            with transaction.atomic():
+                self.generate_batch(indexes, reference, parties, items, invoices, lines, transfers)
+            self.log(f"companies {indexes[-1] + 1}/{companies}: {self.total_rows()} rows")
+        return self.counts
+
+    def total_rows(self):
+        return sum(self.counts.values())
+
+    #! one transaction
+    def generate_batch(self, indexes, reference, parties, items, invoices, lines, transfers):
+        rngs = {n: self.rng_for(n) for n in indexes}
+
+        owners = self.bulk_create(User, [
+            User(username=f"{self.tag}-owner-{n}", email=f"{self.tag}-owner-{n}@dataset.local",
+                 password=self.password)
+            for n in indexes
+        ])
+        customers = self.bulk_create(Customer, [
+            Customer(user=user, phone=f"9{n:09d}", address=rngs[n].choice(CITIES))
+            for n, user in zip(indexes, owners)
+        ])
+        company_rows = self.bulk_create(Company, [
+            Company(
+                user=user,
+                owner=customer,
+                name=f"{rngs[n].choice(WORDS)} Traders {self.tag}-{n}",
+                address=rngs[n].choice(CITIES),
+                phone=f"{self.tag}-{n}",
+                gst_number=f"GST-{self.tag}-{n}",
+            )
+            for n, user, customer in zip(indexes, owners, customers)
+        ])
+
+        for n, user, company in zip(indexes, owners, company_rows):
+            self.generate_company(n, rngs[n], user, company, reference, parties, items, invoices, lines, transfers)
+
+    def generate_company(self, n, rng, user, company, reference, parties, items, invoices, lines, transfers):
+        party_rows = self.bulk_create(Party, [
+            Party(
+                name=f"{rng.choice(WORDS)} {rng.choice(CITIES)} {self.tag}-{n}-{p}",
+                phone=f"8{rng.randrange(10 ** 9):09d}",
+                address=rng.choice(CITIES),
+                party_type=reference["customer"] if p % 3 else reference["supplier"],
+                company=company,
+                created_by=user,
+                created_at=self.random_moment(rng),
+            )
+            for p in range(parties)
+        ])
+        item_rows = self.bulk_create(Item, [
+            Item(
+                name=f"{rng.choice(WORDS)} {rng.choice(WORDS)} {self.tag}-{n}-{i}",
+                code=f"{self.tag}-{n}-{i}",
+                quantity=rng.randrange(100, 10000),
+                unit=rng.choice(reference["units"]),
+                price=round(rng.uniform(10, 900), 2),
+                sales_price=round(rng.uniform(20, 1000), 2),
+                tax_applied=rng.random() < 0.8,
+                tax_percent=rng.choice([5.0, 12.0, 18.0, 28.0]),
+                company=company,
+                created_by=user,
+            )
+            for i in range(items)
+        ])
+        # bulk_create skips the signals that feed the typeahead index
+        PARTY_SEARCH.add_many(party_rows)
+        ITEM_SEARCH.add_many(item_rows)
+        banks = self.bulk_create(BankAccount, [
+            BankAccount(
+                account_no=f"{n:08d}{b:04d}",
+                bank_name=bank_name,
+                bank_branch=rng.choice(CITIES),
+                company=company,
+                opening_balance=100000.0,
+                current_balance=100000.0,
+            )
+            for b, bank_name in enumerate(["HDFC Bank", "State Bank"])
+        ])
+        ledger = self.bulk_create(CashLedger, [
+            CashLedger(ledger_name="Cash in hand", company_name=company, opening_balance=50000.0, current_balance=50000.0)
+        ])[0]
+
+        balances = {bank.id: bank.current_balance for bank in banks}
+        cash_balance = ledger.current_balance
+
+        for start in range(0, invoices, self.batch_size):
+            count = min(self.batch_size, invoices - start)
+            cash_balance = self.generate_invoices(
+                rng, user, company, start, count, party_rows, item_rows, banks, ledger,
+                balances, cash_balance, reference, lines,
+            )
+
+        transfer_rows = []
+        for _ in range(transfers):
+            source, target = rng.sample(banks, 2)
+            amount = round(rng.uniform(100, 5000), 2)
+            balances[source.id] -= amount
+            balances[target.id] += amount
+            transfer_rows.append(BankToBankTransfer(
+                company=company, from_account=source, to_account=target,
+                amount=amount, created_at=self.random_moment(rng),
+            ))
+        self.bulk_create(BankToBankTransfer, transfer_rows)
+
+        for bank in banks:
+            bank.current_balance = round(balances[bank.id], 2)
+        BankAccount.objects.bulk_update(banks, ["current_balance"])
+        ledger.current_balance = round(cash_balance, 2)
+        ledger.save(update_fields=["current_balance"])
+        # bulk_create skips the signals that maintain the dashboard totals too
+        rebuild_summary(company.id)
+
+    def generate_invoices(self, rng, user, company, start, count, party_rows, item_rows, banks, ledger,
+                          balances, cash_balance, reference, lines):
+        # Same sequence as the API, so invoices created later do not collide
+        numbers = allocate_invoice_numbers(company, count)
+        invoice_rows, line_sets = [], []
+
+        for invoice_number in numbers:
+            is_sales = rng.random() < 0.7
+            chosen = rng.sample(item_rows, min(rng.randint(1, lines * 2 - 1), len(item_rows)))
+            line_rows, subtotal, tax_total = [], 0.0, 0.0
+            for item in chosen:
+                quantity = rng.randint(1, 20)
+                rate = item.sales_price if is_sales else item.price
+                discount_percent = rng.choice([0.0, 0.0, 5.0, 10.0])
+                discount_amount = round(quantity * rate * discount_percent / 100, 2)
+                taxable = quantity * rate - discount_amount
+                tax = taxable * item.tax_percent / 100 if item.tax_applied else 0.0
+                subtotal += taxable
+                tax_total += tax
+                line_rows.append(InvoiceItem(
+                    item_id=item.id, quantity=quantity, rate=rate, discount_percent=discount_percent,
+                    discount_amount=discount_amount, amount=round(taxable + tax, 2),
+                ))
+
+            total = round(subtotal + tax_total, 2)
+            paid_share = rng.choice([0.0, 0.0, 0.5, 1.0, 1.0])
+            amount_paid = round(total * paid_share, 2)
+            payment_type = reference["cash"] if rng.random() < 0.4 else reference["bank"]
+            # *_id keywords: skips the related-object descriptors, the bulk of the ORM overhead here
+            invoice_rows.append(Invoice(
+                company_id=company.id,
+                party_id=rng.choice(party_rows).id,
+                created_by_id=user.id,
+                invoice_number=invoice_number,
+                invoice_type_id=reference["sales"].id if is_sales else reference["purchase"].id,
+                subtotal=round(subtotal, 2),
+                tax_amount=round(tax_total, 2),
+                total=total,
+                amount_paid=amount_paid,
+                remaining_balance=round(total - amount_paid, 2),
+                payment_type_id=payment_type.id if amount_paid else None,
+                payment_mode_id=reference["on_account"].id if amount_paid else None,
+                payment_status_id=(
+                    reference["unpaid"] if amount_paid == 0
+                    else reference["paid"] if amount_paid >= total
+                    else reference["partially_paid"]
+                ).id,
+                bank_account_id=rng.choice(banks).id if amount_paid and payment_type == reference["bank"] else None,
+                created_at=self.random_moment(rng),
+            ))
+            line_sets.append(line_rows)
+
+        invoice_rows = self.bulk_create(Invoice, invoice_rows)
+
+        lines_to_create = []
+        for invoice, line_rows in zip(invoice_rows, line_sets):
+            for line in line_rows:
+                line.invoice_id = invoice.id
+                lines_to_create.append(line)
+        self.bulk_create(InvoiceItem, lines_to_create)
+
+        payments_in, payments_out, bank_txns, cash_txns = [], [], [], []
+        for invoice in invoice_rows:
+            if not invoice.amount_paid:
+                continue
+            is_sales = invoice.invoice_type_id == reference["sales"].id
+            payment_cls = PaymentIn if is_sales else PaymentOut
+            (payments_in if is_sales else payments_out).append(payment_cls(
+                company_id=company.id, invoice_id=invoice.id, amount=invoice.amount_paid,
+                bank_account_id=invoice.bank_account_id, payment_date=invoice.created_at.date(),
+            ))
+            signed = invoice.amount_paid if is_sales else -invoice.amount_paid
+            if invoice.bank_account_id:
+                balances[invoice.bank_account_id] += signed
+                bank_txns.append(BankTransaction(
+                    bank_account_id=invoice.bank_account_id,
+                    transaction_type="credit" if is_sales else "debit",
+                    amount=invoice.amount_paid,
+                    related_invoice_id=invoice.id,
+                    description=f"Payment for Invoice #{invoice.invoice_number}",
+                    balance_after_transaction=round(balances[invoice.bank_account_id], 2),
+                    created_at=invoice.created_at,
+                ))
+            else:
+                cash_balance += signed
+                cash_txns.append(CashTransaction(
+                    ledger_id=ledger.id,
+                    transaction_type="credit" if is_sales else "debit",
+                    amount=invoice.amount_paid,
+                    description=f"Cash payment for invoice #{invoice.invoice_number}",
+                    balance_after_transaction=round(cash_balance, 2),
+                    created_at=invoice.created_at,
+                ))
+
+        self.bulk_create(PaymentIn, payments_in)
+        self.bulk_create(PaymentOut, payments_out)
+        self.bulk_create(BankTransaction, bank_txns)
+        self.bulk_create(CashTransaction, cash_txns)
+        return cash_balance
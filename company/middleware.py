@@ -0,0 +1,224 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("erp.query_metrics")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Per-request DB counters, fed by a connection execute wrapper and the row counting cursor."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class RowCountingCursor:
+    """Wraps a Django cursor and counts the rows fetched through it."""
+
+    def __init__(self, cursor, metrics):
+        self.cursor = cursor
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.metrics.rows += 1
+            yield row
+
+    def __enter__(self):
+        self.cursor.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return self.cursor.__exit__(exc_type, exc_value, tb)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.metrics.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        self.metrics.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.metrics.rows += len(rows)
+        return rows
+
+
+def _count_rows(connection, metrics):
+    """Routes connection.cursor()/chunked_cursor() through RowCountingCursor until the stack closes."""
+    def wrap(factory):
+        def counted(*args, **kwargs):
+            cursor = factory(*args, **kwargs)
+            # the default chunked_cursor() is self.cursor(): already counted
+            return cursor if isinstance(cursor, RowCountingCursor) else RowCountingCursor(cursor, metrics)
+        return counted
+
+    connection.cursor = wrap(connection.cursor)
+    connection.chunked_cursor = wrap(connection.chunked_cursor)
+
+    def restore():
+        del connection.cursor
+        del connection.chunked_cursor
+
+    return restore
+
+
+class CountedStream:
+    """
+    Streamed body whose bytes are counted as they are sent. The first of
+    "last chunk sent" and close() takes the connection wrappers off and
+    reports; the server calls close() on every response, started or not,
+    so the wrappers never outlive the request.
+    """
+
+    def __init__(self, content, stack, report):
+        self.content = content
+        self.stack = stack
+        self.report = report
+        self.sent = 0
+        self.finished = False
+
+    def __iter__(self):
+        for chunk in self.content:
+            self.sent += len(chunk)
+            yield chunk
+        self.finish(enforce=True)
+
+    def finish(self, enforce):
+        if self.finished:
+            return
+        self.finished = True
+        self.stack.close()
+        self.report(self.sent, enforce)
+
+    def close(self):
+        # Client gone, body failed or never started: log what ran, but do not raise from close()
+        self.finish(enforce=False)
+
+
+class QueryMetricsMiddleware:
+    """
+    Opt-in (QUERY_METRICS_ENABLED) per-request cost report:
+    queries, DB time, rows fetched and response bytes, sent as
+    Server-Timing / X-DB-* headers and one JSON log line per request.
+    Streamed responses are measured until their last chunk is sent and
+    only logged (their headers leave before the queries run).
+
+    Views may declare query_budget next to required_module / required_permission.
+    QUERY_BUDGET_MODE decides what happens when a view goes over it:
+    "warn" logs and flags the response, "fail" raises QueryBudgetExceeded.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_METRICS_ENABLED", False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        started = time.perf_counter()
+
+        stack = ExitStack()
+        try:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+                stack.callback(_count_rows(connection, metrics))
+            response = self.get_response(request)
+        except BaseException:
+            stack.close()
+            raise
+
+        if response.streaming and not response.is_async:
+            # A streamed body runs its queries while it is sent, after this returns: keep
+            # counting until the stream ends, then log and check the budget. The headers are
+            # gone by then, so a streamed response carries none of the X-DB-* ones.
+            response.streaming_content = CountedStream(
+                response.streaming_content,
+                stack,
+                lambda sent, enforce: self.report(request, response, metrics, started, sent, enforce),
+            )
+            return response
+
+        stack.close()
+        if response.streaming:
+            # async stream: its queries are out of reach, log what ran but send no numbers
+            self.report(request, response, metrics, started, None, enforce=False)
+            return response
+
+        line = self.report(request, response, metrics, started, len(response.content))
+        db_ms = line["db_ms"]
+        response["Server-Timing"] = (
+            f'db;dur={db_ms:.2f};desc="{metrics.queries} queries", total;dur={line["total_ms"]:.2f}'
+        )
+        response["X-DB-Queries"] = str(metrics.queries)
+        response["X-DB-Time"] = f"{db_ms:.2f}"
+        response["X-DB-Rows"] = str(metrics.rows)
+        if line["query_budget"] is not None:
+            response["X-Query-Budget"] = str(line["query_budget"])
+        if line["over_budget"]:
+            response["X-Query-Budget-Exceeded"] = "1"
+        return response
+
+    def report(self, request, response, metrics, started, response_bytes, enforce=True):
+        """Logs the request's line and applies the budget; returns the line."""
+        total_time = time.perf_counter() - started
+        budget = getattr(request, "_query_budget", None)
+        over_budget = budget is not None and metrics.queries > budget
+
+        line = {
+            "method": request.method,
+            "path": request.path,
+            "view": getattr(request, "_query_view", None),
+            "status": response.status_code,
+            "queries": metrics.queries,
+            "db_ms": round(metrics.db_time * 1000, 2),
+            "rows": metrics.rows,
+            "bytes": response_bytes,
+            "total_ms": round(total_time * 1000, 2),
+            "query_budget": budget,
+            "over_budget": over_budget,
+            "streamed": response.streaming,
+        }
+
+        if over_budget:
+            logger.warning(json.dumps(line))
+            if enforce and getattr(settings, "QUERY_BUDGET_MODE", "warn") == "fail":
+                raise QueryBudgetExceeded(
+                    f"{line['view']} ran {metrics.queries} queries, budget is {budget}."
+                )
+        else:
+            logger.info(json.dumps(line))
+        return line
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+        if view_class is not None:
+            request._query_view = view_class.__name__
+            request._query_budget = getattr(view_class, "query_budget", None)
+        return None
@@ -0,0 +1,170 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+A page is the first `page_size` rows after the last row of the previous page in
+a fixed (sort key, id) ordering, so a deep page costs the same as the first one
+and rows added in between never shift or repeat. The cursor carries the last
+row's key values, signed and bound to the endpoint, so clients treat it as an
+opaque string.
+
+Clients opt in with `cursor`, `page_size` or `paginate=1` (query string, or the
+POST body for the POST list views) and may ask for `include_total=1`. Without
+them the view answers in its old unpaginated shape while LIST_PAGINATION_COMPAT
+is on.
+"""
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import APIException
+
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+class InvalidCursor(APIException):
+    status_code = 400
+    default_detail = "Invalid cursor."
+    default_code = "invalid_cursor"
+
+
+def request_param(request, name):
+    """Query string first, then the body (the POST list views take their filters there)."""
+    value = request.query_params.get(name)
+    if value is None and hasattr(request.data, "get"):
+        value = request.data.get(name)
+    return value
+
+
+def keyset_after(ordering, values):
+    """Rows strictly after `values` in `ordering`: (a > x) OR (a = x AND b > y) ..."""
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        clause = Q(**{f"{name}__{lookup}": values[position]})
+        for previous, value in zip(ordering[:position], values):
+            clause &= Q(**{previous.lstrip("-"): value})
+        condition |= clause
+    return condition
+
+
+class KeysetPaginator:
+    """
+    One per request. A view may page several querysets (e.g. payments in and
+    out) under different names; the single cursor tracks all of them.
+    Orderings must end with a unique, non-null column (usually id).
+    """
+
+    def __init__(self, request):
+        self.salt = f"list-cursor:{request.path}"
+        cursor = request_param(request, "cursor")
+        page_size = request_param(request, "page_size")
+
+        self.enabled = (
+            not settings.LIST_PAGINATION_COMPAT
+            or bool(cursor)
+            or page_size not in (None, "")
+            or str(request_param(request, "paginate")).lower() in TRUE_VALUES
+        )
+        self.include_total = str(request_param(request, "include_total")).lower() in TRUE_VALUES
+
+        try:
+            page_size = int(page_size) if page_size not in (None, "") else settings.LIST_PAGE_SIZE
+        except (TypeError, ValueError):
+            page_size = settings.LIST_PAGE_SIZE
+        self.page_size = max(1, min(page_size, settings.LIST_MAX_PAGE_SIZE))
+
+        self.positions = self.decode(cursor) if cursor else {}
+        self.started = bool(cursor)
+        self.totals = {}
+
+    #! cursor
+    def encode(self):
+        if not any(values is not None for values in self.positions.values()):
+            return None
+        return signing.dumps(self.positions, salt=self.salt, compress=True)
+
+    def decode(self, cursor):
+        try:
+            positions = signing.loads(cursor, salt=self.salt)
+        except signing.BadSignature:
+            raise InvalidCursor()
+        if not isinstance(positions, dict):
+            raise InvalidCursor()
+        return positions
+
+    @staticmethod
+    def key_of(obj, ordering):
+        """Works on model instances and on .values() dicts that include the ordering fields."""
+        values = []
+        for field in ordering:
+            if isinstance(obj, dict):
+                value = obj[field.lstrip("-")]
+            else:
+                value = getattr(obj, obj._meta.get_field(field.lstrip("-")).attname)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return values
+
+    @staticmethod
+    def parse_key(model, ordering, values):
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise InvalidCursor()
+        try:
+            return [model._meta.get_field(field.lstrip("-")).to_python(value) for field, value in zip(ordering, values)]
+        except Exception:
+            raise InvalidCursor()
+
+    #! paging
+    def paginate(self, queryset, ordering, name="rows"):
+        """The current page as a list, or the whole ordered queryset when pagination is off."""
+        queryset = queryset.order_by(*ordering)
+        if not self.enabled:
+            return queryset
+
+        if self.include_total:
+            self.totals[name] = queryset.count()
+
+        def fetch(position, limit):
+            rows = queryset
+            if position is not None:
+                rows = rows.filter(keyset_after(ordering, self.parse_key(queryset.model, ordering, position)))
+            return list(rows[:limit])
+
+        return self.paginate_source(fetch, lambda row: self.key_of(row, ordering), name)
+
+    def paginate_source(self, fetch, key, name="rows"):
+        """
+        For sources paginate() cannot filter, e.g. a UNION. `fetch(position, limit)`
+        returns up to `limit` rows after `position` (None on the first page), in
+        order; `key(row)` is the JSON-safe position of a row.
+        """
+        position = None
+        if self.started:
+            if name not in self.positions:
+                raise InvalidCursor()
+            if self.positions[name] is None:
+                # This list was exhausted on an earlier page
+                return []
+            position = self.positions[name]
+
+        rows = fetch(position, self.page_size + 1)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.positions[name] = key(rows[-1]) if has_more else None
+        return rows
+
+    def info(self):
+        next_cursor = self.encode()
+        info = {"page_size": self.page_size, "next_cursor": next_cursor, "has_more": next_cursor is not None}
+        if self.include_total:
+            info["total"] = next(iter(self.totals.values())) if len(self.totals) == 1 else self.totals
+        return info
+
+    #! responses
+    def extra(self):
+        """Keys to merge into an envelope response ({"msg", "data", ...})."""
+        return {"pagination": self.info()} if self.enabled else {}
+
+    def wrap(self, data):
+        """For views that answer with a bare list."""
+        return {"results": data, "pagination": self.info()} if self.enabled else data
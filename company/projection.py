@@ -0,0 +1,55 @@
+"""
+Sparse fieldsets for list endpoints.
+
+A view declares its output fields as a Projection: output name -> ORM lookup.
+`fields=a,b` (query string, or the POST body as a string or a list) narrows the
+response to those fields. The query goes through .values() on just their
+lookups, so Django selects only those columns, joins only the related tables
+that were asked for and builds plain dicts instead of model instances.
+"""
+from rest_framework.exceptions import APIException
+
+from .pagination import request_param
+
+
+class InvalidFields(APIException):
+    status_code = 400
+    default_detail = "Unknown fields requested."
+    default_code = "invalid_fields"
+
+
+class Projection:
+
+    def __init__(self, columns, defaults=None):
+        self.columns = columns
+        # Replaces None, e.g. a missing related row
+        self.defaults = defaults or {}
+
+    def requested(self, request):
+        """Output names asked for with `fields=`, all of them by default."""
+        value = request_param(request, "fields")
+        if value in (None, "", []):
+            return list(self.columns)
+        names = value if isinstance(value, (list, tuple)) else str(value).split(",")
+        names = list(dict.fromkeys(str(name).strip() for name in names if str(name).strip()))
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise InvalidFields(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.columns)}.")
+        return names or list(self.columns)
+
+    def values(self, queryset, names, keep=()):
+        """`keep`: extra lookups the view needs itself, e.g. the pagination keys."""
+        lookups = dict.fromkeys([self.columns[name] for name in names] + list(keep))
+        return queryset.values(*lookups)
+
+    def row_builder(self, names):
+        """Maps one .values() dict to the output row."""
+        pairs = [(name, self.columns[name], self.defaults.get(name)) for name in names]
+
+        def build(values):
+            return {
+                name: default if values[lookup] is None and default is not None else values[lookup]
+                for name, lookup, default in pairs
+            }
+
+        return build
@@ -0,0 +1,156 @@
+"""
+Typeahead search over parties and items.
+
+On SQLite each searchable model has an FTS5 table, created by its app's
+migration, that holds the searchable text under rowid = the row's id. A
+`scope` column carries the company as a token ("c<id>"), so a single MATCH
+does the company filter and the prefix match on the index alone, whatever the
+size of the catalog. post_save / post_delete keep it current; bulk writes call
+add_many() or rebuild(). Other databases (or SQLite without FTS5) fall back to
+icontains filters.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+
+
+MAX_TERMS = 8
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+
+def search_terms(text):
+    """Lowercase word tokens of the user input, at most MAX_TERMS."""
+    return re.findall(r"\w+", (text or "").lower())[:MAX_TERMS]
+
+
+def search_limit(request):
+    try:
+        return max(1, min(int(request.query_params.get("limit", DEFAULT_LIMIT)), MAX_LIMIT))
+    except ValueError:
+        return DEFAULT_LIMIT
+
+
+class SearchIndex:
+
+    def __init__(self, model, table, fields, live):
+        self.model = model
+        self.table = table
+        self.fields = fields
+        # Filter kwargs of the rows that belong in the index, e.g. {"deleted": False}
+        self.live = live
+        self._available = None
+
+    #! schema (used by the migrations)
+    def create_sql(self):
+        columns = ", ".join(("scope",) + self.fields)
+        return f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5({columns}, prefix='2 3')"
+
+    def drop_sql(self):
+        return f"DROP TABLE IF EXISTS {self.table}"
+
+    @property
+    def available(self):
+        if self._available is None:
+            self._available = (
+                connection.vendor == "sqlite" and self.table in connection.introspection.table_names()
+            )
+        return self._available
+
+    #! writes
+    def is_live(self, obj):
+        return all(getattr(obj, field) == value for field, value in self.live.items())
+
+    def row_of(self, obj):
+        return [obj.pk, f"c{obj.company_id}"] + [getattr(obj, field) or "" for field in self.fields]
+
+    def add_many(self, objs):
+        """Indexes (or re-indexes) `objs`; rows that are not live are only removed."""
+        if not self.available or not objs:
+            return
+        placeholders = ", ".join(["%s"] * (len(self.fields) + 2))
+        rows = [self.row_of(obj) for obj in objs if self.is_live(obj)]
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [[obj.pk] for obj in objs])
+            if rows:
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (rowid, scope, {', '.join(self.fields)}) VALUES ({placeholders})", rows
+                )
+
+    def remove(self, pk):
+        if not self.available:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [pk])
+
+    def rebuild(self, company_ids=None, chunk_size=2000):
+        """Repopulates the index, or just the given companies, from the table."""
+        if not self.available:
+            return 0
+        queryset = self.model.objects.filter(**self.live).only("id", "company_id", *self.fields)
+        with connection.cursor() as cursor:
+            if company_ids is None:
+                cursor.execute(f"DELETE FROM {self.table}")
+            elif company_ids:
+                queryset = queryset.filter(company_id__in=company_ids)
+                cursor.executemany(
+                    f"DELETE FROM {self.table} WHERE scope MATCH %s", [[f'"c{pk}"'] for pk in company_ids]
+                )
+            else:
+                return 0
+        count, chunk = 0, []
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) >= chunk_size:
+                self.add_many(chunk)
+                count, chunk = count + len(chunk), []
+        self.add_many(chunk)
+        return count + len(chunk)
+
+    #! signals
+    def on_save(self, sender, instance, update_fields=None, **kwargs):
+        watched = {"company", "company_id", *self.fields, *self.live}
+        if update_fields is not None and not watched & set(update_fields):
+            return
+        self.add_many([instance])
+
+    def on_delete(self, sender, instance, **kwargs):
+        self.remove(instance.pk)
+
+    def connect_signals(self):
+        post_save.connect(self.on_save, sender=self.model, weak=False, dispatch_uid=f"search-save-{self.table}")
+        post_delete.connect(self.on_delete, sender=self.model, weak=False, dispatch_uid=f"search-delete-{self.table}")
+
+    #! search
+    def match_expression(self, company_id, terms):
+        prefixes = " AND ".join(f'"{term}"*' for term in terms)
+        return f'scope : "c{int(company_id)}" AND {{{" ".join(self.fields)}}} : ({prefixes})'
+
+    def search_ids(self, company_id, text, limit=20):
+        """Ids of the live rows of a company matching every word of `text` as a prefix, best first."""
+        terms = search_terms(text)
+        if not terms:
+            return []
+        if not self.available:
+            condition = Q()
+            for term in terms:
+                condition &= Q(*[Q(**{f"{field}__icontains": term}) for field in self.fields], _connector=Q.OR)
+            queryset = self.model.objects.filter(condition, company_id=company_id, **self.live)
+            return list(queryset.order_by("id").values_list("id", flat=True)[:limit])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s ORDER BY rank LIMIT %s",
+                [self.match_expression(company_id, terms), limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def search(self, company_id, text, limit=20, fields=None):
+        """Matching rows as .values() dicts, best first."""
+        ids = self.search_ids(company_id, text, limit)
+        # The table has the last word on company and liveness
+        rows = self.model.objects.filter(id__in=ids, company_id=company_id, **self.live).values("id", *(fields or self.fields))
+        by_id = {row["id"]: row for row in rows}
+        return [by_id[pk] for pk in ids if pk in by_id]
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'company.middleware.QueryMetricsMiddleware',  # no-op unless QUERY_METRICS_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware (should be as high as possible)
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -68,6 +69,11 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'company.urls'
 
+# Per-request query count / DB time / rows / bytes headers and log lines
+QUERY_METRICS_ENABLED = os.environ.get('QUERY_METRICS_ENABLED', 'False').lower() == 'true'
+# What to do when a view runs more queries than its query_budget: "warn" or "fail"
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'warn')
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -97,6 +103,17 @@ DATABASES = {
 }
 
 
+# Cache
+# Compiled permission matrices live here; point CACHE_BACKEND/CACHE_LOCATION at a
+# shared backend (e.g. Redis or Memcached) when running more than one process.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -162,10 +179,55 @@ SIMPLE_JWT = {
 
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+
+    # Add permission claims to access tokens when JWT_PERMISSION_CLAIMS is on
+    'TOKEN_OBTAIN_SERIALIZER': 'staff.tokens.PermissionClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'staff.tokens.PermissionClaimsTokenRefreshSerializer',
 }
 
+# Stateless permission checks: access tokens carry company memberships and
+# per-module permission bitmasks, revoked through versions kept in the cache.
+JWT_PERMISSION_CLAIMS = os.environ.get('JWT_PERMISSION_CLAIMS', 'False').lower() == 'true'
+
+
+#! INVOICE NUMBERS
+# Per-company sequences keyed by (company, prefix, fiscal year).
+# Format placeholders: {prefix}, {year} (fiscal start year), {fy} (e.g. 2025-26) and {number}
+INVOICE_NUMBER_PREFIX = os.environ.get('INVOICE_NUMBER_PREFIX', 'INV')
+INVOICE_NUMBER_FORMAT = os.environ.get('INVOICE_NUMBER_FORMAT', '{prefix}-{year}-{number:03d}')
+INVOICE_FISCAL_YEAR_START_MONTH = int(os.environ.get('INVOICE_FISCAL_YEAR_START_MONTH', '1'))  # 4 = April
+# invoice/bootstrap/ payloads are keyed by company version; the TTL only bounds how long old versions linger
+INVOICE_BOOTSTRAP_CACHE_TTL = int(os.environ.get('INVOICE_BOOTSTRAP_CACHE_TTL', '600'))
+
+
+#! LIST PAGINATION
+# Keyset pagination for list endpoints (?cursor=, ?page_size=, ?include_total=1, or the same keys in a POST body).
+# Compat mode keeps the old unpaginated response for clients that send none of them.
+LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', '50'))
+LIST_MAX_PAGE_SIZE = int(os.environ.get('LIST_MAX_PAGE_SIZE', '500'))
+LIST_PAGINATION_COMPAT = os.environ.get('LIST_PAGINATION_COMPAT', 'True').lower() == 'true'
+# Unpaginated lists can be streamed row by row (?stream=1, or always with LIST_STREAMING)
+LIST_STREAMING = os.environ.get('LIST_STREAMING', 'False').lower() == 'true'
+LIST_STREAM_CHUNK_SIZE = int(os.environ.get('LIST_STREAM_CHUNK_SIZE', '500'))
+
+
+#! DASHBOARD
+# Seconds a company's dashboard payload is reused; any write that moves its totals starts a new one
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', '60'))
+
 
 #! EXCEL
+# Report exports read the database in chunks of this many rows (write_only workbooks, constant memory)
+REPORT_CHUNK_SIZE = int(os.environ.get('REPORT_CHUNK_SIZE', '2000'))
+# Finished exports, one directory per (company, report, filters, data version) under MEDIA_ROOT
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', 'reports')
+# manage.py prune_report_cache removes files unused for this many days
+REPORT_CACHE_MAX_AGE_DAYS = int(os.environ.get('REPORT_CACHE_MAX_AGE_DAYS', '7'))
+# Background report jobs (manage.py run_report_worker)
+REPORT_JOB_PROGRESS_EVERY = int(os.environ.get('REPORT_JOB_PROGRESS_EVERY', '5000'))
+REPORT_JOB_POLL_INTERVAL = float(os.environ.get('REPORT_JOB_POLL_INTERVAL', '2'))
+# A running job without progress for this many seconds is taken to have lost its worker and is queued again
+REPORT_JOB_STALE_AFTER = int(os.environ.get('REPORT_JOB_STALE_AFTER', '600'))
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -192,4 +254,19 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     'company',  # Custom header for company ID
-]
\ No newline at end of file
+    'if-none-match',
+]
+
+# Let the frontend read the query metrics headers
+CORS_EXPOSE_HEADERS = ['ETag', 'Server-Timing', 'X-DB-Queries', 'X-DB-Time', 'X-DB-Rows', 'X-Query-Budget', 'X-Query-Budget-Exceeded']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'erp.query_metrics': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
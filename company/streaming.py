@@ -0,0 +1,70 @@
+"""
+Streaming JSON for the unpaginated list responses.
+
+Instead of building the whole list and rendering it at once, rows are pulled
+from `queryset.iterator(chunk_size=...)`, encoded one by one and sent through
+StreamingHttpResponse in chunks, so memory stays flat however many rows a
+company has. The body is the same JSON the DRF renderer would produce.
+
+Clients opt in with `stream=1` (query string or POST body), or every
+unpaginated list streams when LIST_STREAMING is on.
+"""
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .pagination import TRUE_VALUES, request_param
+
+
+class StreamedArray:
+    """Marks an iterable to be written as a JSON array row by row."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+
+def stream_rows(queryset, build):
+    """`build(obj)` for every row, fetched chunk by chunk."""
+    return StreamedArray(build(obj) for obj in queryset.iterator(chunk_size=settings.LIST_STREAM_CHUNK_SIZE))
+
+
+def wants_stream(request):
+    value = request_param(request, "stream")
+    if value is None:
+        return settings.LIST_STREAMING
+    return str(value).lower() in TRUE_VALUES
+
+
+def dumps(value):
+    # Same options as DRF's JSONRenderer (UNICODE_JSON, COMPACT_JSON, STRICT_JSON)
+    text = json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+    return text.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+def iter_json(value):
+    """JSON text pieces for `value`; dicts may hold StreamedArray values at any depth."""
+    if isinstance(value, StreamedArray):
+        yield "["
+        buffer = []
+        for position, row in enumerate(value.rows):
+            buffer.append(("," if position else "") + dumps(row))
+            if len(buffer) >= settings.LIST_STREAM_CHUNK_SIZE:
+                yield "".join(buffer)
+                buffer = []
+        yield "".join(buffer) + "]"
+    elif isinstance(value, dict):
+        yield "{"
+        for position, (key, item) in enumerate(value.items()):
+            yield ("," if position else "") + dumps(str(key)) + ":"
+            yield from iter_json(item)
+        yield "}"
+    else:
+        yield dumps(value)
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+
+    def __init__(self, data, status=200, **kwargs):
+        super().__init__(iter_json(data), content_type="application/json", status=status, **kwargs)
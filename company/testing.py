@@ -0,0 +1,63 @@
+"""
+Fixtures shared by the app test modules.
+
+    class SomeTests(TestCase):
+
+        @classmethod
+        def setUpTestData(cls):
+            create_invoice_fixture(cls)
+
+        def setUp(self):
+            self.client = company_client(self.owner_user, self.company)
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from companies.models import Company
+from customer.models import Customer
+from invoice.models import Invoice, InvoiceType
+from parties.models import Party
+from staff.permission_cache import clear_permission_cache
+
+
+def create_invoice_fixture(target):
+    """
+    Sets owner_user, customer, company ("Acme"), party ("Buyer"), the sales and
+    purchase invoice types and three sales invoices (INV-1..3, total 100) on
+    `target`, usually the test class in setUpTestData.
+    """
+    target.owner_user = User.objects.create_user(username="owner", password="pass1234")
+    target.customer = Customer.objects.create(user=target.owner_user, phone="9999999999")
+    target.company = Company.objects.create(
+        user=target.owner_user,
+        owner=target.customer,
+        name="Acme",
+        address="Somewhere",
+        phone="9000000001",
+        gst_number="GST-ACME",
+    )
+    target.party = Party.objects.create(name="Buyer", company=target.company)
+    target.sales = InvoiceType.objects.get(code="sales")
+    target.purchase = InvoiceType.objects.get(code="purchase")
+    target.invoices = [
+        Invoice.objects.create(
+            company=target.company,
+            party=target.party,
+            created_by=target.owner_user,
+            invoice_number=f"INV-{n}",
+            invoice_type=target.sales,
+            total=100.0,
+        )
+        for n in range(1, 4)
+    ]
+
+
+def company_client(user, company):
+    """An APIClient authenticated as `user` with `company` in the company header; auth caches start empty."""
+    cache.clear()
+    clear_permission_cache()
+    client = APIClient()
+    client.force_authenticate(user)
+    client.credentials(HTTP_COMPANY=str(company.id))
+    return client
@@ -0,0 +1,113 @@
+import json
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from company.middleware import QueryBudgetExceeded
+from company.testing import company_client, create_invoice_fixture
+from invoice.views import InvoiceListView
+
+
+@override_settings(QUERY_METRICS_ENABLED=True, QUERY_BUDGET_MODE="warn")
+class QueryMetricsMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def test_metrics_headers(self):
+        with self.assertLogs("erp.query_metrics", level="INFO"):
+            response = self.client.post("/invoice/list/", {}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        # customer + owned company + invoice list
+        self.assertEqual(response["X-DB-Queries"], "3")
+        # customer + company + 3 invoices
+        self.assertEqual(response["X-DB-Rows"], "5")
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertEqual(response["X-Query-Budget"], str(InvoiceListView.query_budget))
+        self.assertNotIn("X-Query-Budget-Exceeded", response)
+
+    def test_structured_log_line(self):
+        with self.assertLogs("erp.query_metrics", level="INFO") as logs:
+            self.client.post("/invoice/list/", {}, format="json")
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["view"], "InvoiceListView")
+        self.assertEqual(line["queries"], 3)
+        self.assertGreater(line["bytes"], 0)
+        self.assertFalse(line["over_budget"])
+
+    @mock.patch.object(InvoiceListView, "query_budget", 1)
+    def test_over_budget_is_flagged(self):
+        with self.assertLogs("erp.query_metrics", level="WARNING"):
+            response = self.client.post("/invoice/list/", {}, format="json")
+        self.assertEqual(response["X-Query-Budget-Exceeded"], "1")
+
+    @override_settings(QUERY_BUDGET_MODE="fail")
+    @mock.patch.object(InvoiceListView, "query_budget", 1)
+    def test_over_budget_fails_in_fail_mode(self):
+        with self.assertLogs("erp.query_metrics", level="WARNING"):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.post("/invoice/list/", {}, format="json")
+
+    def test_streamed_list_is_measured_until_the_stream_ends(self):
+        response = self.client.post("/invoice/list/", {"stream": True}, format="json")
+        self.assertTrue(response.streaming)
+        self.assertNotIn("X-DB-Queries", response)
+
+        with self.assertLogs("erp.query_metrics", level="INFO") as logs:
+            body = b"".join(response.streaming_content)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertTrue(line["streamed"])
+        # same work as the buffered list, counted while the body was sent
+        self.assertEqual(line["queries"], 3)
+        self.assertEqual(line["rows"], 5)
+        self.assertEqual(line["bytes"], len(body))
+
+    @override_settings(QUERY_BUDGET_MODE="fail")
+    @mock.patch.object(InvoiceListView, "query_budget", 1)
+    def test_streamed_list_over_budget_fails_at_the_end(self):
+        response = self.client.post("/invoice/list/", {"stream": True}, format="json")
+        with self.assertLogs("erp.query_metrics", level="WARNING"):
+            with self.assertRaises(QueryBudgetExceeded):
+                b"".join(response.streaming_content)
+
+    def test_stream_closed_before_the_first_chunk_unwraps_the_connection(self):
+        response = self.client.post("/invoice/list/", {"stream": True}, format="json")
+        self.assertNotEqual(connection.execute_wrappers, [])
+
+        with self.assertLogs("erp.query_metrics", level="INFO") as logs:
+            response.close()
+        self.assertEqual(connection.execute_wrappers, [])
+        self.assertNotIn("cursor", vars(connection))
+        self.assertEqual(json.loads(logs.records[-1].getMessage())["bytes"], 0)
+
+    @override_settings(QUERY_BUDGET_MODE="fail")
+    def test_hot_views_stay_within_budget(self):
+        invoice_id = self.invoices[0].id
+        with self.assertLogs("erp.query_metrics", level="INFO") as logs:
+            self.client.post("/invoice/list/", {}, format="json")
+            self.client.get(f"/invoice/{invoice_id}/")
+            self.client.post("/parties/", {"company": self.company.id}, format="json")
+            self.client.post("/payments/list/", {}, format="json")
+            self.client.post("/items/", {"company": self.company.id, "customer_id": self.customer.id}, format="json")
+        self.assertEqual(len(logs.records), 5)
+
+
+class QueryMetricsDisabledTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def test_no_headers_when_disabled(self):
+        response = self.client.post("/invoice/list/", {}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-DB-Queries", response)
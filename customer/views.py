@@ -10,7 +10,9 @@ from rest_framework_simplejwt.tokens import RefreshToken,TokenError
 from rest_framework.permissions import IsAuthenticated
 from .models import Customer
 from staff.permission import *
+from staff.tokens import access_token_with_claims
 from companies.serializers import *
+from company.pagination import KeysetPaginator
 
 
 class RegisterView(APIView):
@@ -54,7 +56,7 @@ class LoginView(APIView):
                 refresh = RefreshToken.for_user(user)
                 return Response({
                     'refresh_token': str(refresh),
-                    'access_token': str(refresh.access_token),
+                    'access_token': access_token_with_claims(refresh.access_token, user),
                     'username': user.username,
                     'email': user.email
                 }, status=200)
@@ -99,7 +101,7 @@ class RefreshTokenView(APIView):
             refresh = RefreshToken(refresh_token)
             access_token = refresh.access_token
             return Response({
-                "access_token": str(access_token)
+                "access_token": access_token_with_claims(access_token)
             }, status=200)
         except TokenError:
             return Response({"error": "Invalid refresh token"}, status=401)
@@ -160,9 +162,10 @@ class CustomerListView(APIView):
    
 
     def get(self, request):
-        customers = Customer.objects.filter(is_active=True)
+        paginator = KeysetPaginator(request)
+        customers = paginator.paginate(Customer.objects.filter(is_active=True), ("id",))
         serializer = CustomerSerializer(customers, many=True)
-        return Response(serializer.data)
+        return Response(paginator.wrap(serializer.data))
 
 
 # ----------- Retrieve Single Customer -----------
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class InvoiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'invoice'
+
+    def ready(self):
+        # Keep the in-memory reference tables in step with admin/API edits
+        from .reference import connect_signals
+        connect_signals()
@@ -0,0 +1,92 @@
+"""
+Everything the invoice form needs, in one response (invoice/bootstrap/).
+
+The reference tables come from the in-process registry (no queries); parties,
+items and bank accounts are one .values() query each, limited to the columns
+the form uses. The payload is cached per company version: the reference
+version plus the catalog version (count + max updated_at) of the three
+catalogs, read in a single query. A write to any of them changes the version,
+so a cached payload is never stale, and the same version is the ETag.
+
+Each catalog is only sent to users who may list it (CATALOG_PERMISSIONS);
+the sections a user gets are part of the version, so payloads of different
+permission sets never share a cache entry or an ETag.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from company.conditional import catalog_versions
+from items.models import Item, UnitType
+from parties.models import Party, PartyType
+from .models import BankAccount, InvoiceType, PaymentMode, PaymentType
+from .reference import reference_rows, reference_version
+
+
+PARTY_FIELDS = ("id", "name", "phone", "gst_number", "address", "party_type_id")
+ITEM_FIELDS = ("id", "name", "code", "unit_id", "quantity", "price", "sales_price", "tax_applied", "tax_percent")
+BANK_ACCOUNT_FIELDS = ("id", "bank_name", "account_no", "ifsc_code", "bank_branch", "current_balance")
+
+# catalog -> (module, permission) of the list endpoint that serves it
+CATALOG_PERMISSIONS = {
+    "parties": ("Party", "get_using_post"),
+    "items": ("Items", "get_using_post"),
+    "bank_accounts": ("Bank Transaction", "get_using_post"),
+}
+
+
+def allowed_catalogs(context):
+    """Names of the catalogs the AuthContext may list, in a fixed order."""
+    return tuple(
+        name for name, (module, permission) in CATALOG_PERMISSIONS.items()
+        if context.has_module_permission(module, permission)
+    )
+
+
+def catalogs(company_id, sections=tuple(CATALOG_PERMISSIONS)):
+    querysets = {
+        "parties": Party.objects.filter(company_id=company_id, deleted=False),
+        "items": Item.objects.filter(company_id=company_id, is_active=True),
+        "bank_accounts": BankAccount.objects.filter(company_id=company_id, deleted=False),
+    }
+    return {name: querysets[name] for name in sections}
+
+
+def bootstrap_version(company_id, sections=tuple(CATALOG_PERMISSIONS)):
+    querysets = catalogs(company_id, sections)
+    versions = catalog_versions(company_id, **querysets) if querysets else {}
+    key = "|".join(
+        [str(reference_version()), ",".join(sections)]
+        + [f"{name}={version}" for name, version in sorted(versions.items())]
+    )
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def build_bootstrap(company_id, sections=tuple(CATALOG_PERMISSIONS)):
+    querysets = catalogs(company_id, sections)
+    fields = {"parties": PARTY_FIELDS, "items": ITEM_FIELDS, "bank_accounts": BANK_ACCOUNT_FIELDS}
+    payload = {
+        "invoice_types": [{"id": t.id, "name": t.name, "code": t.code} for t in reference_rows(InvoiceType)],
+        "payment_types": [{"id": t.id, "name": t.name} for t in reference_rows(PaymentType)],
+        "payment_modes": [{"id": m.id, "name": m.name, "code": m.code} for m in reference_rows(PaymentMode)],
+        "party_types": [{"id": t.id, "name": t.name} for t in reference_rows(PartyType)],
+        "units": [
+            {"id": u.id, "name": u.name, "code": u.code}
+            for u in sorted(reference_rows(UnitType), key=lambda unit: unit.name)
+        ],
+    }
+    for name, queryset in querysets.items():
+        payload[name] = list(queryset.order_by("id").values(*fields[name]))
+    return payload
+
+
+def invoice_bootstrap(company_id, version=None, sections=tuple(CATALOG_PERMISSIONS)):
+    """(version, payload) for a company, from the cache when the version has not moved."""
+    version = version or bootstrap_version(company_id, sections)
+    key = f"invoice-bootstrap:{company_id}:{version}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_bootstrap(company_id, sections)
+        cache.set(key, payload, timeout=settings.INVOICE_BOOTSTRAP_CACHE_TTL)
+    return version, payload
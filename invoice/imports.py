@@ -0,0 +1,371 @@
+"""
+Bulk invoice import (invoice/import/).
+
+Input is streamed, never loaded whole: JSON lines (one invoice per line) or CSV
+(one line item per row, consecutive rows sharing a `ref` form one invoice).
+Parties, items and invoice types are preloaded once, invoices are validated
+against those maps and committed chunk by chunk, each chunk in its own
+transaction with a block of invoice numbers.
+"""
+import codecs
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from companies.summary import record_created
+from items.models import Item
+from parties.models import Party
+from .models import Invoice, InvoiceItem, InvoiceType, PaymentStatus
+from .reference import reference_by_code, reference_rows
+from .utils import apply_stock_changes, build_invoice_items, generate_invoice_numbers, price_line
+
+
+DEFAULT_CHUNK_SIZE = 200
+MAX_CHUNK_SIZE = 2000
+
+CSV_COLUMNS = ["ref", "party", "invoice_type", "item", "quantity"]
+
+# What a chunk may fail with and still let the import go on; anything else is a bug and propagates
+CHUNK_ERRORS = (ValidationError, IntegrityError, ParseError)
+
+
+#! parsers
+def decoded_lines(stream, bad_lines):
+    """
+    Decodes line by line, so one line that is not UTF-8 fails its own record
+    instead of the request: it is decoded with replacement characters and its
+    number added to bad_lines.
+    """
+    for number, raw in enumerate(stream, start=1):
+        if isinstance(raw, str):
+            yield raw
+            continue
+        try:
+            yield raw.decode("utf-8-sig" if number == 1 else "utf-8")
+        except UnicodeDecodeError:
+            bad_lines.add(number)
+            yield raw.decode("utf-8", errors="replace")
+
+
+def jsonl_records(stream):
+    """(row number, invoice dict or None, error) per non-empty line."""
+    bad_lines = set()
+    for row, line in enumerate(decoded_lines(stream, bad_lines), start=1):
+        if row in bad_lines:
+            yield row, None, "Line is not valid UTF-8."
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield row, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "Each line must be a JSON object."
+            continue
+        yield row, record, None
+
+
+def csv_rows(reader, bad_lines):
+    """(row number, values or None, error) per CSV row; unreadable rows are reported, not raised."""
+    row = 1
+    while True:
+        first_line = reader.line_num + 1
+        row += 1
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            yield row, None, f"Unreadable CSV row: {exc}"
+            continue
+        if any(first_line <= number <= reader.line_num for number in bad_lines):
+            yield row, values, "Row is not valid UTF-8."
+        else:
+            yield row, values, None
+
+
+def csv_records(stream):
+    """
+    Groups consecutive rows with the same ref into one invoice dict. A row that
+    cannot be read fails its invoice; when even its ref is unknown, it fails the
+    invoices on both sides of it, so no invoice is imported without one of its lines.
+    """
+    bad_lines = set()
+    reader = csv.DictReader(decoded_lines(stream, bad_lines))
+    try:
+        fieldnames = reader.fieldnames or []
+    except csv.Error as exc:
+        raise ParseError(f"Unreadable CSV header: {exc}")
+    missing = [column for column in CSV_COLUMNS if column not in fieldnames]
+    if missing:
+        raise ParseError(f"CSV is missing columns: {', '.join(missing)}")
+
+    current, first_row, errors, unreadable = None, None, [], None
+    for row, values, error in csv_rows(reader, bad_lines):
+        if values is None:
+            if current is not None:
+                errors.append(f"Row {row}: {error}")
+            unreadable = f"Row {row}: {error}"
+            continue
+        if current is None or values["ref"] != current["ref"]:
+            if current is not None:
+                yield first_row, current, "; ".join(errors) or None
+            current, first_row, errors = {
+                "ref": values["ref"],
+                "party": values["party"],
+                "invoice_type": values["invoice_type"],
+                "notes": values.get("notes") or "",
+                "discount_percent": values.get("invoice_discount_percent") or 0,
+                "items": [],
+            }, row, []
+        if unreadable and unreadable not in errors:
+            errors.append(unreadable)
+        unreadable = None
+        if error:
+            errors.append(f"Row {row}: {error}")
+        current["items"].append({
+            "item": values["item"],
+            "quantity": values["quantity"],
+            "discount_percent": values.get("discount_percent") or 0,
+        })
+    if current is not None:
+        yield first_row, current, "; ".join(errors) or None
+    elif unreadable:
+        yield row, None, unreadable
+
+
+class JSONLinesParser(BaseParser):
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return {"records": jsonl_records(stream or [])}
+
+
+class InvoiceCSVParser(BaseParser):
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return {"records": csv_records(stream or [])}
+
+
+def records_from_upload(upload, file_format=None):
+    file_format = file_format or ("csv" if upload.name.lower().endswith(".csv") else "jsonl")
+    return csv_records(upload) if file_format == "csv" else jsonl_records(upload)
+
+
+#! import
+class InvoiceImporter:
+    """
+    Validates invoice dicts against preloaded maps and writes them in chunks.
+    Pricing, tax and stock go through the same helpers as CreateInvoiceView.
+    """
+
+    def __init__(self, company, user, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.company = company
+        self.user = user
+        self.chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE))
+        self.results = []
+        # Stock of the items the current chunk touched, as it was before the chunk's projection
+        self.stock_before = {}
+
+        parties = list(Party.objects.filter(company=company, deleted=False))
+        self.parties_by_id = {party.id: party for party in parties}
+        self.parties_by_name = {party.name.lower(): party for party in parties}
+
+        # Soft-deleted items are left out; CreateInvoiceView still accepts them by id
+        items = list(Item.objects.filter(company=company, is_active=True))
+        self.items_by_id = {item.id: item for item in items}
+        self.items_by_code = {item.code.lower(): item for item in items}
+
+        invoice_types = reference_rows(InvoiceType)
+        self.types_by_id = {invoice_type.id: invoice_type for invoice_type in invoice_types}
+        self.types_by_code = {invoice_type.code.lower(): invoice_type for invoice_type in invoice_types}
+
+    @staticmethod
+    def _lookup(value, by_id, by_key):
+        """Ids (int or digit string) first, then the natural key (name / code)."""
+        if value is None or value == "":
+            return None
+        if isinstance(value, int) or str(value).strip().isdigit():
+            found = by_id.get(int(value))
+            if found:
+                return found
+        return by_key.get(str(value).strip().lower())
+
+    def validate(self, record):
+        """Returns (pending invoice dict, errors, warnings)."""
+        errors, warnings = [], []
+
+        party = self._lookup(record.get("party"), self.parties_by_id, self.parties_by_name)
+        if not party:
+            errors.append(f"Unknown party '{record.get('party')}'.")
+
+        invoice_type = self._lookup(record.get("invoice_type"), self.types_by_id, self.types_by_code)
+        if not invoice_type:
+            errors.append(f"Unknown invoice type '{record.get('invoice_type')}'.")
+
+        try:
+            invoice_discount_percent = float(record.get("discount_percent") or 0)
+        except (TypeError, ValueError):
+            errors.append("Invalid discount_percent.")
+            invoice_discount_percent = 0.0
+
+        lines = record.get("items") or []
+        if not isinstance(lines, list) or not lines:
+            errors.append("An invoice needs at least one item.")
+            lines = []
+
+        is_sales = bool(invoice_type) and invoice_type.code.lower() == "sales"
+        item_rows, subtotal = [], 0.0
+        for number, line in enumerate(lines, start=1):
+            if not isinstance(line, dict):
+                errors.append(f"Line {number}: must be an object.")
+                continue
+            item_obj = self._lookup(line.get("item"), self.items_by_id, self.items_by_code)
+            if not item_obj:
+                errors.append(f"Line {number}: item '{line.get('item')}' not found in this company.")
+                continue
+            try:
+                quantity = float(line.get("quantity"))
+                discount_percent = float(line.get("discount_percent") or 0)
+            except (TypeError, ValueError):
+                errors.append(f"Line {number}: invalid quantity or discount_percent.")
+                continue
+            if not quantity.is_integer():
+                errors.append(f"Line {number}: quantity must be a whole number.")
+                continue
+            quantity = int(quantity)
+            if quantity <= 0:
+                errors.append(f"Line {number}: quantity must be positive.")
+                continue
+
+            if is_sales and item_obj.quantity < quantity:
+                warnings.append(
+                    f"Item '{item_obj.name}' has only {item_obj.quantity} in stock, but {quantity} were requested."
+                )
+            row = price_line(item_obj, quantity, discount_percent)
+            subtotal += row["taxable_amount"]
+            item_rows.append(row)
+
+        if errors:
+            return None, errors, warnings
+
+        return {
+            "party": party,
+            "invoice_type": invoice_type,
+            "notes": record.get("notes") or "",
+            "discount_percent": invoice_discount_percent,
+            "item_rows": item_rows,
+            "subtotal": subtotal,
+        }, errors, warnings
+
+    def run(self, records):
+        """records: (row, invoice dict, parse error) tuples. Returns the per-row report."""
+        chunk = []
+        for row, record, parse_error in records:
+            result = {"row": row, "ref": (record or {}).get("ref")}
+            self.results.append(result)
+
+            if parse_error:
+                result.update(status="error", errors=[parse_error])
+                continue
+
+            pending, errors, warnings = self.validate(record)
+            if warnings:
+                result["warnings"] = warnings
+            if errors:
+                result.update(status="error", errors=errors)
+                continue
+
+            self.project_stock(pending)
+            chunk.append((result, pending))
+            if len(chunk) >= self.chunk_size:
+                self.commit(chunk)
+                chunk = []
+
+        if chunk:
+            self.commit(chunk)
+        return self.results
+
+    def project_stock(self, pending):
+        """Moves the preloaded stock in memory so later rows of the import warn correctly."""
+        code = pending["invoice_type"].code.lower()
+        for row in pending["item_rows"]:
+            item_obj = row["item"]
+            self.stock_before.setdefault(item_obj.id, item_obj.quantity)
+            if code == "purchase":
+                item_obj.quantity += row["quantity"]
+            elif code == "sales":
+                item_obj.quantity = max(item_obj.quantity - row["quantity"], 0)
+
+    def commit(self, chunk):
+        """One transaction per chunk; a failing chunk is reported and the import goes on."""
+        try:
+            with transaction.atomic():
+                self._write(chunk)
+        except CHUNK_ERRORS as exc:
+            # Nothing was written: later rows are checked against the stock as it really is
+            for item_id, quantity in self.stock_before.items():
+                self.items_by_id[item_id].quantity = quantity
+            self.stock_before = {}
+            for result, _ in chunk:
+                result.update(status="error", errors=[f"Chunk rolled back: {exc}"])
+                for key in ("invoice_id", "invoice_number", "total_amount"):
+                    result.pop(key, None)
+            return
+
+        self.stock_before = {}
+        for result, _ in chunk:
+            result["status"] = "created"
+
+    def _write(self, chunk):
+        numbers = generate_invoice_numbers(self.company, len(chunk))
+        invoices, invoice_items = [], []
+        sales_rows, purchase_rows = [], []
+
+        for (result, pending), invoice_number in zip(chunk, numbers):
+            subtotal = pending["subtotal"]
+            invoice_discount_amount = subtotal * (pending["discount_percent"] / 100)
+            invoice = Invoice(
+                company=self.company,
+                party=pending["party"],
+                created_by=self.user,
+                invoice_number=invoice_number,
+                invoice_type=pending["invoice_type"],
+                notes=pending["notes"],
+                discount_percent=pending["discount_percent"],
+                discount_amount=invoice_discount_amount,
+                payment_status=reference_by_code(PaymentStatus, "Unpaid"),
+            )
+            items, tax_total, invoice_total = build_invoice_items(
+                invoice, pending["item_rows"], subtotal, invoice_discount_amount
+            )
+            invoice.subtotal = subtotal
+            invoice.tax_amount = tax_total
+            invoice.total = invoice_total
+            invoice.remaining_balance = invoice_total
+
+            invoices.append(invoice)
+            invoice_items.extend(items)
+            code = pending["invoice_type"].code.lower()
+            if code == "sales":
+                sales_rows.extend(pending["item_rows"])
+            elif code == "purchase":
+                purchase_rows.extend(pending["item_rows"])
+            result.update(invoice_number=invoice_number, total_amount=invoice_total)
+
+        Invoice.objects.bulk_create(invoices)
+        # bulk_create filled invoice.pk; the line items pick it up here
+        InvoiceItem.objects.bulk_create(invoice_items)
+        record_created(Invoice, invoices)
+        apply_stock_changes(sales_rows, is_purchase=False, is_sales=True)
+        apply_stock_changes(purchase_rows, is_purchase=True, is_sales=False)
+
+        for (result, _), invoice in zip(chunk, invoices):
+            result["invoice_id"] = invoice.id
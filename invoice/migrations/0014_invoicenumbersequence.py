@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0006_company_owner'),
+        ('invoice', '0013_alter_invoice_company_alter_invoice_created_by_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=20)),
+                ('fiscal_year', models.PositiveIntegerField()),
+                ('last_number', models.PositiveIntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='invoice_sequences', to='companies.company')),
+            ],
+            options={
+                'unique_together': {('company', 'prefix', 'fiscal_year')},
+            },
+        ),
+    ]
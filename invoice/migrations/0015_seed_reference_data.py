@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+PAYMENT_STATUSES = [(1, "Unpaid"), (2, "Partially Paid"), (3, "Paid")]
+INVOICE_TYPES = [("Sales Invoice", "sales"), ("Purchase Invoice", "purchase")]
+PAYMENT_TYPES = ["Cash", "Bank"]
+PAYMENT_MODES = [("On Account", "on_account"), ("Advance", "advance")]
+
+
+def seed_reference_data(apps, schema_editor):
+    PaymentStatus = apps.get_model("invoice", "PaymentStatus")
+    InvoiceType = apps.get_model("invoice", "InvoiceType")
+    PaymentType = apps.get_model("invoice", "PaymentType")
+    PaymentMode = apps.get_model("invoice", "PaymentMode")
+
+    for status_id, label in PAYMENT_STATUSES:
+        PaymentStatus.objects.get_or_create(id=status_id, defaults={"label": label})
+    # Rows created earlier by the list views may match on either unique field
+    for name, code in INVOICE_TYPES:
+        if not InvoiceType.objects.filter(Q(name=name) | Q(code=code)).exists():
+            InvoiceType.objects.create(name=name, code=code)
+    for name in PAYMENT_TYPES:
+        PaymentType.objects.get_or_create(name=name)
+    for name, code in PAYMENT_MODES:
+        if not PaymentMode.objects.filter(Q(name=name) | Q(code=code)).exists():
+            PaymentMode.objects.create(name=name, code=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0014_invoicenumbersequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_reference_data, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0006_company_owner'),
+        ('invoice', '0015_seed_reference_data'),
+        ('parties', '0004_seed_party_types'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', 'invoice_type', 'is_deleted', 'created_at', 'total', 'amount_paid'], name='invoice_dashboard_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['company', 'payment_status'], name='invoice_status_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', 'created_at', 'id'], name='invoice_company_created_idx'),
+        ),
+    ]
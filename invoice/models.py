@@ -1,6 +1,6 @@
 from django.db import models
 from django.conf import settings
-from companies.models import Company
+from companies.models import Company, SummarizedSaveMixin
 from items.models import Item
 from parties.models import Party
 
@@ -40,7 +40,7 @@ class InvoiceType(models.Model):
         return self.name
 
 
-class Invoice(models.Model):
+class Invoice(SummarizedSaveMixin, models.Model):
     company = models.ForeignKey(Company, on_delete=models.DO_NOTHING, related_name='invoices')
     party = models.ForeignKey(Party, on_delete=models.DO_NOTHING)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING)
@@ -68,6 +68,23 @@ class Invoice(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_deleted = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Dashboard counts/sums per type; total and amount_paid make it covering for the sums
+            models.Index(
+                fields=['company', 'invoice_type', 'is_deleted', 'created_at', 'total', 'amount_paid'],
+                name='invoice_dashboard_idx',
+            ),
+            # Sales / purchase reports by payment status
+            models.Index(
+                fields=['company', 'payment_status'],
+                condition=models.Q(is_deleted=False),
+                name='invoice_status_live_idx',
+            ),
+            # Invoice list keyset order
+            models.Index(fields=['company', 'created_at', 'id'], name='invoice_company_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.invoice_number} ({self.invoice_type.code})"
 
@@ -85,7 +102,21 @@ class InvoiceItem(models.Model):
         return f"{self.item.name} x {self.quantity}"
 
 
-class BankAccount(models.Model):
+class InvoiceNumberSequence(models.Model):
+    """Last invoice number handed out per company, prefix and fiscal year (see utils.allocate_invoice_numbers)."""
+    company = models.ForeignKey(Company, on_delete=models.DO_NOTHING, related_name='invoice_sequences')
+    prefix = models.CharField(max_length=20)
+    fiscal_year = models.PositiveIntegerField()  # year the fiscal year starts in
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('company', 'prefix', 'fiscal_year')
+
+    def __str__(self):
+        return f"{self.company_id} {self.prefix} {self.fiscal_year}: {self.last_number}"
+
+
+class BankAccount(SummarizedSaveMixin, models.Model):
     account_no = models.CharField(max_length=18, null=True, blank=True)
     user = models.CharField(max_length=50, null=True, blank=True)
     ifsc_code = models.CharField(max_length=11, null=True, blank=True)
@@ -99,6 +130,17 @@ class BankAccount(models.Model):
     swift_code = models.CharField(max_length=100, null=True, blank=True)
     ad_code = models.CharField(max_length=250, null=True, blank=True)
     deleted = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Catalog version (max updated_at + count) straight from the index
+            models.Index(
+                fields=['company', 'updated_at'],
+                condition=models.Q(deleted=False),
+                name='bankaccount_company_upd_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.bank_name} ({self.account_no})"
@@ -0,0 +1,106 @@
+"""
+Lookup tables served from process memory: payment statuses, invoice types,
+payment types, payment modes, units and party types.
+
+The default rows are seeded by migrations. Each process loads all six tables
+once; saving or deleting any row bumps a version in the shared cache and every
+process reloads on its next lookup. Lookups cost no queries.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from items.models import UnitType
+from parties.models import PartyType
+from .models import InvoiceType, PaymentMode, PaymentStatus, PaymentType
+
+
+# model -> field resolved by reference_by_code (case-insensitive)
+REFERENCE_MODELS = {
+    PaymentStatus: "label",
+    InvoiceType: "code",
+    PaymentType: "name",
+    PaymentMode: "code",
+    UnitType: "code",
+    PartyType: "name",
+}
+
+VERSION_KEY = "reference_data_version"
+
+_snapshot = {"version": None, "tables": {}}
+
+
+def _new_version():
+    return int(time.time() * 1000)
+
+
+def _load():
+    tables = {}
+    for model, key_field in REFERENCE_MODELS.items():
+        rows = tuple(model.objects.order_by("id"))
+        tables[model] = {
+            "rows": rows,
+            "by_id": {row.pk: row for row in rows},
+            "by_key": {str(getattr(row, key_field)).lower(): row for row in rows},
+        }
+    return tables
+
+
+def _table(model):
+    global _snapshot
+    version = cache.get_or_set(VERSION_KEY, _new_version, timeout=None)
+    snapshot = _snapshot
+    if snapshot["version"] != version:
+        # Swap the whole snapshot at once, readers in other threads keep a consistent one
+        snapshot = {"version": version, "tables": _load()}
+        _snapshot = snapshot
+    return snapshot["tables"][model]
+
+
+#! lookups
+def reference_rows(model):
+    """All rows of a reference table, ordered by id. Shared instances: do not modify them."""
+    return _table(model)["rows"]
+
+
+def reference_by_id(model, pk):
+    try:
+        return _table(model)["by_id"].get(int(pk))
+    except (TypeError, ValueError):
+        return None
+
+
+def reference_by_code(model, code):
+    """By code (InvoiceType, PaymentMode, UnitType), name (PaymentType, PartyType) or label (PaymentStatus)."""
+    if code is None:
+        return None
+    return _table(model)["by_key"].get(str(code).lower())
+
+
+def reference_version():
+    """Changes whenever any reference row is saved or deleted."""
+    return cache.get_or_set(VERSION_KEY, _new_version, timeout=None)
+
+
+#! invalidation
+def bump_reference_version(**kwargs):
+    def _bump():
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, _new_version(), timeout=None)
+
+    transaction.on_commit(_bump)
+
+
+def connect_signals():
+    for model in REFERENCE_MODELS:
+        post_save.connect(bump_reference_version, sender=model, dispatch_uid=f"reference-save-{model.__name__}")
+        post_delete.connect(bump_reference_version, sender=model, dispatch_uid=f"reference-delete-{model.__name__}")
+
+
+def clear_reference_cache():
+    global _snapshot
+    _snapshot = {"version": None, "tables": {}}
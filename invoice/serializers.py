@@ -3,6 +3,7 @@ from .models import *
 from companies.serializers import *
 from parties.serializers import *
 from items.serializer import *
+from .reference import reference_by_id
 
 
 # class InvoiceItemSerializer(serializers.ModelSerializer):
@@ -37,10 +38,24 @@ from items.serializer import *
 #             'created_at', 'updated_at', 'items'
 #         ]
 
+class ReferenceRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField resolved from the in-memory reference registry, no query."""
+
+    def __init__(self, model, **kwargs):
+        self.reference_model = model
+        super().__init__(queryset=model.objects.all(), **kwargs)
+
+    def to_internal_value(self, data):
+        instance = reference_by_id(self.reference_model, data)
+        if instance is None:
+            self.fail("does_not_exist", pk_value=data)
+        return instance
+
+
 class InvoiceSerializer(serializers.ModelSerializer):
     
     party = serializers.PrimaryKeyRelatedField(queryset=Party.objects.all())
-    invoice_type = serializers.PrimaryKeyRelatedField(queryset=InvoiceType.objects.all())
+    invoice_type = ReferenceRelatedField(InvoiceType)
     class Meta:
         model = Invoice
         fields = ['company', 'party', 'invoice_number', 'notes','invoice_type']  
@@ -1,3 +1,647 @@
-from django.test import TestCase
+import csv
+import json
+import re
+import unittest
+from unittest import mock
+from datetime import date
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from companies.models import Company
+from company.pagination import keyset_after
+from company.testing import company_client, create_invoice_fixture
+from invoice.imports import InvoiceImporter
+from invoice.models import BankAccount, Invoice, InvoiceItem, InvoiceNumberSequence, InvoiceType, PaymentMode, PaymentStatus
+from invoice.reference import reference_by_code, reference_by_id, reference_rows
+from invoice.utils import allocate_invoice_numbers
+from items.models import Item, UnitType
+from parties.models import Party
+from payments.models import BankToBankTransfer, BankTransaction, PaymentIn, PaymentOut
+from staff.models import ModulePermission, Role, StaffProfile
+
+
+class CreateInvoiceBatchingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+        unit = UnitType.objects.get(code="pcs")
+        cls.items = [
+            Item.objects.create(
+                name=f"Item {n}", code=f"I{n}", quantity=10, unit=unit, price=80.0,
+                sales_price=100.0, tax_applied=True, tax_percent=10.0, company=cls.company,
+            )
+            for n in range(30)
+        ]
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def create_invoice(self, lines, invoice_type=None, discount_percent=0):
+        return self.client.post("/invoice/create/", {
+            "company": self.company.id,
+            "party": self.party.id,
+            "invoice_type": (invoice_type or self.sales).id,
+            "discount_percent": discount_percent,
+            "items": lines,
+        }, format="json")
+
+    def test_query_count_does_not_grow_with_lines(self):
+        # Warm-up: creates the payment status rows
+        self.create_invoice([{"item": self.items[0].id, "quantity": 1}])
+        counts = []
+        for size in (1, 25):
+            lines = [{"item": item.id, "quantity": 1} for item in self.items[:size]]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.create_invoice(lines)
+            self.assertEqual(response.data["status"], 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_totals_and_stock_changes(self):
+        first, second = self.items[0], self.items[1]
+        response = self.create_invoice([
+            {"item": first.id, "quantity": 4, "discount_percent": 50},
+            {"item": second.id, "quantity": 15},
+            {"item": first.id, "quantity": 2},
+        ], discount_percent=10)
+        self.assertEqual(response.data["status"], 200)
+        self.assertEqual(response.data["warnings"], ["Item 'Item 1' has only 10 in stock, but 15 were requested."])
+
+        # subtotal 200 + 1500 + 200 = 1900, less 10% = 1710, plus 10% tax
+        self.assertAlmostEqual(response.data["total_amount"], 1881.0)
+        self.assertEqual(InvoiceItem.objects.filter(invoice_id=response.data["invoice_id"]).count(), 3)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.quantity, 4)
+        self.assertEqual(second.quantity, 0)
+
+        self.create_invoice([{"item": second.id, "quantity": 7}], invoice_type=self.purchase)
+        second.refresh_from_db()
+        self.assertEqual(second.quantity, 7)
+
+    def test_item_of_another_company_is_rejected(self):
+        response = self.create_invoice([{"item": self.items[0].id + 1000, "quantity": 1}])
+        self.assertEqual(response.data["status"], 400)
+        self.assertEqual(Invoice.objects.count(), len(self.invoices))
+
+
+class BulkImportInvoiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+        unit = UnitType.objects.get(code="pcs")
+        cls.pen = Item.objects.create(
+            name="Pen", code="PEN", quantity=10, unit=unit, price=5.0,
+            sales_price=10.0, tax_applied=False, tax_percent=0.0, company=cls.company,
+        )
+        cls.ink = Item.objects.create(
+            name="Ink", code="INK", quantity=0, unit=unit, price=20.0,
+            sales_price=50.0, tax_applied=True, tax_percent=10.0, company=cls.company,
+        )
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def import_jsonl(self, records, chunk_size=2):
+        body = "\n".join(r if isinstance(r, str) else json.dumps(r) for r in records)
+        return self.client.post(
+            f"/invoice/import/?chunk_size={chunk_size}", body, content_type="application/x-ndjson"
+        )
+
+    def test_jsonl_import_with_row_report(self):
+        response = self.import_jsonl([
+            {"ref": "A", "party": self.party.id, "invoice_type": "sales", "items": [{"item": "pen", "quantity": 3}]},
+            {"ref": "B", "party": "Nobody", "invoice_type": "sales", "items": [{"item": "PEN", "quantity": 1}]},
+            "{not json",
+            {"ref": "C", "party": "buyer", "invoice_type": "purchase", "items": [{"item": self.ink.id, "quantity": 4}]},
+            {"ref": "D", "party": self.party.id, "invoice_type": "sales", "discount_percent": 10,
+             "items": [{"item": "PEN", "quantity": 2}, {"item": "INK", "quantity": 1}]},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["failed"]), (3, 2))
+
+        results = {r["row"]: r for r in response.data["results"]}
+        self.assertEqual(results[1]["status"], "created")
+        self.assertIn("Unknown party", results[2]["errors"][0])
+        self.assertIn("Invalid JSON", results[3]["errors"][0])
+        # (20 + 50) less 10%, tax on the ink share only
+        self.assertAlmostEqual(results[5]["total_amount"], 18 + 45 + 4.5)
+
+        numbers = [results[row]["invoice_number"] for row in (1, 4, 5)]
+        self.assertEqual(len(set(numbers)), 3)
+        self.assertEqual(Invoice.objects.filter(invoice_number__in=numbers).count(), 3)
+
+        self.pen.refresh_from_db()
+        self.ink.refresh_from_db()
+        self.assertEqual(self.pen.quantity, 10 - 3 - 2)
+        self.assertEqual(self.ink.quantity, 4 - 1)
+
+    def test_csv_rows_are_grouped_by_ref(self):
+        body = (
+            "ref,party,invoice_type,item,quantity,discount_percent\n"
+            f"POS-1,{self.party.name},sales,PEN,1,\n"
+            "POS-1,Buyer,sales,INK,2,50\n"
+            "POS-2,Buyer,sales,PEN,1,\n"
+        )
+        response = self.client.post("/invoice/import/", body, content_type="text/csv")
+        self.assertEqual(response.data["created"], 2)
+        first = Invoice.objects.get(id=response.data["results"][0]["invoice_id"])
+        self.assertEqual(first.items.count(), 2)
+        self.assertAlmostEqual(first.total, 10 + 55)
+
+    def test_csv_missing_columns(self):
+        response = self.client.post("/invoice/import/", "ref,party\nA,Buyer\n", content_type="text/csv")
+        self.assertEqual(response.status_code, 400)
+
+    def test_undecodable_lines_fail_their_own_row(self):
+        sale = json.dumps({"party": self.party.id, "invoice_type": "sales", "items": [{"item": "PEN", "quantity": 1}]})
+        body = b"\n".join([sale.encode(), b'{"party": "\xff"}', sale.encode()])
+        response = self.client.post("/invoice/import/?chunk_size=1", body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["created", "error", "created"])
+        self.assertIn("UTF-8", response.data["results"][1]["errors"][0])
+
+    def test_unreadable_csv_rows_fail_their_invoice(self):
+        body = (
+            b"ref,party,invoice_type,item,quantity\n"
+            b"POS-1,Buyer,sales,PEN,1\n"
+            b"POS-2,Buyer,sales,PEN,1\n"
+            b"POS-2,Buy\xffer,sales,INK,1\n"
+            b"POS-3,Buyer,sales,PEN,1\n"
+            b"POS-4,Buyer,sales,PEN," + b"1" * (csv.field_size_limit() + 1) + b"\n"
+            b"POS-5,Buyer,sales,PEN,1\n"
+        )
+        response = self.client.post("/invoice/import/?chunk_size=1", body, content_type="text/csv")
+        self.assertEqual(response.status_code, 200)
+        statuses = {r["ref"]: r["status"] for r in response.data["results"]}
+        # POS-4's row has no readable ref: the invoices on both sides of it fail
+        self.assertEqual(statuses, {"POS-1": "created", "POS-2": "error", "POS-3": "error", "POS-5": "error"})
+        self.assertEqual(Invoice.objects.filter(items__item=self.ink).count(), 0)
+
+    def test_fractional_quantities_are_rejected(self):
+        response = self.import_jsonl([
+            {"party": self.party.id, "invoice_type": "sales", "items": [{"item": "PEN", "quantity": 2.5}]},
+            {"party": self.party.id, "invoice_type": "sales", "items": [{"item": "PEN", "quantity": "2.0"}]},
+        ])
+        first, second = response.data["results"]
+        self.assertIn("whole number", first["errors"][0])
+        self.assertEqual(second["status"], "created")
+
+    def test_file_upload(self):
+        line = json.dumps({"party": self.party.id, "invoice_type": "sales", "items": [{"item": "PEN", "quantity": 1}]})
+        upload = SimpleUploadedFile("pos.jsonl", (line + "\n" + line).encode())
+        response = self.client.post("/invoice/import/", {"file": upload}, format="multipart")
+        self.assertEqual(response.data["created"], 2)
+
+    def test_query_count_is_per_chunk_not_per_row(self):
+        records = [
+            {"party": self.party.id, "invoice_type": "purchase", "items": [{"item": "PEN", "quantity": 1}]}
+        ] * 20
+        self.import_jsonl(records[:1], chunk_size=50)  # warm-up: payment statuses
+        with CaptureQueriesContext(connection) as small:
+            self.import_jsonl(records[:2], chunk_size=50)
+        with CaptureQueriesContext(connection) as large:
+            self.import_jsonl(records, chunk_size=50)
+        self.assertEqual(len(small), len(large))
+
+    def test_rolled_back_chunk_does_not_move_the_projected_stock(self):
+        sale = {"party": self.party.id, "invoice_type": "sales", "items": [{"item": "PEN", "quantity": 8}]}
+        write = InvoiceImporter._write
+        calls = []
+
+        def fail_first(importer, chunk):
+            calls.append(chunk)
+            if len(calls) == 1:
+                raise IntegrityError("duplicate invoice number")
+            return write(importer, chunk)
+
+        with mock.patch.object(InvoiceImporter, "_write", fail_first):
+            response = self.import_jsonl([sale, sale], chunk_size=1)
+        first, second = response.data["results"]
+        self.assertIn("Chunk rolled back", first["errors"][0])
+        # Checked against the 10 in stock, not the 2 the failed chunk would have left
+        self.assertEqual(second["status"], "created")
+        self.assertNotIn("warnings", second)
+
+    def test_unexpected_errors_propagate(self):
+        sale = {"party": self.party.id, "invoice_type": "sales", "items": [{"item": "PEN", "quantity": 1}]}
+        with mock.patch.object(InvoiceImporter, "_write", side_effect=AttributeError("bug")):
+            with self.assertRaises(AttributeError):
+                self.import_jsonl([sale])
+
+
+class InvoiceNumberSequenceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def test_continues_after_existing_numbers_numerically(self):
+        year = date.today().year
+        for number in (999, 1000):
+            Invoice.objects.create(
+                company=self.company, party=self.party, created_by=self.owner_user,
+                invoice_number=f"INV-{year}-{number:03d}", invoice_type=self.sales,
+            )
+        self.assertEqual(allocate_invoice_numbers(self.company), [f"INV-{year}-1001"])
+
+    def test_block_allocation_is_constant_time(self):
+        allocate_invoice_numbers(self.company)
+        # increment + read back
+        with self.assertNumQueries(2):
+            numbers = allocate_invoice_numbers(self.company, count=500)
+        year = date.today().year
+        self.assertEqual(numbers[0], f"INV-{year}-002")
+        self.assertEqual(numbers[-1], f"INV-{year}-501")
+        self.assertEqual(InvoiceNumberSequence.objects.get(company=self.company).last_number, 501)
+
+    def test_sequences_are_per_company_and_prefix(self):
+        other = Company.objects.create(
+            user=self.owner_user, owner=self.customer, name="Other", address="-",
+            phone="9000000002", gst_number="GST-OTHER",
+        )
+        year = date.today().year
+        self.assertEqual(allocate_invoice_numbers(self.company), [f"INV-{year}-001"])
+        self.assertEqual(allocate_invoice_numbers(other), [f"INV-{year}-001"])
+        self.assertEqual(allocate_invoice_numbers(self.company, prefix="POS"), [f"POS-{year}-001"])
+
+    @override_settings(INVOICE_FISCAL_YEAR_START_MONTH=4, INVOICE_NUMBER_FORMAT="{prefix}/{fy}/{number:05d}")
+    def test_fiscal_year_format(self):
+        self.assertEqual(allocate_invoice_numbers(self.company, day=date(2026, 3, 31)), ["INV/2025-26/00001"])
+        self.assertEqual(allocate_invoice_numbers(self.company, day=date(2026, 4, 1)), ["INV/2026-27/00001"])
+        self.assertEqual(allocate_invoice_numbers(self.company, day=date(2026, 5, 2)), ["INV/2026-27/00002"])
+
+
+class ListPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+        for n in range(4, 8):
+            Invoice.objects.create(
+                company=cls.company, party=cls.party, created_by=cls.owner_user,
+                invoice_number=f"INV-{n}", invoice_type=cls.sales, total=100.0,
+            )
+        # Same payment_date for all rows: the id breaks the ties
+        PaymentIn.objects.bulk_create([PaymentIn(company=cls.company, amount=n) for n in range(5)])
+        PaymentOut.objects.bulk_create([PaymentOut(company=cls.company, amount=n) for n in range(2)])
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def list_invoices(self, **params):
+        return self.client.post("/invoice/list/", params, format="json")
+
+    def test_compat_mode_keeps_the_plain_list(self):
+        response = self.list_invoices()
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+
+    def test_pages_cover_every_row_once(self):
+        expected = list(
+            Invoice.objects.filter(company=self.company).order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {"page_size": 3, "include_total": True}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.list_invoices(**params).data
+            pages += 1
+            seen += [row["invoice_id"] for row in data["results"]]
+            self.assertEqual(data["pagination"]["total"], 7)
+            cursor = data["pagination"]["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, expected)
+
+    def test_rows_added_between_pages_do_not_shift_the_next_page(self):
+        first = self.list_invoices(page_size=3).data
+        Invoice.objects.create(
+            company=self.company, party=self.party, created_by=self.owner_user,
+            invoice_number="INV-NEW", invoice_type=self.sales, total=1.0,
+        )
+        second = self.list_invoices(cursor=first["pagination"]["next_cursor"]).data
+        first_ids = {row["invoice_id"] for row in first["results"]}
+        self.assertFalse(first_ids & {row["invoice_id"] for row in second["results"]})
+        self.assertNotIn("INV-NEW", [row["invoice_number"] for row in second["results"]])
+
+    @override_settings(LIST_PAGINATION_COMPAT=False, LIST_PAGE_SIZE=5)
+    def test_default_page_when_compat_is_off(self):
+        data = self.list_invoices().data
+        self.assertEqual(len(data["results"]), 5)
+        self.assertTrue(data["pagination"]["has_more"])
+        self.assertNotIn("total", data["pagination"])
+
+    def test_bad_or_foreign_cursor_is_rejected(self):
+        self.assertEqual(self.list_invoices(cursor="garbage").status_code, 400)
+
+        payments_cursor = self.client.post(
+            "/payments/list/", {"page_size": 1}, format="json"
+        ).data["pagination"]["next_cursor"]
+        self.assertEqual(self.list_invoices(cursor=payments_cursor).status_code, 400)
+
+    def test_payments_share_one_cursor(self):
+        ins, outs, cursor = [], [], None
+        while True:
+            params = {"page_size": 2, **({"cursor": cursor} if cursor else {})}
+            data = self.client.post("/payments/list/", params, format="json").data
+            ins += [row["id"] for row in data["payment_ins"]]
+            outs += [row["id"] for row in data["payment_outs"]]
+            cursor = data["pagination"]["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(ins, list(PaymentIn.objects.order_by("-id").values_list("id", flat=True)))
+        self.assertEqual(outs, list(PaymentOut.objects.order_by("-id").values_list("id", flat=True)))
+
+
+class InvoiceBootstrapTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+        cls.unit = UnitType.objects.get(code="pcs")
+        cls.item = Item.objects.create(
+            name="Widget", code="W1", quantity=5, unit=cls.unit, price=1.0, sales_price=2.0,
+            tax_percent=0.0, company=cls.company,
+        )
+        cls.bank = BankAccount.objects.create(bank_name="HDFC", company=cls.company, current_balance=10.0)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def bootstrap(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.post("/invoice/bootstrap/", {}, format="json", **headers)
+
+    def test_one_response_with_every_lookup(self):
+        reference_rows(InvoiceType)  # warm registry, as in a running process
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bootstrap()
+        self.assertEqual(response.status_code, 200)
+        data = response.data["data"]
+        self.assertEqual(
+            set(data),
+            {"invoice_types", "payment_types", "payment_modes", "party_types", "units", "parties", "items", "bank_accounts"},
+        )
+        self.assertEqual([p["name"] for p in data["parties"]], ["Buyer"])
+        self.assertEqual(data["items"][0]["unit_id"], self.unit.id)
+        self.assertEqual(data["bank_accounts"][0]["bank_name"], "HDFC")
+        self.assertIn("sales", [t["code"] for t in data["invoice_types"]])
+        # version + one query per catalog, on top of the permission checks
+        catalog = [q for q in queries if "parties_party" in q["sql"] or "items_item" in q["sql"] or "invoice_bankaccount" in q["sql"]]
+        self.assertEqual(len(catalog), 4)
+
+        # Cached: only the version query touches the catalogs
+        with CaptureQueriesContext(connection) as queries:
+            again = self.bootstrap()
+        self.assertEqual(again.data, response.data)
+        catalog = [q for q in queries if "parties_party" in q["sql"]]
+        self.assertEqual(len(catalog), 1)
+
+        self.assertEqual(self.bootstrap(etag=response["ETag"]).status_code, 304)
+
+    def test_catalog_writes_change_the_version(self):
+        version = self.bootstrap().data["version"]
+
+        self.item.sales_price = 3.0
+        self.item.save()
+        response = self.bootstrap()
+        self.assertNotEqual(response.data["version"], version)
+        self.assertEqual(response.data["data"]["items"][0]["sales_price"], 3.0)
+        version = response.data["version"]
+
+        Party.objects.create(name="Second", company=self.company)
+        response = self.bootstrap()
+        self.assertNotEqual(response.data["version"], version)
+        self.assertEqual(len(response.data["data"]["parties"]), 2)
+        version = response.data["version"]
+
+        self.bank.deleted = True
+        self.bank.save()
+        response = self.bootstrap()
+        self.assertNotEqual(response.data["version"], version)
+        self.assertEqual(response.data["data"]["bank_accounts"], [])
+
+    def test_empty_catalogs(self):
+        other = Company.objects.create(user=self.owner_user, owner=self.customer, name="Empty", phone="1", gst_number="G2")
+        self.client.credentials(HTTP_COMPANY=str(other.id))
+        response = self.bootstrap()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["items"], [])
+
+    def test_restricted_role_only_gets_its_catalogs(self):
+        role = Role.objects.create(company=self.company, name="Billing")
+        for module in ("Invoice", "Items"):
+            ModulePermission.objects.create(
+                job_role=role, company=self.company, required_module=module, can_get_using_post=True,
+            )
+        clerk = User.objects.create_user(username="clerk", password="pass1234")
+        StaffProfile.objects.create(
+            user=clerk, company=self.company, job_role=role, username="clerk", email="clerk@example.com", password="unused",
+        )
+        owner_response = self.bootstrap()
+
+        self.client = company_client(clerk, self.company)
+        response = self.bootstrap()
+        self.assertEqual(response.status_code, 200)
+        data = response.data["data"]
+        self.assertNotIn("parties", data)
+        self.assertNotIn("bank_accounts", data)
+        self.assertEqual(data["items"][0]["name"], "Widget")
+        self.assertIn("invoice_types", data)
+
+        # The owner's ETag is not the clerk's
+        self.assertNotEqual(response.data["version"], owner_response.data["version"])
+        self.assertEqual(self.bootstrap(etag=owner_response["ETag"]).status_code, 200)
+
+
+class SparseFieldsetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def list_sql(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/invoice/list/", params, format="json")
+        self.assertEqual(response.status_code, 200)
+        sql = [q["sql"] for q in queries if "invoice_invoice" in q["sql"] and "SELECT" in q["sql"]][-1]
+        return response, sql
+
+    def test_default_shape_is_unchanged(self):
+        response, _ = self.list_sql()
+        row = response.data[0]
+        self.assertEqual(row["invoice_number"], "INV-3")
+        self.assertEqual((row["party_name"], row["invoice_type"]), ("Buyer", "Sales Invoice"))
+        self.assertEqual((row["payment_status"], row["created_by"]), ("Unpaid", "owner"))
+        self.assertEqual(len(row), 18)
+
+    def test_only_requested_columns_and_joins(self):
+        response, sql = self.list_sql(fields="invoice_number,total")
+        self.assertEqual(response.data[0], {"invoice_number": "INV-3", "total": 100.0})
+        self.assertNotIn("JOIN", sql)
+        self.assertNotIn("notes", sql)
+
+        response, sql = self.list_sql(fields=["invoice_id", "party_name"])
+        self.assertEqual(response.data[0], {"invoice_id": self.invoices[-1].id, "party_name": "Buyer"})
+        self.assertEqual(sql.count("JOIN"), 1)
+        self.assertIn("parties_party", sql)
+
+    def test_with_pagination(self):
+        first, _ = self.list_sql(fields="invoice_number", page_size=2)
+        self.assertEqual(first.data["results"], [{"invoice_number": "INV-3"}, {"invoice_number": "INV-2"}])
+        second, _ = self.list_sql(fields="invoice_number", cursor=first.data["pagination"]["next_cursor"])
+        self.assertEqual(second.data["results"], [{"invoice_number": "INV-1"}])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.post("/invoice/list/", {"fields": "total,secret"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.data["detail"])
+
+
+class StreamingListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+        unit = UnitType.objects.get(code="pcs")
+        Item.objects.bulk_create([
+            Item(name=f"Item {n}", code=f"I{n}", quantity=1, unit=unit, price=1.0, sales_price=2.0,
+                 tax_percent=0.0, company=cls.company)
+            for n in range(3)
+        ])
+        PaymentIn.objects.bulk_create([PaymentIn(company=cls.company, amount=n, note="ünïcode") for n in range(3)])
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def assertStreamsSameJSON(self, path, data):
+        buffered = self.client.post(path, data, format="json")
+        streamed = self.client.post(path, {**data, "stream": True}, format="json")
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed["Content-Type"], "application/json")
+        body = b"".join(streamed.streaming_content)
+        self.assertEqual(json.loads(body), json.loads(buffered.content))
+        return json.loads(body)
+
+    def test_list_endpoints_stream_the_same_body(self):
+        self.assertEqual(len(self.assertStreamsSameJSON("/invoice/list/", {})), 3)
+        payments = self.assertStreamsSameJSON("/payments/list/", {})
+        self.assertEqual((len(payments["payment_ins"]), payments["payment_outs"]), (3, []))
+        self.assertEqual(len(self.assertStreamsSameJSON(
+            "/items/", {"company": self.company.id, "customer_id": self.customer.id}
+        )), 3)
+        parties = self.assertStreamsSameJSON("/parties/", {"company": self.company.id})
+        self.assertEqual(parties["data"][0]["name"], "Buyer")
+
+    @override_settings(LIST_STREAMING=True, LIST_STREAM_CHUNK_SIZE=2)
+    def test_streaming_by_default_and_paginated_requests_are_buffered(self):
+        self.assertTrue(self.client.post("/invoice/list/", {}, format="json").streaming)
+        self.assertFalse(self.client.post("/invoice/list/", {"stream": "0"}, format="json").streaming)
+        page = self.client.post("/invoice/list/", {"page_size": 2}, format="json")
+        self.assertFalse(page.streaming)
+        self.assertEqual(len(page.data["results"]), 2)
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class IndexUsageTests(TestCase):
+    """The hot list, dashboard and report querysets must SEARCH an index, never SCAN a table."""
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIsNone(re.search(r"\bSCAN\b", plan), plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.assertIn(index_name, plan)
+
+    def test_invoice_list(self):
+        invoices = Invoice.objects.filter(company_id=1).select_related(
+            "company", "party", "invoice_type", "created_by", "payment_status"
+        )
+        self.assertUsesIndex(invoices.order_by("-created_at", "-id")[:51], "invoice_company_created_idx")
+        after = invoices.filter(keyset_after(("-created_at", "-id"), [timezone.now(), 10]))
+        self.assertUsesIndex(after.order_by("-created_at", "-id")[:51], "invoice_company_created_idx")
+
+    def test_dashboard(self):
+        live_sales = Invoice.objects.filter(company_id=1, invoice_type=1, is_deleted=False)
+        self.assertUsesIndex(live_sales, "invoice_dashboard_idx")
+        self.assertUsesIndex(live_sales.filter(created_at__date=date.today()), "invoice_dashboard_idx")
+        sums = Invoice.objects.filter(company_id=1, invoice_type=1).values("company_id").annotate(paid=Sum("amount_paid"))
+        self.assertUsesIndex(sums, "COVERING INDEX invoice_dashboard_idx")
+
+    def test_reports(self):
+        self.assertUsesIndex(
+            Invoice.objects.filter(company_id=1, invoice_type_id=1, payment_status_id=2, is_deleted=False),
+            "invoice_status_live_idx",
+        )
+        self.assertUsesIndex(
+            BankTransaction.objects.filter(
+                bank_account__company_id=1, created_at__date__range=["2025-01-01", "2025-01-31"]
+            ),
+            "banktxn_account_created_idx",
+        )
+
+    def test_other_lists(self):
+        self.assertUsesIndex(Party.objects.filter(company_id=1, deleted=False).order_by("id")[:51], "party_company_live_idx")
+        self.assertUsesIndex(Item.objects.filter(company_id=1, is_active=True).order_by("id")[:51], "item_company_active_idx")
+        for model, index_name in ((PaymentIn, "paymentin_company_date_idx"), (PaymentOut, "paymentout_company_date_idx")):
+            payments = model.objects.filter(company_id=1).select_related("invoice", "invoice__party", "bank_account")
+            self.assertUsesIndex(payments.order_by("-payment_date", "-id")[:51], index_name)
+        self.assertUsesIndex(
+            BankToBankTransfer.objects.filter(company_id=1, deleted=False).order_by("-created_at", "-id")[:51],
+            "transfer_company_live_idx",
+        )
+
+
+class ReferenceRegistryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="viewer", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_seeded_and_served_without_queries(self):
+        reference_rows(InvoiceType)  # load
+        with self.assertNumQueries(0):
+            self.assertEqual(reference_by_code(InvoiceType, "SALES").name, "Sales Invoice")
+            self.assertEqual(reference_by_code(PaymentMode, "on_account").name, "On Account")
+            self.assertEqual(reference_by_id(PaymentStatus, "3").label, "Paid")
+            self.assertIsNone(reference_by_id(PaymentStatus, "x"))
+            self.assertEqual([u.code for u in reference_rows(UnitType)][:2], ["pcs", "kg"])
+
+    def test_list_endpoints_do_not_query(self):
+        reference_rows(InvoiceType)
+        with self.assertNumQueries(0):
+            for path in ("/invoice/types/", "/invoice/payment-types/", "/items/units/", "/parties/types/"):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.data)
+
+    def test_changes_reload_the_registry(self):
+        self.assertIsNone(reference_by_code(PaymentMode, "upi"))
+        with self.captureOnCommitCallbacks(execute=True):
+            mode = PaymentMode.objects.create(name="UPI", code="upi")
+        self.assertEqual(reference_by_code(PaymentMode, "upi"), mode)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mode.delete()
+        self.assertIsNone(reference_by_code(PaymentMode, "upi"))
@@ -4,7 +4,9 @@ from .views import *
 urlpatterns = [
     path("types/", InvoiceTypeListView.as_view(), name="invoice-types"),
     path("payment-types/", PaymentTypeListView.as_view(), name="payment-types"),
+    path("bootstrap/", InvoiceBootstrapView.as_view(), name="invoice-bootstrap"),
     path("create/", CreateInvoiceView.as_view(), name="create-invoice"),
+    path("import/", BulkImportInvoiceView.as_view(), name="import-invoices"),
     path("<int:pk>/", InvoiceDetailView.as_view(), name="invoice-detail"),
     path("<int:pk>/pdf/", InvoicePDFView.as_view(), name="invoice-pdf"),
     path("<int:pk>/update/", UpdateInvoiceView.as_view(), name="update-invoice"),
@@ -1,21 +1,164 @@
-from django.utils.timezone import now
-from .models import Invoice
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils.timezone import localdate, now
+from .models import Invoice, InvoiceItem, InvoiceNumberSequence
+from items.models import Item
 
-def generate_invoice_number(company):
-    year = now().year
-    prefix = f"INV-{year}-"
 
-    last_invoice = Invoice.objects.filter(company=company, invoice_number__startswith=prefix) \
-        .order_by("invoice_number").last()
+#! invoice numbers
+def fiscal_year_of(day=None):
+    """Year the fiscal year containing `day` starts in (INVOICE_FISCAL_YEAR_START_MONTH)."""
+    day = day or localdate()
+    return day.year if day.month >= settings.INVOICE_FISCAL_YEAR_START_MONTH else day.year - 1
+
 
-    if last_invoice and last_invoice.invoice_number:
-        try:
-            last_number = int(last_invoice.invoice_number.split("-")[-1])
-        except ValueError:
-            last_number = 0
+def _format_context(prefix, fiscal_year):
+    if settings.INVOICE_FISCAL_YEAR_START_MONTH == 1:
+        fy = str(fiscal_year)
     else:
-        last_number = 0
+        fy = f"{fiscal_year}-{str(fiscal_year + 1)[-2:]}"
+    return {"prefix": prefix, "year": fiscal_year, "fy": fy}
+
+
+def format_invoice_number(number, prefix, fiscal_year, number_format=None):
+    number_format = number_format or settings.INVOICE_NUMBER_FORMAT
+    return number_format.format(number=number, **_format_context(prefix, fiscal_year))
+
+
+def _highest_existing_number(company_id, prefix, fiscal_year, number_format):
+    """
+    One-off scan when a sequence row is first created, so companies that already
+    have invoices carry on after them. Compares numbers, not strings.
+    """
+    context = _format_context(prefix, fiscal_year)
+    at = number_format.index("{number")
+    head = number_format[:at].format(**context)
+    tail = number_format[number_format.index("}", at) + 1:].format(**context)
+
+    highest = 0
+    numbers = Invoice.objects.filter(company_id=company_id, invoice_number__startswith=head) \
+        .values_list("invoice_number", flat=True)
+    for invoice_number in numbers.iterator():
+        if not invoice_number.endswith(tail):
+            continue
+        middle = invoice_number[len(head):len(invoice_number) - len(tail)]
+        if middle.isdigit():
+            highest = max(highest, int(middle))
+    return highest
+
+
+def allocate_invoice_numbers(company, count=1, prefix=None, day=None, number_format=None):
+    """
+    Reserves `count` consecutive numbers from the company's sequence and returns them formatted.
+    The increment is a single UPDATE on the (company, prefix, fiscal year) row, so the row is
+    locked before its value is read: concurrent callers queue instead of sharing numbers.
+    Call it inside the transaction that saves the invoices so a rollback leaves no gap.
+    """
+    prefix = prefix or settings.INVOICE_NUMBER_PREFIX
+    number_format = number_format or settings.INVOICE_NUMBER_FORMAT
+    fiscal_year = fiscal_year_of(day)
+    company_id = getattr(company, "pk", company)
+
+    sequence = InvoiceNumberSequence.objects.filter(company_id=company_id, prefix=prefix, fiscal_year=fiscal_year)
+    # No savepoint: joins the caller's transaction when there is one
+    with transaction.atomic(savepoint=False):
+        if not sequence.update(last_number=F("last_number") + count):
+            InvoiceNumberSequence.objects.get_or_create(
+                company_id=company_id,
+                prefix=prefix,
+                fiscal_year=fiscal_year,
+                defaults={"last_number": lambda: _highest_existing_number(company_id, prefix, fiscal_year, number_format)},
+            )
+            sequence.update(last_number=F("last_number") + count)
+        last_number = sequence.select_for_update().values_list("last_number", flat=True).get()
+
+    return [
+        format_invoice_number(number, prefix, fiscal_year, number_format)
+        for number in range(last_number - count + 1, last_number + 1)
+    ]
+
+
+def generate_invoice_number(company):
+    return allocate_invoice_numbers(company)[0]
+
+
+def generate_invoice_numbers(company, count):
+    """Block of `count` consecutive numbers for bulk paths."""
+    return allocate_invoice_numbers(company, count)
+
+
+#! line items
+def price_line(item_obj, quantity, discount_percent):
+    """Line before the invoice-level discount: rate, item discount and taxable amount."""
+    rate = item_obj.sales_price
+    base_amount = quantity * rate
+    item_discount_amount = base_amount * (discount_percent / 100)
+    return {
+        "item": item_obj,
+        "quantity": quantity,
+        "rate": rate,
+        "discount_percent": discount_percent,
+        "item_discount_amount": item_discount_amount,
+        "taxable_amount": base_amount - item_discount_amount,
+    }
+
+
+def build_invoice_items(invoice, item_rows, subtotal, invoice_discount_amount):
+    """
+    Spreads the invoice discount over the lines, adds tax and returns
+    (unsaved InvoiceItem objects, tax_total, invoice_total).
+    """
+    invoice_items = []
+    tax_total = 0.0
+    invoice_total = 0.0
+
+    for row in item_rows:
+        item_obj = row["item"]
+        taxable_amount = row["taxable_amount"]
+
+        item_invoice_discount_share = (taxable_amount / subtotal) * invoice_discount_amount if subtotal > 0 else 0.0
+        final_taxable_amount = taxable_amount - item_invoice_discount_share
+        tax = final_taxable_amount * (item_obj.tax_percent / 100) if item_obj.tax_applied else 0.0
+        amount = final_taxable_amount + tax
+
+        tax_total += tax
+        invoice_total += amount
+
+        invoice_items.append(InvoiceItem(
+            invoice=invoice,
+            item=item_obj,
+            quantity=row["quantity"],
+            rate=row["rate"],
+            discount_percent=row["discount_percent"],
+            discount_amount=row["item_discount_amount"],
+            amount=amount,
+        ))
+
+    return invoice_items, tax_total, invoice_total
+
+
+def apply_stock_changes(item_rows, is_purchase, is_sales):
+    """
+    Moves stock for every line in one UPDATE. Purchases add, sales subtract
+    (floored at 0); quantities are computed by the DB so concurrent invoices
+    on the same item cannot overwrite each other.
+    """
+    if not (is_purchase or is_sales):
+        return
 
-    next_number = str(last_number + 1).zfill(3)
-    return f"{prefix}{next_number}"
+    quantities = {}
+    for row in item_rows:
+        quantities[row["item"].id] = quantities.get(row["item"].id, 0) + row["quantity"]
+    if not quantities:
+        return
 
+    whens = [
+        When(id=item_id, then=F("quantity") + quantity if is_purchase else Greatest(F("quantity") - quantity, Value(0)))
+        for item_id, quantity in quantities.items()
+    ]
+    Item.objects.filter(id__in=quantities).update(
+        quantity=Case(*whens, output_field=PositiveIntegerField()),
+        updated_at=now(),
+    )
@@ -19,37 +19,25 @@ from parties.models import *
 from .serializers import *
 from django.db.models import Max
 from .utils import *
+from .reference import reference_by_id, reference_rows
+from .bootstrap import allowed_catalogs, bootstrap_version, invoice_bootstrap
+from .imports import InvoiceImporter, InvoiceCSVParser, JSONLinesParser, DEFAULT_CHUNK_SIZE, records_from_upload
+from rest_framework.parsers import MultiPartParser
 from payments.models import *
 from staff.permission import *
-
-# Ensure PaymentStatus records exist (called once per request)
-def ensure_payment_statuses():
-    PaymentStatus.objects.get_or_create(id=1, defaults={"label": "Unpaid"})
-    PaymentStatus.objects.get_or_create(id=2, defaults={"label": "Partially Paid"})
-    PaymentStatus.objects.get_or_create(id=3, defaults={"label": "Paid"})
-
+from company.pagination import KeysetPaginator
+from company.projection import Projection
+from company.conditional import catalog_etag, etag_matches, not_modified, with_etag
+from company.streaming import StreamingJSONResponse, stream_rows, wants_stream
 
 class InvoiceTypeListView(APIView):
     """List invoice types (Sales, Purchase) for create form dropdown.
-    Auto-creates default invoice types if none exist.
+    Defaults are seeded by migration and served from the reference registry.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Auto-create default invoice types if they don't exist
-        default_types = [
-            {"name": "Sales Invoice", "code": "sales"},
-            {"name": "Purchase Invoice", "code": "purchase"},
-        ]
-        
-        for type_data in default_types:
-            InvoiceType.objects.get_or_create(
-                name=type_data["name"],
-                defaults={"code": type_data["code"]}
-            )
-        
-        types = InvoiceType.objects.all().order_by('id')
-        data = [{"id": t.id, "name": t.name, "code": t.code} for t in types]
+        data = [{"id": t.id, "name": t.name, "code": t.code} for t in reference_rows(InvoiceType)]
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -58,12 +46,43 @@ class PaymentTypeListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        for name in ["Cash", "Bank"]:
-            PaymentType.objects.get_or_create(name=name)
-        types = PaymentType.objects.all().order_by('id')
+        types = reference_rows(PaymentType)
         return Response([{"id": t.id, "name": t.name} for t in types], status=status.HTTP_200_OK)
 
 
+class InvoiceBootstrapView(APIView):
+    """
+    All lookups of the invoice form in one call: invoice, payment and party
+    types, payment modes, units, and the company's parties, items and bank
+    accounts. Cached per company version, which is also the ETag.
+    Parties, items and bank accounts are left out for a role that may not
+    list them through their own module.
+    """
+    permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
+    required_module = "Invoice"
+    required_permission = "get_using_post"
+    query_budget = 7
+
+    def post(self, request):
+        company_id = get_company_id(request, self)
+        if not company_id:
+            return Response({"status": 400, "message": "Missing 'company' in request body."}, status=status.HTTP_400_BAD_REQUEST)
+
+        sections = allowed_catalogs(get_auth_context(request, self))
+        version = bootstrap_version(company_id, sections)
+        etag = f'"{version}"'
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        version, data = invoice_bootstrap(company_id, version, sections)
+        return with_etag(Response({
+            "status": 200,
+            "message": "Invoice form data fetched successfully.",
+            "version": version,
+            "data": data,
+        }, status=status.HTTP_200_OK), etag)
+
+
 # def generate_invoice_number(company):
 #     last_invoice = Invoice.objects.filter(company=company).aggregate(Max('id'))['id__max']
 #     next_id = (last_invoice or 0) + 1
@@ -85,12 +104,16 @@ class GETCompanyBankAccountView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         accounts = BankAccount.objects.filter(company_id=company_id, deleted=False)
+        etag = catalog_etag(request, accounts)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
         serializer = BankAccountSerializer(accounts, many=True)
-        return Response({
+        return with_etag(Response({
             "status": 200,
             "message": "Bank accounts fetched successfully.",
             "data": serializer.data
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK), etag)
 
 
 class POSTCompanyBankAccountView(APIView):
@@ -117,6 +140,7 @@ class UpdateBankAccountView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Bank Transaction"
     required_permission = "edit"
+    company_lookup = (BankAccount, "company_id")
 
     def put(self, request, pk):
         company_id = get_company_id(request, self)
@@ -154,6 +178,7 @@ class DeleteBankAccountView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Bank Transaction"
     required_permission = "delete"
+    company_lookup = (BankAccount, "company_id")
 
     def delete(self, request, pk):
         company_id = get_company_id(request, self)
@@ -191,7 +216,6 @@ class CreateInvoiceView(APIView):
     def post(self, request):
         serializer = InvoiceSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        print('jhfdhbf')
 
         company_id = get_company_id(request, self) or request.headers.get("company")
 
@@ -230,13 +254,12 @@ class CreateInvoiceView(APIView):
         if party.company_id != company.id:
             return Response({"detail": "Party does not belong to the selected company.", "status": 400})
 
-        try:
-            invoice_type = InvoiceType.objects.get(id=invoice_type_id)
-        except InvoiceType.DoesNotExist:
+        invoice_type = reference_by_id(InvoiceType, invoice_type_id)
+        if not invoice_type:
             return Response({"detail": "Invalid invoice type.", "status": 400})
 
-        payment_mode = PaymentMode.objects.filter(id=payment_mode_id).first()
-        payment_type = PaymentType.objects.filter(id=payment_type_id).first()
+        payment_mode = reference_by_id(PaymentMode, payment_mode_id)
+        payment_type = reference_by_id(PaymentType, payment_type_id)
         bank_account = None
 
         # Validate bank account if provided
@@ -263,10 +286,14 @@ class CreateInvoiceView(APIView):
         subtotal = 0.0
         warnings = []
 
+        # All items of the invoice in one query
+        items_by_id = Item.objects.filter(company=company).in_bulk(
+            {item_data["item"] for item_data in items_data}
+        )
+
         for item_data in items_data:
-            try:
-                item_obj = Item.objects.get(id=item_data["item"], company=company)
-            except Item.DoesNotExist:
+            item_obj = items_by_id.get(int(item_data["item"]))
+            if item_obj is None:
                 return Response({
                     "detail": f"Item {item_data['item']} not found in this company.",
                     "status": 400
@@ -280,28 +307,14 @@ class CreateInvoiceView(APIView):
                     f"Item '{item_obj.name}' has only {item_obj.quantity} in stock, but {quantity} were requested."
                 )
 
-            rate = item_obj.sales_price
-            base_amount = quantity * rate
-            item_discount_amount = base_amount * (discount_percent / 100)
-            taxable_amount = base_amount - item_discount_amount
-            subtotal += taxable_amount
-
-            item_rows.append({
-                "item": item_obj,
-                "quantity": quantity,
-                "rate": rate,
-                "discount_percent": discount_percent,
-                "item_discount_amount": item_discount_amount,
-                "taxable_amount": taxable_amount
-            })
+            row = price_line(item_obj, quantity, discount_percent)
+            subtotal += row["taxable_amount"]
+            item_rows.append(row)
 
         invoice_discount_amount = subtotal * (invoice_discount_percent / 100)
         tax_total = 0.0
         invoice_total = 0.0
 
-        # Ensure PaymentStatus records exist
-        ensure_payment_statuses()
-
         with transaction.atomic():
             invoice_number = generate_invoice_number(company)
 
@@ -329,37 +342,12 @@ class CreateInvoiceView(APIView):
                 payment_status_id=payment_status_id
             )
 
-            for row in item_rows:
-                item_obj = row["item"]
-                quantity = row["quantity"]
-                rate = row["rate"]
-                discount_percent = row["discount_percent"]
-                item_discount_amount = row["item_discount_amount"]
-                taxable_amount = row["taxable_amount"]
-
-                item_invoice_discount_share = (taxable_amount / subtotal) * invoice_discount_amount if subtotal > 0 else 0.0
-                final_taxable_amount = taxable_amount - item_invoice_discount_share
-                tax = final_taxable_amount * (item_obj.tax_percent / 100) if item_obj.tax_applied else 0.0
-                amount = final_taxable_amount + tax
-
-                tax_total += tax
-                invoice_total += amount
-
-                if is_purchase:
-                    item_obj.quantity += quantity
-                elif is_sales:
-                    item_obj.quantity = max(item_obj.quantity - quantity, 0)
-                item_obj.save()
-
-                InvoiceItem.objects.create(
-                    invoice=invoice,
-                    item=item_obj,
-                    quantity=quantity,
-                    rate=rate,
-                    discount_percent=discount_percent,
-                    discount_amount=item_discount_amount,
-                    amount=amount
-                )
+            # Constant number of queries whatever the number of lines
+            invoice_items, tax_total, invoice_total = build_invoice_items(
+                invoice, item_rows, subtotal, invoice_discount_amount
+            )
+            InvoiceItem.objects.bulk_create(invoice_items)
+            apply_stock_changes(item_rows, is_purchase, is_sales)
 
             invoice.subtotal = subtotal
             invoice.tax_amount = tax_total
@@ -398,12 +386,74 @@ class CreateInvoiceView(APIView):
 
 
 
+class BulkImportInvoiceView(APIView):
+    """
+    Bulk import from POS terminals: JSON lines (application/x-ndjson), CSV (text/csv)
+    or an uploaded `file`. Invoices are committed ?chunk_size= at a time and the
+    response reports every input row.
+    """
+    permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
+    parser_classes = [JSONLinesParser, InvoiceCSVParser, MultiPartParser]
+    required_module = "Invoice"
+    required_permission = "create"
+
+    def post(self, request):
+        company_id = get_company_id(request, self)
+        company = Company.objects.filter(id=company_id, is_active=True).first() if company_id else None
+        if not company:
+            return Response({"detail": "Company ID is required.", "status": 400}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = request.FILES.get("file")
+        records = records_from_upload(upload, request.data.get("format")) if upload else request.data.get("records")
+        if records is None:
+            return Response({"detail": "Send JSON lines, CSV or a file upload.", "status": 400},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            chunk_size = int(request.query_params.get("chunk_size", DEFAULT_CHUNK_SIZE))
+        except ValueError:
+            return Response({"detail": "Invalid chunk_size.", "status": 400}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = InvoiceImporter(company, request.user, chunk_size).run(records)
+        created = sum(1 for result in results if result["status"] == "created")
+        return Response({
+            "msg": f"{created} of {len(results)} invoices imported",
+            "created": created,
+            "failed": len(results) - created,
+            "results": results,
+            "status": 200
+        })
+
+
 
 # list of invoice related to the company
+INVOICE_LIST_FIELDS = Projection({
+    "invoice_id": "id",
+    "invoice_number": "invoice_number",
+    "company_id": "company_id",
+    "company_name": "company__name",
+    "party_id": "party_id",
+    "party_name": "party__name",
+    "invoice_type": "invoice_type__name",
+    "payment_status": "payment_status__label",
+    "subtotal": "subtotal",
+    "tax_amount": "tax_amount",
+    "total": "total",
+    "amount_paid": "amount_paid",
+    "remaining_balance": "remaining_balance",
+    "discount_percent": "discount_percent",
+    "discount_amount": "discount_amount",
+    "notes": "notes",
+    "created_by": "created_by__username",
+    "created_at": "created_at",
+}, defaults={"payment_status": "Unpaid", "created_by": ""})
+
+
 class InvoiceListView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Invoice"
     required_permission = "get_using_post"
+    query_budget = 7
 
     def post(self, request):
         company_id = get_company_id(request, self)
@@ -414,38 +464,20 @@ class InvoiceListView(APIView):
         if not user_context:
             return Response({"detail": "Unauthorized user.", "status": 403})
 
-        invoices = (
-            Invoice.objects
-            .filter(company_id=company_id)
-            .select_related("company", "party", "invoice_type", "created_by", "payment_status")
-            .order_by("-id")
+        # Only the requested columns are selected, and only their tables joined
+        names = INVOICE_LIST_FIELDS.requested(request)
+        ordering = ("-created_at", "-id")
+        paginator = KeysetPaginator(request)
+        invoices = paginator.paginate(
+            INVOICE_LIST_FIELDS.values(Invoice.objects.filter(company_id=company_id), names, keep=("created_at", "id")),
+            ordering,
         )
+        build_row = INVOICE_LIST_FIELDS.row_builder(names)
+
+        if wants_stream(request) and not paginator.enabled:
+            return StreamingJSONResponse(stream_rows(invoices, build_row))
 
-        response_data = [
-            {
-                "invoice_id": invoice.id,
-                "invoice_number": invoice.invoice_number,
-                "company_id": invoice.company.id,
-                "company_name": invoice.company.name,
-                "party_id": invoice.party.id,
-                "party_name": invoice.party.name,
-                "invoice_type": invoice.invoice_type.name,
-                "payment_status": invoice.payment_status.label if invoice.payment_status else "Unpaid",
-                "subtotal": invoice.subtotal,
-                "tax_amount": invoice.tax_amount,
-                "total": invoice.total,
-                "amount_paid": invoice.amount_paid,
-                "remaining_balance": invoice.remaining_balance,
-                "discount_percent": invoice.discount_percent,
-                "discount_amount": invoice.discount_amount,
-                "notes": invoice.notes,
-                "created_by": invoice.created_by.username if invoice.created_by else "",
-                "created_at": invoice.created_at,
-            }
-            for invoice in invoices
-        ]
-
-        return Response(response_data)
+        return Response(paginator.wrap([build_row(invoice) for invoice in invoices]))
 
 
 
@@ -463,6 +495,8 @@ class InvoiceDetailView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Invoice"
     required_permission = "view_specific"
+    query_budget = 8
+    company_lookup = (Invoice, "company_id")
 
     def get(self, request, pk):
         try:
@@ -700,6 +734,8 @@ class InvoicePDFView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Invoice"
     required_permission = "view_specific"
+    query_budget = 8
+    company_lookup = (Invoice, "company_id")
 
     def get(self, request, pk):
         try:
@@ -725,10 +761,9 @@ class UpdateInvoiceView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Invoice"
     required_permission = "edit"
+    company_lookup = (Invoice, "company_id")
     
     def put(self, request, pk):
-        # Ensure PaymentStatus records exist
-        ensure_payment_statuses()
         company_id = get_company_id(request, self)
         if not company_id:
             return Response({"detail": "Company ID is required.", "status": 500})
@@ -875,6 +910,7 @@ class DeleteInvoiceView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Invoice"
     required_permission = "delete"
+    company_lookup = (Invoice, "company_id")
  
 
     def delete(self, request, pk):
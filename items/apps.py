@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ItemsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'items'
+
+    def ready(self):
+        # Keep the typeahead index in step with creates, edits and (soft) deletes
+        from .search import ITEM_SEARCH
+        ITEM_SEARCH.connect_signals()
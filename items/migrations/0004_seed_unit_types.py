@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+UNIT_TYPES = [
+    ("Piece", "pcs"),
+    ("Kilogram", "kg"),
+    ("Gram", "g"),
+    ("Liter", "L"),
+    ("Meter", "m"),
+    ("Box", "box"),
+    ("Pack", "pack"),
+]
+
+
+def seed_unit_types(apps, schema_editor):
+    UnitType = apps.get_model("items", "UnitType")
+    for name, code in UNIT_TYPES:
+        if not UnitType.objects.filter(Q(name=name) | Q(code=code)).exists():
+            UnitType.objects.create(name=name, code=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0003_alter_item_company'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_unit_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0006_company_owner'),
+        ('items', '0004_seed_unit_types'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['company', 'id'], name='item_company_active_idx'),
+        ),
+    ]
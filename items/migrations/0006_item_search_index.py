@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+# Typeahead index, see company/search.py. SQLite only; other databases search with icontains.
+CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS items_item_fts USING fts5(scope, name, code, description, prefix='2 3')
+"""
+POPULATE = """
+INSERT INTO items_item_fts (rowid, scope, name, code, description)
+SELECT id, 'c' || company_id, name, code, COALESCE(description, '')
+FROM items_item WHERE is_active
+"""
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE)
+        cursor.execute(POPULATE)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS items_item_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0005_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
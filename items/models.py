@@ -42,5 +42,11 @@ class Item(models.Model):
         related_name="created_items"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'id'], condition=models.Q(is_active=True), name='item_company_active_idx'),
+            models.Index(fields=['company', 'updated_at'], condition=models.Q(is_active=True), name='item_company_upd_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.code})"
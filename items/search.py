@@ -0,0 +1,5 @@
+from company.search import SearchIndex
+from .models import Item
+
+
+ITEM_SEARCH = SearchIndex(Item, "items_item_fts", ("name", "code", "description"), live={"is_active": True})
@@ -1,3 +1,87 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from company.testing import company_client, create_invoice_fixture
+from invoice.models import BankAccount, Invoice
+from items.models import Item, UnitType
+from parties.models import Party
+
+
+class CatalogETagTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+        unit = UnitType.objects.get(code="pcs")
+        cls.items = [
+            Item.objects.create(
+                name=f"Item {n}", code=f"I{n}", quantity=10, unit=unit, price=1.0, sales_price=2.0,
+                tax_percent=0.0, company=cls.company,
+            )
+            for n in range(3)
+        ]
+        cls.bank = BankAccount.objects.create(bank_name="HDFC", company=cls.company, current_balance=100.0)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def list_items(self, etag=None, **params):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        body = {"company": self.company.id, "customer_id": self.customer.id, **params}
+        return self.client.post("/items/", body, format="json", **headers)
+
+    def test_unchanged_catalog_answers_304_with_one_query(self):
+        first = self.list_items()
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.list_items(etag=etag)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second["ETag"], etag)
+        self.assertEqual(second.content, b"")
+        self.assertEqual(len([q for q in queries if "items_item" in q["sql"]]), 1)
+
+        self.assertEqual(self.list_items(etag=f'W/{etag}, "other"').status_code, 304)
+        # Another page or shape is another representation
+        self.assertNotEqual(self.list_items(page_size=1)["ETag"], etag)
+
+    def test_writes_change_the_etag(self):
+        etag = self.list_items()["ETag"]
+
+        self.items[0].name = "Renamed"
+        self.items[0].save()
+        self.assertEqual(self.list_items(etag=etag).status_code, 200)
+        etag = self.list_items()["ETag"]
+
+        # Stock moves go through a queryset update
+        self.client.post("/invoice/create/", {
+            "company": self.company.id, "party": self.party.id, "invoice_type": self.sales.id,
+            "items": [{"item": self.items[1].id, "quantity": 1}],
+        }, format="json")
+        self.assertEqual(self.list_items(etag=etag).status_code, 200)
+        etag = self.list_items()["ETag"]
+
+        self.client.delete(f"/items/{self.company.id}/{self.items[2].id}/delete/")
+        response = self.list_items(etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_parties_and_bank_accounts(self):
+        etag = self.client.post("/parties/", {"company": self.company.id}, format="json")["ETag"]
+        repeat = self.client.post("/parties/", {"company": self.company.id}, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repeat.status_code, 304)
+        Party.objects.create(name="New", company=self.company)
+        changed = self.client.post("/parties/", {"company": self.company.id}, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+
+        etag = self.client.post("/invoice/bank-accounts/", {}, format="json")["ETag"]
+        Invoice.objects.filter(pk=self.invoices[0].pk).update(remaining_balance=100.0)
+        self.client.post("/payments/payment-in/", {
+            "company": self.company.id, "invoice": self.invoices[0].id, "amount": 5.0, "bank_account": self.bank.id,
+        }, format="json")
+        self.bank.refresh_from_db()
+        self.assertEqual(self.bank.current_balance, 105.0)
+        changed = self.client.post("/invoice/bank-accounts/", {}, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
@@ -6,12 +6,14 @@ from .views import (
     UpdateItemView,
     DeleteItemView,
     UnitTypeListView,
+    ItemSearchView,
 )
 
 urlpatterns = [
     path("create/", ItemCreateView.as_view(), name="item-create"),
     path("", ListItemView.as_view(), name="item-list"),
     path("units/", UnitTypeListView.as_view(), name="unit-list"),
+    path("search/", ItemSearchView.as_view(), name="item-search"),
     path("<int:company_id>/<int:pk>/", RetrieveItemView.as_view(), name="item-detail"),
     path("<int:company_id>/<int:pk>/update/", UpdateItemView.as_view(), name="update-item"),
     path("<int:company_id>/<int:pk>/delete/", DeleteItemView.as_view(), name="delete-item"),
@@ -4,10 +4,16 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.db import transaction
 from .models import Item, UnitType
+from invoice.reference import reference_rows
 from .serializer import *
 from customer.models import Customer
 from companies.models import *
 from staff.permission import *
+from company.pagination import KeysetPaginator
+from company.streaming import StreamingJSONResponse, stream_rows, wants_stream
+from company.search import search_limit
+from company.conditional import catalog_etag, etag_matches, not_modified, with_etag
+from .search import ITEM_SEARCH
 
 from rest_framework import status
 
@@ -81,6 +87,7 @@ class ListItemView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Items"
     required_permission = "get_using_post"
+    query_budget = 7
 
     def post(self, request):
         company_id = request.data.get("company")
@@ -102,38 +109,30 @@ class ListItemView(APIView):
         else:
             return Response({"detail": "Unauthorized user."}, status=403)
 
-        items = Item.objects.filter(company=company, is_active=True)
+        live_items = Item.objects.filter(company=company, is_active=True)
+        etag = catalog_etag(request, live_items)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        paginator = KeysetPaginator(request)
+        items = paginator.paginate(live_items, ("id",))
+        if wants_stream(request) and not paginator.enabled:
+            return with_etag(StreamingJSONResponse(stream_rows(items, ItemSerializer().to_representation)), etag)
+
         serializer = ItemSerializer(items, many=True)
-        return Response(serializer.data, status=200)
+        return with_etag(Response(paginator.wrap(serializer.data), status=200), etag)
 
 
 
 class UnitTypeListView(APIView):
     """
     Simple list of all available units (global, not per-company).
-    Auto-creates default units if none exist.
+    Defaults are seeded by migration and served from the reference registry.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Auto-create default units if they don't exist
-        default_units = [
-            {"name": "Piece", "code": "pcs"},
-            {"name": "Kilogram", "code": "kg"},
-            {"name": "Gram", "code": "g"},
-            {"name": "Liter", "code": "L"},
-            {"name": "Meter", "code": "m"},
-            {"name": "Box", "code": "box"},
-            {"name": "Pack", "code": "pack"},
-        ]
-        
-        for unit_data in default_units:
-            UnitType.objects.get_or_create(
-                name=unit_data["name"],
-                defaults={"code": unit_data["code"]}
-            )
-        
-        units = UnitType.objects.all().order_by("name")
+        units = sorted(reference_rows(UnitType), key=lambda unit: unit.name)
         data = [
             {
                 "id": unit.id,
@@ -227,3 +226,24 @@ class DeleteItemView(APIView):
         item.is_active = False
         item.save()
         return Response({"msg": "Item soft-deleted successfully."}, status=204)
+
+
+class ItemSearchView(APIView):
+    """Typeahead: items of the company whose name, code or description start with the words in ?q=."""
+    permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
+    required_module = "Items"
+    required_permission = "view"
+    query_budget = 4
+
+    def get(self, request):
+        company_id = get_company_id(request, self)
+        if not company_id:
+            return Response({"detail": "Company ID is required."}, status=400)
+
+        rows = ITEM_SEARCH.search(
+            company_id,
+            request.query_params.get("q", ""),
+            limit=search_limit(request),
+            fields=("name", "code", "quantity", "unit_id", "sales_price", "tax_applied", "tax_percent"),
+        )
+        return Response({"message": "Items found.", "data": rows}, status=200)
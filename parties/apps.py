@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PartiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'parties'
+
+    def ready(self):
+        # Keep the typeahead index in step with creates, edits and (soft) deletes
+        from .search import PARTY_SEARCH
+        PARTY_SEARCH.connect_signals()
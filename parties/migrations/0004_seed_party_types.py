@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+PARTY_TYPES = ["Customer", "Supplier"]
+
+
+def seed_party_types(apps, schema_editor):
+    PartyType = apps.get_model("parties", "PartyType")
+    for name in PARTY_TYPES:
+        PartyType.objects.get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parties', '0003_remove_party_is_active_party_deleted'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_party_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+# Typeahead index, see company/search.py. SQLite only; other databases search with icontains.
+CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS parties_party_fts USING fts5(scope, name, phone, gst_number, prefix='2 3')
+"""
+POPULATE = """
+INSERT INTO parties_party_fts (rowid, scope, name, phone, gst_number)
+SELECT id, 'c' || company_id, name, COALESCE(phone, ''), COALESCE(gst_number, '')
+FROM parties_party WHERE NOT deleted
+"""
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE)
+        cursor.execute(POPULATE)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS parties_party_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parties', '0005_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
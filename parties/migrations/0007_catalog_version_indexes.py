@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0006_company_owner'),
+        ('parties', '0006_party_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='party',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['company', 'updated_at'], name='party_company_upd_idx'),
+        ),
+    ]
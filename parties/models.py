@@ -31,6 +31,12 @@ class Party(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'id'], condition=models.Q(deleted=False), name='party_company_live_idx'),
+            models.Index(fields=['company', 'updated_at'], condition=models.Q(deleted=False), name='party_company_upd_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -0,0 +1,5 @@
+from company.search import SearchIndex
+from .models import Party
+
+
+PARTY_SEARCH = SearchIndex(Party, "parties_party_fts", ("name", "phone", "gst_number"), live={"deleted": False})
@@ -1,3 +1,76 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from companies.models import Company
+from company.testing import company_client, create_invoice_fixture
+from items.models import Item, UnitType
+from items.search import ITEM_SEARCH
+from parties.models import Party
+
+
+class TypeaheadSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+        unit = UnitType.objects.get(code="pcs")
+        cls.other_company = Company.objects.create(
+            user=cls.owner_user, owner=cls.customer, name="Other", address="x", phone="9000000002", gst_number="GST-O",
+        )
+        for name, code, company in (
+            ("Steel Rod 12mm", "SR-12", cls.company),
+            ("Steel Sheet", "SS-1", cls.company),
+            ("Copper Wire", "CW-9", cls.company),
+            ("Steel Beam", "SB-1", cls.other_company),
+        ):
+            Item.objects.create(
+                name=name, code=code, unit=unit, price=1.0, sales_price=2.0, tax_percent=0.0, company=company,
+            )
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def search(self, kind, q):
+        response = self.client.get(f"/{kind}/search/", {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.data["data"]]
+
+    def test_prefix_words_scoped_to_the_company(self):
+        self.assertEqual(sorted(self.search("items", "ste")), ["Steel Rod 12mm", "Steel Sheet"])
+        self.assertEqual(self.search("items", "steel 12"), ["Steel Rod 12mm"])
+        self.assertEqual(self.search("items", "cw"), ["Copper Wire"])
+        self.assertEqual(self.search("items", "beam"), [])
+        # The company token is not searchable text
+        self.assertEqual(self.search("items", f"c{self.company.id}"), [])
+        self.assertEqual(self.search("items", '"*) OR'), [])
+
+    def test_api_writes_keep_the_index_current(self):
+        response = self.client.post("/parties/create/", {
+            "company": self.company.id, "name": "Zenith Traders", "phone": "9812345678", "gst_number": "27ZEN123",
+        }, format="json")
+        party_id = response.data["data"]["id"]
+        self.assertEqual(self.search("parties", "zen"), ["Zenith Traders"])
+        self.assertEqual(self.search("parties", "98123"), ["Zenith Traders"])
+        self.assertEqual(self.search("parties", "27zen"), ["Zenith Traders"])
+
+        self.client.put(f"/parties/{party_id}/update/", {"company": self.company.id, "name": "Apex Traders"}, format="json")
+        self.assertEqual(self.search("parties", "zen"), [])
+        self.assertEqual(self.search("parties", "apex"), ["Apex Traders"])
+
+        self.client.delete(f"/parties/{party_id}/delete/", {"company": self.company.id}, format="json")
+        self.assertEqual(self.search("parties", "apex"), [])
+
+    def test_rebuild_after_bulk_writes(self):
+        Party.objects.bulk_create([Party(name=f"Bulk {n}", company=self.company) for n in range(3)])
+        self.assertEqual(self.search("parties", "bulk"), [])
+        call_command("rebuild_search_index", company=[self.company.id], stdout=StringIO())
+        self.assertEqual(len(self.search("parties", "bulk")), 3)
+
+    def test_fallback_without_fts(self):
+        ITEM_SEARCH._available = False
+        try:
+            self.assertEqual(sorted(self.search("items", "steel")), ["Steel Rod 12mm", "Steel Sheet"])
+        finally:
+            ITEM_SEARCH._available = None
@@ -1,4 +1,5 @@
 from .models import Party, PartyType
+from invoice.reference import reference_rows
 from .serializers import PartySerializer
 from companies.models import Company
 from rest_framework.views import APIView
@@ -10,6 +11,11 @@ from django.db import transaction
 from parties.models import *
 from staff.models import *
 from staff.permission import *
+from company.pagination import KeysetPaginator
+from company.streaming import StreamingJSONResponse, stream_rows, wants_stream
+from company.search import search_limit
+from company.conditional import catalog_etag, etag_matches, not_modified, with_etag
+from .search import PARTY_SEARCH
 
 
 class PartyTypeListView(APIView):
@@ -17,11 +23,8 @@ class PartyTypeListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Auto-create default party types if they don't exist
-        PartyType.objects.get_or_create(name='Customer')
-        PartyType.objects.get_or_create(name='Supplier')
-        
-        party_types = PartyType.objects.all().order_by('id')
+        # Seeded by migration, served from memory
+        party_types = reference_rows(PartyType)
         data = [{"id": pt.id, "name": pt.name} for pt in party_types]
         return Response(data, status=status.HTTP_200_OK)
 
@@ -75,6 +78,7 @@ class PartyUpdateView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Party"
     required_permission = "edit"
+    company_lookup = (Party, "company_id", {"deleted": False})
 
     def put(self, request, pk):
         company_id = request.data.get("company")
@@ -107,6 +111,7 @@ class PartyDeleteView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Party"
     required_permission = "delete"
+    company_lookup = (Party, "company_id", {"deleted": False})
 
     def delete(self, request, pk):
         company_id = request.data.get("company")
@@ -153,6 +158,7 @@ class PartyListPostView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Party"
     required_permission = "get_using_post"
+    query_budget = 7
 
     def post(self, request):
         company_id = request.data.get("company")
@@ -163,9 +169,43 @@ class PartyListPostView(APIView):
         if error:
             return error
 
-        parties = Party.objects.filter(company=company, deleted=False)
+        live_parties = Party.objects.filter(company=company, deleted=False)
+        etag = catalog_etag(request, live_parties)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        paginator = KeysetPaginator(request)
+        parties = paginator.paginate(live_parties.select_related("company", "party_type"), ("id",))
+        if wants_stream(request) and not paginator.enabled:
+            return with_etag(StreamingJSONResponse({
+                "message": "Party list fetched successfully.",
+                "data": stream_rows(parties, PartySerializer().to_representation),
+            }, status=200), etag)
+
         serializer = PartySerializer(parties, many=True)
-        return Response({
+        return with_etag(Response({
             "message": "Party list fetched successfully.",
-            "data": serializer.data
-        }, status=200)
+            "data": serializer.data,
+            **paginator.extra(),
+        }, status=200), etag)
+
+
+class PartySearchView(APIView):
+    """Typeahead: parties of the company whose name, phone or GST number start with the words in ?q=."""
+    permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
+    required_module = "Party"
+    required_permission = "view"
+    query_budget = 4
+
+    def get(self, request):
+        company_id = get_company_id(request, self)
+        if not company_id:
+            return Response({"error": "Company ID is required."}, status=400)
+
+        rows = PARTY_SEARCH.search(
+            company_id,
+            request.query_params.get("q", ""),
+            limit=search_limit(request),
+            fields=("name", "phone", "gst_number", "party_type_id"),
+        )
+        return Response({"message": "Parties found.", "data": rows}, status=200)
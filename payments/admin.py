@@ -53,4 +53,5 @@ admin.site.register(PaymentOut, PaymentOutAdmin)
 admin.site.register(CashTransaction, CashTransactionAdmin)
 admin.site.register(CashLedger, CashLedgerAdmin)
 admin.site.register(BankToBankTransfer, BankToBankTransferAdmin)
-admin.site.register(ReportExportLog)
\ No newline at end of file
+admin.site.register(ReportExportLog)
+admin.site.register(ReportJob)
\ No newline at end of file
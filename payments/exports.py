@@ -0,0 +1,198 @@
+"""
+Export engine for the reports in payments/reports.py: Excel files and
+streamed CSV.
+
+The workbook is opened in openpyxl's write_only mode: rows go from the
+report's database iterator straight to the sheet's temporary file, so memory
+stays flat however long the report is. That mode writes column widths before
+the first row, so widths are estimated from the headers and the first
+WIDTH_SAMPLE_ROWS rows, which are held back until the widths are set.
+openpyxl uses lxml for this when it is installed, which is much faster.
+
+Finished files are content addressed: they live under
+MEDIA_ROOT/REPORT_CACHE_DIR/<key>/, where the key hashes the company, report,
+filters, the day (printed in the header and the file name) and the company's
+data version (CompanySummary.data_version, moved by every write to the rows
+reports read, the company's name included). Asking again for a report whose
+data has not changed serves the file already there; a changed version is a
+new key, so stale files are never served, only left for prune_report_cache.
+
+CSV (and gzipped CSV) is not stored at all: iter_csv() encodes the rows as
+the database iterator yields them, for a StreamingHttpResponse, so neither
+a file nor the whole report ever exists on the server.
+"""
+import csv
+import io
+import os
+import tempfile
+import zlib
+from itertools import chain, islice
+
+from django.conf import settings
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
+
+from .models import ReportExportLog
+
+
+WIDTH_SAMPLE_ROWS = 1000
+MAX_COLUMN_WIDTH = 60
+
+THIN = Side(style="thin")
+CELL_BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+CENTER = Alignment(horizontal="center")
+
+
+def styled(ws, value, **style):
+    cell = WriteOnlyCell(ws, value=value)
+    for name, setting in style.items():
+        setattr(cell, name, setting)
+    return cell
+
+
+def bordered_row(ws, row, style):
+    """Data cells carry the same thin border as the headers; `style` is a bordered cell's _style, shared."""
+    cells = []
+    for value in row:
+        cell = WriteOnlyCell(ws, value=value)
+        # Sharing the style array costs half of setting cell.border on every cell
+        cell._style = style
+        cells.append(cell)
+    return cells
+
+
+def column_widths(headers, rows):
+    widths = [len(header) for header in headers]
+    for row in rows:
+        for index, value in enumerate(row):
+            if value is not None and value != "":
+                widths[index] = max(widths[index], len(str(value)))
+    return [min(width + 3, MAX_COLUMN_WIDTH) for width in widths]
+
+
+def write_excel(report, target, company_name=None, progress=None, progress_every=5000):
+    """
+    Writes `report` as .xlsx to `target` (a path or a binary file); returns the
+    number of data rows. `progress(rows)` is called every `progress_every` rows.
+    """
+    company_name = company_name if company_name is not None else report.company_name()
+    headers = report.headers
+    last_column = get_column_letter(len(headers))
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(report.sheet_title or report.title)
+
+    rows = report.rows()
+    sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+    if progress:
+        # Running the query and reading the sample can take a while before the first row is written
+        progress(0)
+    for index, width in enumerate(column_widths(headers, sample), 1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+
+    # Title, company + date, then the table headers
+    ws.merged_cells.add(f"A1:{last_column}1")
+    ws.merged_cells.add(f"A2:{last_column}2")
+    ws.append([styled(ws, report.title, font=Font(bold=True, size=14), alignment=CENTER)])
+    ws.append([styled(ws, f"{company_name} - {report.generated_on.strftime('%d %B %Y')}", font=Font(bold=True), alignment=CENTER)])
+    ws.append([styled(ws, header, font=Font(bold=True), alignment=CENTER, border=CELL_BORDER) for header in headers])
+
+    style = styled(ws, None, border=CELL_BORDER)._style
+    count = 0
+    for row in chain(sample, rows):
+        ws.append(bordered_row(ws, row, style))
+        count += 1
+        if progress and count % progress_every == 0:
+            progress(count)
+
+    wb.save(target)
+    return count
+
+
+#! csv
+CSV_CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "csv.gz": "application/gzip"}
+
+
+def iter_csv(report, compress=False, chunk_size=None):
+    """
+    The report as CSV bytes (headers, then one line per row), yielded every
+    `chunk_size` rows; gzip-compressed on the fly when `compress`.
+    """
+    chunk_size = chunk_size or settings.REPORT_CHUNK_SIZE
+    # wbits=31: a gzip stream (header and trailer), as `gzip -d` and browsers expect
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow(report.headers)
+    for count, row in enumerate(report.rows(chunk_size), 1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            data = drain()
+            if data:
+                yield data
+    data = drain() + (compressor.flush() if compressor else b"")
+    if data:
+        yield data
+
+
+WRITERS = {"xlsx": write_excel}
+
+
+def cached_export(report, extension="xlsx", progress=None, progress_every=5000):
+    """
+    The report's file, written unless one already exists for its key; returns
+    (path relative to MEDIA_ROOT, key, hit).
+    """
+    key = report.cache_key(extension)
+    directory = os.path.join(settings.REPORT_CACHE_DIR, key)
+    absolute = os.path.join(settings.MEDIA_ROOT, directory)
+    if os.path.isdir(absolute):
+        done = [name for name in os.listdir(absolute) if not name.endswith(".part")]
+        if done:
+            # Last use, for prune_report_cache
+            os.utime(absolute)
+            return os.path.join(directory, done[0]), key, True
+
+    company_name = report.company_name()
+    filename = report.filename(extension, company_name)
+    os.makedirs(absolute, exist_ok=True)
+    # Written aside and moved into place, so nobody is served half a file; two
+    # writers of the same key produce the same content, and the last move wins
+    handle, partial = tempfile.mkstemp(dir=absolute, suffix=".part")
+    os.close(handle)
+    try:
+        WRITERS[extension](report, partial, company_name, progress=progress, progress_every=progress_every)
+        os.replace(partial, os.path.join(absolute, filename))
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return os.path.join(directory, filename), key, False
+
+
+def log_export(report, key, hit, path, user_id=None, export_format="xlsx"):
+    return ReportExportLog.objects.create(
+        company_id=report.company_id, report_type=report.name, generated_by_id=user_id,
+        filters_applied=report.filters, export_format=export_format, cache_key=key, cache_hit=hit, file=path,
+    )
+
+
+def log_stream(report, export_format, user_id=None):
+    """A streamed (never cached, never stored) export: no key, no file, no hit or miss."""
+    return log_export(report, "", None, "", user_id, export_format=export_format)
+
+
+def export_to_media(report, request):
+    """The report's cached file (written if needed) and its download url; returns (url, hit)."""
+    path, key, hit = cached_export(report)
+    log_export(report, key, hit, path, request.user.id)
+    url = request.build_absolute_uri(f"{settings.MEDIA_URL}{path.replace(os.sep, '/')}")
+    return url, hit
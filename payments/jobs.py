@@ -0,0 +1,167 @@
+"""
+Background report exports.
+
+The API only records a ReportJob (queued); `manage.py run_report_worker`
+claims queued jobs and runs them on a thread or process pool, away from the
+request workers. A claim is a conditional UPDATE (queued -> running), so any
+number of workers can share the queue. Progress is the number of rows
+written, saved every few thousand rows along with a heartbeat, which also
+beats around the count and the width sample; a running job whose heartbeat
+stops (its worker died) is queued again. A requeued job's first run notices
+on its next write and stops: its progress and result writes only apply while
+it still holds the claim. Files come from the
+report cache (payments/exports.py), so a job for unchanged data finishes
+without writing anything, and are served by the job's download view.
+"""
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.urls import reverse
+from django.utils import timezone
+
+from .exports import cached_export, log_export
+from .models import ReportJob
+from .reports import REPORTS
+
+
+logger = logging.getLogger(__name__)
+
+
+def job_path(job):
+    return os.path.join(settings.MEDIA_ROOT, job.file)
+
+
+def job_payload(job, request=None):
+    data = {
+        "job_id": job.id,
+        "report_type": job.report_type,
+        "filters": job.filters,
+        "state": job.status,
+        "total_rows": job.total_rows,
+        "rows_written": job.rows_written,
+        "progress": round(100 * job.rows_written / job.total_rows, 1) if job.total_rows else None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if job.status == ReportJob.DONE and request is not None:
+        data["download_url"] = request.build_absolute_uri(reverse("report-job-download", args=[job.id]))
+    if job.status == ReportJob.FAILED:
+        data["error"] = job.error
+    return data
+
+
+#! running one job
+class ClaimLost(Exception):
+    """The job was requeued and is no longer this worker's to finish."""
+
+
+def run_job(job_id, worker):
+    """Runs a job `worker` claimed to the end; never raises."""
+    # Every write is conditional on the claim, so a run whose job was requeued
+    # (and maybe claimed again) can neither move its progress nor finish it
+    owned = ReportJob.objects.filter(pk=job_id, worker=worker, status=ReportJob.RUNNING)
+
+    def beat(**fields):
+        if not owned.update(heartbeat_at=timezone.now(), **fields):
+            raise ClaimLost()
+
+    try:
+        job = ReportJob.objects.get(pk=job_id)
+        report = REPORTS[job.report_type](job.company_id, job.filters)
+        beat()
+        total = report.queryset().count()
+        beat(total_rows=total)
+
+        # An unchanged report is already on disk (payments/exports.py); the writer
+        # also calls progress(0) once the width sample is read
+        path, key, hit = cached_export(
+            report, progress=lambda rows: beat(rows_written=rows),
+            progress_every=settings.REPORT_JOB_PROGRESS_EVERY,
+        )
+        log = log_export(report, key, hit, path, job.requested_by_id)
+        if not owned.update(status=ReportJob.DONE, rows_written=total, file=path, log=log, finished_at=timezone.now()):
+            raise ClaimLost()
+    except ClaimLost:
+        logger.warning("Report job %s was requeued while %s ran it; result dropped", job_id, worker)
+    except Exception:
+        logger.exception("Report job %s failed", job_id)
+        owned.update(status=ReportJob.FAILED, error=traceback.format_exc(limit=5), finished_at=timezone.now())
+
+
+def run_pooled_job(job_id, worker):
+    close_old_connections()
+    try:
+        run_job(job_id, worker)
+    finally:
+        # Pool threads each hold their own connection; do not leave them open between jobs
+        connections.close_all()
+
+
+#! worker
+class ReportWorker:
+
+    def __init__(self, size=2, pool="thread", name=None):
+        self.size = size
+        self.pool = pool
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+
+    def claim(self, limit):
+        """Up to `limit` queued job ids, oldest first, now running under this worker."""
+        claimed = []
+        candidates = ReportJob.objects.filter(status=ReportJob.QUEUED).order_by("created_at", "id")
+        for job_id in candidates.values_list("id", flat=True)[:limit]:
+            now = timezone.now()
+            if ReportJob.objects.filter(pk=job_id, status=ReportJob.QUEUED).update(
+                status=ReportJob.RUNNING, worker=self.name, started_at=now, heartbeat_at=now,
+            ):
+                claimed.append(job_id)
+        return claimed
+
+    @staticmethod
+    def requeue_stale():
+        cutoff = timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_AFTER)
+        return ReportJob.objects.filter(status=ReportJob.RUNNING, heartbeat_at__lt=cutoff).update(
+            status=ReportJob.QUEUED, worker="", rows_written=0,
+        )
+
+    def run_once(self):
+        """Runs the jobs queued right now, in this thread; returns how many ran."""
+        self.requeue_stale()
+        count = 0
+        while True:
+            claimed = self.claim(1)
+            if not claimed:
+                return count
+            run_job(claimed[0], self.name)
+            count += 1
+
+    def executor(self):
+        if self.pool == "process":
+            # Fresh interpreters (no database connection inherited through fork), set up like manage.py
+            return ProcessPoolExecutor(
+                max_workers=self.size, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup,
+            )
+        return ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="report-job")
+
+    def serve_forever(self, poll_interval=None, stop=None):
+        poll_interval = poll_interval or settings.REPORT_JOB_POLL_INTERVAL
+        running = set()
+        with self.executor() as executor:
+            while not (stop and stop()):
+                running = {future for future in running if not future.done()}
+                self.requeue_stale()
+                for job_id in self.claim(self.size - len(running)):
+                    logger.info("Report job %s started on %s", job_id, self.name)
+                    running.add(executor.submit(run_pooled_job, job_id, self.name))
+                close_old_connections()
+                time.sleep(poll_interval)
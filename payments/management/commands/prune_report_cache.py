@@ -0,0 +1,28 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Remove cached report files (MEDIA_ROOT/REPORT_CACHE_DIR) that have not been used for a while"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, default=settings.REPORT_CACHE_MAX_AGE_DAYS,
+                            help="Unused for longer than this (each hit counts as a use)")
+
+    def handle(self, *args, **options):
+        root = os.path.join(settings.MEDIA_ROOT, settings.REPORT_CACHE_DIR)
+        if not os.path.isdir(root):
+            self.stdout.write("0 cached reports removed")
+            return
+
+        cutoff = time.time() - options["days"] * 86400
+        count = 0
+        for entry in os.scandir(root):
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                count += 1
+        self.stdout.write(f"{count} cached reports removed")
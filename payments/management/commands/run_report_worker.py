@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payments.jobs import ReportWorker
+
+
+class Command(BaseCommand):
+    help = "Run queued report exports (payments.ReportJob) on a pool of threads or processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Jobs run at the same time")
+        parser.add_argument("--pool", choices=("thread", "process"), default="thread",
+                            help="process: one interpreter per job slot, for CPU-bound workbooks")
+        parser.add_argument("--poll-interval", type=float, default=settings.REPORT_JOB_POLL_INTERVAL)
+        parser.add_argument("--once", action="store_true", help="Run what is queued now, one at a time, and exit")
+
+    def handle(self, *args, **options):
+        worker = ReportWorker(size=options["workers"], pool=options["pool"])
+        if options["once"]:
+            count = worker.run_once()
+            self.stdout.write(f"{count} report jobs run")
+            return
+
+        self.stdout.write(f"Report worker {worker.name}: {options['workers']} {options['pool']} slots")
+        try:
+            worker.serve_forever(poll_interval=options["poll_interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
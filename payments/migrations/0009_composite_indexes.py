@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0006_company_owner'),
+        ('invoice', '0016_composite_indexes'),
+        ('payments', '0008_reportexportlog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='banktobanktransfer',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['company', 'created_at', 'id'], name='transfer_company_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['bank_account', 'created_at'], name='banktxn_account_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentin',
+            index=models.Index(fields=['company', 'payment_date', 'id'], name='paymentin_company_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentout',
+            index=models.Index(fields=['company', 'payment_date', 'id'], name='paymentout_company_date_idx'),
+        ),
+    ]
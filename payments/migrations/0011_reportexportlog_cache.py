@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0010_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportexportlog',
+            name='cache_hit',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='reportexportlog',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='reportexportlog',
+            name='file',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
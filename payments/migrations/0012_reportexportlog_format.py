@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0011_reportexportlog_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportexportlog',
+            name='export_format',
+            field=models.CharField(default='xlsx', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='reportexportlog',
+            name='cache_hit',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+    ]
@@ -18,6 +18,9 @@ class BankTransaction(models.Model):
     description = models.TextField(blank=True, null=True)
     balance_after_transaction = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['bank_account', 'created_at'], name='banktxn_account_created_idx')]
+
     def __str__(self):
         return f"{self.transaction_type.title()} ₹{self.amount} on {self.created_at.date()}"
 
@@ -29,6 +32,10 @@ class PaymentIn(models.Model):
     bank_account = models.ForeignKey('invoice.BankAccount', on_delete=models.SET_NULL, null=True, blank=True)
     note = models.TextField(blank=True)
 
+    class Meta:
+        # List keyset order (-payment_date, -id) within a company
+        indexes = [models.Index(fields=['company', 'payment_date', 'id'], name='paymentin_company_date_idx')]
+
     def __str__(self):
         return f"Payment In: ₹{self.amount} for {self.company.name}"
 
@@ -41,6 +48,10 @@ class PaymentOut(models.Model):
     bank_account = models.ForeignKey('invoice.BankAccount', on_delete=models.SET_NULL, null=True, blank=True)
     note = models.TextField(blank=True)
 
+    class Meta:
+        # List keyset order (-payment_date, -id) within a company
+        indexes = [models.Index(fields=['company', 'payment_date', 'id'], name='paymentout_company_date_idx')]
+
     def __str__(self):
         return f"Payment Out: ₹{self.amount} from {self.company.name}"
 
@@ -65,7 +76,7 @@ class CashTransaction(models.Model):
     def __str__(self):
         return f"{self.ledger.ledger_name} - {self.transaction_type} ₹{self.amount}"
 
-class CashLedger(models.Model):
+class CashLedger(SummarizedSaveMixin, models.Model):
     ledger_name = models.CharField(max_length=50)
     company_name = models.ForeignKey(Company, on_delete=models.DO_NOTHING, null=True, blank=True)
     as_on = models.DateField(null=True, blank=True)
@@ -88,6 +99,15 @@ class BankToBankTransfer(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     deleted = models.BooleanField(default=False) 
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['company', 'created_at', 'id'],
+                condition=models.Q(deleted=False),
+                name='transfer_company_live_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"₹{self.amount} from {self.from_account} to {self.to_account}"
 
@@ -98,3 +118,51 @@ class ReportExportLog(models.Model):
     generated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     generated_at = models.DateTimeField(auto_now_add=True)
     filters_applied = models.JSONField(null=True, blank=True)
+    export_format = models.CharField(max_length=10, default='xlsx')  # xlsx, csv, csv.gz
+    # Cached exports (payments/exports.py): the file's key, and whether it was reused or written.
+    # Streamed CSV is never stored: no key, no file, and cache_hit is None
+    cache_key = models.CharField(max_length=64, blank=True, db_index=True)
+    cache_hit = models.BooleanField(null=True, blank=True)
+    file = models.CharField(max_length=255, blank=True)  # relative to MEDIA_ROOT
+
+
+#!  report jobs (background exports)
+class ReportJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    report_type = models.CharField(max_length=50)  # a key of payments.reports.REPORTS
+    filters = models.JSONField(default=dict, blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_written = models.PositiveIntegerField(default=0)
+    file = models.CharField(max_length=255, blank=True)  # relative to MEDIA_ROOT
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    log = models.OneToOneField(ReportExportLog, on_delete=models.SET_NULL, null=True, blank=True, related_name='job')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Moves with the progress; a running job that stops moving is queued again
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Worker claim order, and the stale running jobs
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.report_type} report #{self.pk} ({self.status})"
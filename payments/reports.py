@@ -0,0 +1,229 @@
+"""
+Report definitions, shared by the export formats.
+
+A report is a queryset plus a list of columns. Its rows are read with one
+.values_list() query (related names joined in, so no per-row lookups) and
+iterator(), which keeps only the current chunk in memory. REPORTS maps the
+report type names to their classes.
+"""
+import hashlib
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Value
+from django.db.models.functions import Concat
+from django.utils.text import slugify
+
+from companies.models import Company
+from companies.summary import company_summary
+from invoice.models import Invoice, InvoiceItem, InvoiceType
+from invoice.reference import reference_by_code
+from .models import BankTransaction
+
+
+# field: a values_list() name; format: value -> cell value (None = as is)
+Column = namedtuple("Column", "header field format")
+
+
+def text(value):
+    return value or ""
+
+
+def as_float(value):
+    return float(value or 0)
+
+
+def as_date(value):
+    return value.strftime("%Y-%m-%d") if value else ""
+
+
+def as_minute(value):
+    return value.strftime("%Y-%m-%d %H:%M") if value else ""
+
+
+def capitalized(value):
+    return (value or "").capitalize()
+
+
+class Report:
+    name = None
+    title = None
+    sheet_title = None
+    file_label = None
+    columns = ()
+    ordering = ("id",)
+    # Request keys the report reads, and those it cannot run without
+    filter_names = ("start_date", "end_date")
+    required_filters = ()
+
+    def __init__(self, company_id, filters=None):
+        self.company_id = company_id
+        self.filters = filters or {}
+        # The date in the file's header and name; part of the cache key
+        self.generated_on = datetime.now().date()
+
+    @classmethod
+    def filters_from(cls, data):
+        return {name: data.get(name) for name in cls.filter_names if data.get(name) not in (None, "")}
+
+    @classmethod
+    def missing_filters(cls, filters):
+        return [name for name in cls.required_filters if not filters.get(name)]
+
+    def queryset(self):
+        raise NotImplementedError
+
+    @property
+    def headers(self):
+        return [column.header for column in self.columns]
+
+    def exists(self):
+        return self.queryset().exists()
+
+    def company_name(self):
+        return Company.objects.filter(pk=self.company_id).values_list("name", flat=True).first() or ""
+
+    def data_version(self):
+        return company_summary(self.company_id).data_version
+
+    def cache_key(self, extension, data_version=None):
+        """Same company, report, filters, data and day (and format): same key, same file."""
+        data_version = self.data_version() if data_version is None else data_version
+        filters = sorted((name, str(value)) for name, value in self.filters.items() if value not in (None, ""))
+        payload = json.dumps(
+            [str(self.company_id), self.name, filters, data_version, self.generated_on.isoformat(), extension],
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def filename(self, extension, company_name=None):
+        company_name = company_name if company_name is not None else self.company_name()
+        return f"{slugify(company_name)}-{self.file_label}-{self.generated_on.year}.{extension}"
+
+    def rows(self, chunk_size=None):
+        """Formatted rows, in order, straight from the database cursor."""
+        fields = [column.field for column in self.columns]
+        formats = [column.format for column in self.columns]
+        values = self.queryset().order_by(*self.ordering).values_list(*fields)
+        for row in values.iterator(chunk_size=chunk_size or settings.REPORT_CHUNK_SIZE):
+            yield [fmt(value) if fmt else value for fmt, value in zip(formats, row)]
+
+
+class InvoiceReport(Report):
+    invoice_type_code = None
+    party_header = "Party"
+    filter_names = ("payment_status", "start_date", "end_date")
+    required_filters = ("payment_status",)
+
+    @property
+    def columns(self):
+        return (
+            Column("Invoice Number", "invoice_number", None),
+            Column("Date", "created_at", as_date),
+            Column(self.party_header, "party__name", text),
+            Column("Subtotal", "subtotal", as_float),
+            Column("Tax", "tax_amount", as_float),
+            Column("Discount", "discount_amount", as_float),
+            Column("Total", "total", as_float),
+            Column("Amount Paid", "amount_paid", as_float),
+            Column("Payment Status", "payment_status__label", text),
+        )
+
+    def queryset(self):
+        # Served by invoice_status_live_idx (company, payment_status) WHERE NOT is_deleted
+        invoices = Invoice.objects.filter(
+            company_id=self.company_id,
+            invoice_type=reference_by_code(InvoiceType, self.invoice_type_code),
+            payment_status_id=self.filters.get("payment_status"),
+            is_deleted=False,
+        )
+        if self.filters.get("start_date") and self.filters.get("end_date"):
+            invoices = invoices.filter(created_at__date__range=[self.filters["start_date"], self.filters["end_date"]])
+        return invoices
+
+
+class SalesReport(InvoiceReport):
+    name = "sales"
+    title = "Sales Report"
+    sheet_title = "Sales Report"
+    file_label = "SalesReport"
+    invoice_type_code = "sales"
+
+
+class PurchaseReport(InvoiceReport):
+    name = "purchase"
+    title = "Purchase Report"
+    sheet_title = "Purchase Report"
+    file_label = "PurchaseReport"
+    invoice_type_code = "purchase"
+    party_header = "Supplier"
+
+
+class BankTransactionReport(Report):
+    name = "bank_transactions"
+    title = "Bank Transaction Report"
+    sheet_title = "Bank Transactions"
+    file_label = "BankTransactions"
+    ordering = ("created_at", "id")
+    columns = (
+        Column("Bank Account", "account_label", None),
+        Column("Type", "transaction_type", capitalized),
+        Column("Amount", "amount", None),
+        Column("Balance After Transaction", "balance_after_transaction", None),
+        Column("Description", "description", text),
+        Column("Invoice", "related_invoice__invoice_number", text),
+        Column("Date", "created_at", as_minute),
+    )
+
+    def queryset(self):
+        transactions = BankTransaction.objects.filter(bank_account__company_id=self.company_id).annotate(
+            # As BankAccount.__str__
+            account_label=Concat("bank_account__bank_name", Value(" ("), "bank_account__account_no", Value(")")),
+        )
+        if self.filters.get("start_date") and self.filters.get("end_date"):
+            transactions = transactions.filter(
+                created_at__date__range=[self.filters["start_date"], self.filters["end_date"]]
+            )
+        return transactions
+
+
+class InvoiceLineReport(Report):
+    """One row per invoice line, for integrations (CSV)."""
+    name = "invoice_lines"
+    title = "Invoice Line Report"
+    sheet_title = "Invoice Lines"
+    file_label = "InvoiceLines"
+    ordering = ("invoice__created_at", "invoice_id", "id")
+    # invoice_type is a code ("sales", "purchase")
+    filter_names = ("invoice_type", "payment_status", "start_date", "end_date")
+    columns = (
+        Column("Invoice Number", "invoice__invoice_number", None),
+        Column("Date", "invoice__created_at", as_date),
+        Column("Invoice Type", "invoice__invoice_type__code", None),
+        Column("Party", "invoice__party__name", text),
+        Column("Item Code", "item__code", None),
+        Column("Item", "item__name", None),
+        Column("Quantity", "quantity", None),
+        Column("Rate", "rate", as_float),
+        Column("Discount", "discount_amount", as_float),
+        Column("Amount", "amount", as_float),
+        Column("Payment Status", "invoice__payment_status__label", text),
+    )
+
+    def queryset(self):
+        lines = InvoiceItem.objects.filter(invoice__company_id=self.company_id, invoice__is_deleted=False)
+        if self.filters.get("invoice_type"):
+            lines = lines.filter(invoice__invoice_type=reference_by_code(InvoiceType, self.filters["invoice_type"]))
+        if self.filters.get("payment_status"):
+            lines = lines.filter(invoice__payment_status_id=self.filters["payment_status"])
+        if self.filters.get("start_date") and self.filters.get("end_date"):
+            lines = lines.filter(invoice__created_at__date__range=[self.filters["start_date"], self.filters["end_date"]])
+        return lines
+
+
+REPORTS = {
+    report.name: report
+    for report in (SalesReport, PurchaseReport, BankTransactionReport, InvoiceLineReport)
+}
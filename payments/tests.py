@@ -1,3 +1,453 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+from io import StringIO
 
-# Create your tests here.
+import openpyxl
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from company.testing import company_client, create_invoice_fixture
+from invoice.models import BankAccount, Invoice, InvoiceItem, PaymentStatus
+from items.models import Item, UnitType
+from parties.models import Party
+from payments.exports import column_widths, iter_csv, write_excel
+from payments.jobs import ReportWorker, run_job
+from payments.models import BankTransaction, PaymentIn, PaymentOut, ReportExportLog, ReportJob
+from payments.reports import REPORTS, SalesReport
+
+
+class PaymentTimelineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+        cls.other_party = Party.objects.create(name="Seller", company=cls.company)
+        cls.other_invoice = Invoice.objects.create(
+            company=cls.company, party=cls.other_party, created_by=cls.owner_user,
+            invoice_number="INV-P1", invoice_type=cls.purchase, total=50.0,
+        )
+        cls.bank = BankAccount.objects.create(bank_name="HDFC", company=cls.company)
+        days = [date(2025, 3, d) for d in (1, 2, 2, 3, 5, 5)]
+        for n, day in enumerate(days):
+            payment_in = PaymentIn.objects.create(
+                company=cls.company, invoice=cls.invoices[n % 3], amount=10 + n, bank_account=cls.bank if n % 2 else None
+            )
+            PaymentIn.objects.filter(pk=payment_in.pk).update(payment_date=day)
+        for n, day in enumerate(days[1:5]):
+            payment_out = PaymentOut.objects.create(company=cls.company, invoice=cls.other_invoice, amount=20 + n)
+            PaymentOut.objects.filter(pk=payment_out.pk).update(payment_date=day)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+
+    def timeline(self, **params):
+        response = self.client.post("/payments/timeline/", params, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def walk(self, **filters):
+        rows, cursor, pages = [], None, 0
+        while True:
+            data = self.timeline(page_size=3, **filters, **({"cursor": cursor} if cursor else {}))
+            rows += data["data"]
+            pages += 1
+            cursor = data["pagination"]["next_cursor"]
+            if not cursor:
+                return rows, pages
+
+    def expected(self, directions=("in", "out"), **filters):
+        models = {"in": PaymentIn, "out": PaymentOut}
+        rows = [
+            (payment.payment_date, direction, payment.id)
+            for direction in directions
+            for payment in models[direction].objects.filter(company=self.company, **filters)
+        ]
+        return [(day.isoformat(), direction, pk) for day, direction, pk in sorted(rows, reverse=True)]
+
+    def keys(self, rows):
+        return [(row["payment_date"], row["type"], row["id"]) for row in rows]
+
+    def test_merged_newest_first_across_pages(self):
+        rows, pages = self.walk()
+        self.assertEqual(self.keys(rows), self.expected())
+        self.assertEqual(pages, 4)
+        self.assertEqual(len(rows), 10)
+        # Ids repeat across the tables: the direction keeps them apart
+        self.assertTrue({row["id"] for row in rows if row["type"] == "in"} & {row["id"] for row in rows if row["type"] == "out"})
+
+    def test_filters(self):
+        rows, _ = self.walk(direction="out")
+        self.assertEqual(self.keys(rows), self.expected(directions=("out",)))
+        self.assertEqual({row["bank_name"] for row in rows}, {"Cash"})
+
+        rows, _ = self.walk(start_date="2025-03-02", end_date="2025-03-03")
+        self.assertEqual(self.keys(rows), self.expected(payment_date__range=(date(2025, 3, 2), date(2025, 3, 3))))
+
+        rows, _ = self.walk(party=self.other_party.id)
+        self.assertEqual({(row["type"], row["party_name"]) for row in rows}, {("out", "Seller")})
+
+        rows, _ = self.walk(bank_account=self.bank.id)
+        self.assertEqual(self.keys(rows), self.expected(directions=("in",), bank_account=self.bank))
+
+    def test_one_union_query_per_page_and_total(self):
+        first = self.timeline(page_size=3, include_total=True)
+        self.assertEqual(first["pagination"]["total"], 10)
+        with CaptureQueriesContext(connection) as queries:
+            self.timeline(page_size=3, cursor=first["pagination"]["next_cursor"])
+        payment_queries = [q["sql"] for q in queries if "payments_payment" in q["sql"]]
+        self.assertEqual(len(payment_queries), 1)
+        self.assertIn("UNION ALL", payment_queries[0])
+
+    def test_invalid_filters(self):
+        for params in ({"direction": "sideways"}, {"start_date": "03/01/2025"}, {"party": "abc"}, {"cursor": "nope"}):
+            response = self.client.post("/payments/timeline/", params, format="json")
+            self.assertEqual(response.status_code, 400, params)
+
+
+class ReportExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name, REPORT_CHUNK_SIZE=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.unpaid = PaymentStatus.objects.get(label="Unpaid")
+        Invoice.objects.filter(company=self.company).update(payment_status=self.unpaid)
+
+    def export(self, url, **body):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {"company": self.company.id, **body}, format="json")
+        self.assertEqual(response.data["status"], 200, response.data)
+        self.file_url = response.data["file_url"]
+        path = self.file_url.split(settings.MEDIA_URL, 1)[1]
+        sheet = openpyxl.load_workbook(os.path.join(self.media.name, path)).active
+        return [list(row) for row in sheet.iter_rows(values_only=True)], len(queries)
+
+    def clear_media(self):
+        for name in os.listdir(self.media.name):
+            shutil.rmtree(os.path.join(self.media.name, name))
+
+    def test_sales_report_streams_without_per_row_queries(self):
+        self.export("/payments/sales-report/excel/", payment_status=self.unpaid.id)  # warm caches
+        self.clear_media()
+        rows, queries = self.export("/payments/sales-report/excel/", payment_status=self.unpaid.id)
+        self.assertEqual(rows[0][0], "Sales Report")
+        self.assertTrue(rows[1][0].startswith("Acme - "))
+        self.assertEqual(rows[2], ["Invoice Number", "Date", "Party", "Subtotal", "Tax", "Discount", "Total", "Amount Paid", "Payment Status"])
+        self.assertEqual([row[0] for row in rows[3:]], ["INV-1", "INV-2", "INV-3"])
+        self.assertEqual(rows[3][2:], ["Buyer", 0.0, 0.0, 0.0, 100.0, 0.0, "Unpaid"])
+
+        for n in range(4, 10):
+            Invoice.objects.create(
+                company=self.company, party=self.party, created_by=self.owner_user, invoice_number=f"INV-{n}",
+                invoice_type=self.sales, total=10.0, payment_status=self.unpaid,
+            )
+        self.clear_media()
+        more_rows, more_queries = self.export("/payments/sales-report/excel/", payment_status=self.unpaid.id)
+        self.assertEqual(len(more_rows), 3 + 9)
+        self.assertEqual(more_queries, queries)
+
+    def test_bank_transaction_report(self):
+        bank = BankAccount.objects.create(bank_name="HDFC", account_no="123", company=self.company)
+        for amount in (10.0, 20.0):
+            BankTransaction.objects.create(
+                bank_account=bank, transaction_type="credit", amount=amount, related_invoice=self.invoices[0],
+            )
+        rows, _ = self.export("/payments/bank-transaction-report/excel/")
+        self.assertEqual(rows[0][0], "Bank Transaction Report")
+        self.assertEqual(rows[3][:3], ["HDFC (123)", "Credit", 10.0])
+        self.assertEqual(rows[4][5], "INV-1")
+
+    def test_empty_report_writes_nothing(self):
+        response = self.client.post("/payments/purchase-report/excel/", {
+            "company": self.company.id, "payment_status": self.unpaid.id,
+        }, format="json")
+        self.assertEqual(response.data["status"], 404)
+        self.assertEqual(os.listdir(self.media.name), [])
+
+    def test_unchanged_report_reuses_its_file(self):
+        sales = "/payments/sales-report/excel/"
+        rows, written = self.export(sales, payment_status=self.unpaid.id)
+        first_url = self.file_url
+        self.assertTrue(first_url.endswith(f"-SalesReport-{timezone.now().year}.xlsx"))
+
+        again, reused = self.export(sales, payment_status=self.unpaid.id)
+        self.assertEqual((self.file_url, again), (first_url, rows))
+        self.assertLess(reused, written)
+        logs = ReportExportLog.objects.order_by("id")
+        self.assertEqual([log.cache_hit for log in logs], [False, True])
+        self.assertEqual(logs[0].cache_key, logs[1].cache_key)
+        self.assertEqual(logs[1].generated_by, self.owner_user)
+
+        # Other filters, an edited invoice or a renamed party: another file
+        key = SalesReport(self.company.id, {"payment_status": self.unpaid.id}).cache_key("xlsx", 1)
+        self.assertEqual(key, SalesReport(str(self.company.id), {"payment_status": str(self.unpaid.id)}).cache_key("xlsx", 1))
+        self.assertNotEqual(key, SalesReport(self.company.id, {"payment_status": self.unpaid.id}).cache_key("xlsx", 2))
+        self.assertNotEqual(key, SalesReport(self.company.id, {
+            "payment_status": self.unpaid.id, "start_date": "2000-01-01", "end_date": "2100-01-01",
+        }).cache_key("xlsx", 1))
+
+        invoice = Invoice.objects.get(pk=self.invoices[0].pk)
+        invoice.notes = "edited"
+        invoice.save()
+        self.export(sales, payment_status=self.unpaid.id)
+        edited_url = self.file_url
+        self.assertNotEqual(edited_url, first_url)
+
+        self.party.name = "Renamed Buyer"
+        self.party.save()
+        rows, _ = self.export(sales, payment_status=self.unpaid.id)
+        self.assertNotEqual(self.file_url, edited_url)
+        self.assertEqual(rows[3][2], "Renamed Buyer")
+        self.assertEqual(
+            list(ReportExportLog.objects.order_by("id").values_list("cache_hit", flat=True)),
+            [False, True, False, False],
+        )
+
+    def test_a_new_day_or_company_name_is_a_new_file(self):
+        report = SalesReport(self.company.id, {"payment_status": self.unpaid.id})
+        key = report.cache_key("xlsx", 1)
+        report.generated_on += timezone.timedelta(days=1)
+        self.assertNotEqual(report.cache_key("xlsx", 1), key)
+
+        self.export("/payments/sales-report/excel/", payment_status=self.unpaid.id)
+        first_url = self.file_url
+        self.company.name = "Acme Traders"
+        self.company.save()
+        rows, _ = self.export("/payments/sales-report/excel/", payment_status=self.unpaid.id)
+        self.assertNotEqual(self.file_url, first_url)
+        self.assertTrue(rows[1][0].startswith("Acme Traders - "))
+
+    def test_prune_removes_unused_files(self):
+        self.export("/payments/sales-report/excel/", payment_status=self.unpaid.id)
+        cache_dir = os.path.join(self.media.name, settings.REPORT_CACHE_DIR)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        call_command("prune_report_cache", stdout=StringIO())
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        old = time.time() - 30 * 86400
+        for name in os.listdir(cache_dir):
+            os.utime(os.path.join(cache_dir, name), (old, old))
+        out = StringIO()
+        call_command("prune_report_cache", stdout=out)
+        self.assertEqual(os.listdir(cache_dir), [])
+        self.assertIn("1 cached reports removed", out.getvalue())
+
+    def test_data_cells_have_a_thin_border(self):
+        target = io.BytesIO()
+        write_excel(SalesReport(self.company.id, {"payment_status": self.unpaid.id}), target)
+        sheet = openpyxl.load_workbook(target).active
+        self.assertEqual(sheet.cell(row=3, column=1).border.left.style, "thin")
+        self.assertEqual(
+            {sheet.cell(row=4, column=column).border.bottom.style for column in range(1, 10)}, {"thin"}
+        )
+
+    def test_column_widths_come_from_the_sample(self):
+        self.assertEqual(column_widths(["Id", "Name"], [[1, "A long name"], [22, None]]), [5, 14])
+        self.assertEqual(column_widths(["Note"], [["x" * 500]]), [60])
+
+
+class ReportJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name, REPORT_CHUNK_SIZE=2, REPORT_JOB_PROGRESS_EVERY=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.unpaid = PaymentStatus.objects.get(label="Unpaid")
+        Invoice.objects.filter(company=self.company).update(payment_status=self.unpaid)
+
+    def submit(self, **body):
+        return self.client.post("/payments/reports/jobs/", body, format="json")
+
+    def test_submit_run_and_download(self):
+        response = self.submit(report_type="sales", payment_status=self.unpaid.id, ignored="x")
+        self.assertEqual(response.status_code, 202, response.data)
+        job_id = response.data["data"]["job_id"]
+        self.assertEqual(response.data["data"]["state"], "queued")
+        self.assertEqual(response.data["data"]["filters"], {"payment_status": self.unpaid.id})
+
+        not_ready = self.client.get(f"/payments/reports/jobs/{job_id}/download/")
+        self.assertEqual(not_ready.status_code, 409)
+
+        self.assertEqual(ReportWorker(name="test").run_once(), 1)
+        job = ReportJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.total_rows, job.rows_written, job.worker), ("done", 3, 3, "test"))
+        self.assertEqual(ReportExportLog.objects.get(job=job).report_type, "sales")
+
+        detail = self.client.get(f"/payments/reports/jobs/{job_id}/").data["data"]
+        self.assertEqual((detail["state"], detail["progress"]), ("done", 100.0))
+        self.assertTrue(detail["download_url"].endswith(f"/payments/reports/jobs/{job_id}/download/"))
+
+        download = self.client.get(f"/payments/reports/jobs/{job_id}/download/")
+        self.assertEqual(download.status_code, 200)
+        self.assertIn("attachment", download["Content-Disposition"])
+        with tempfile.NamedTemporaryFile(suffix=".xlsx") as copy:
+            copy.write(b"".join(download.streaming_content))
+            copy.flush()
+            rows = list(openpyxl.load_workbook(copy.name).active.iter_rows(values_only=True))
+        self.assertEqual([row[0] for row in rows[3:]], ["INV-1", "INV-2", "INV-3"])
+
+        # Nothing changed since: the next job reuses the file
+        again = self.submit(report_type="sales", payment_status=self.unpaid.id).data["data"]["job_id"]
+        ReportWorker().run_once()
+        self.assertEqual(ReportJob.objects.get(pk=again).file, job.file)
+        self.assertEqual(list(ReportExportLog.objects.order_by("id").values_list("cache_hit", flat=True)), [False, True])
+
+    def test_validation(self):
+        self.assertEqual(self.submit(report_type="payroll").status_code, 400)
+        response = self.submit(report_type="purchase")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("payment_status", response.data["message"])
+        self.assertFalse(ReportJob.objects.exists())
+
+    def test_failed_job_reports_its_error(self):
+        job = ReportJob.objects.create(company=self.company, report_type="sales", filters={"payment_status": "x"})
+        with self.assertLogs("payments.jobs", "ERROR"):
+            ReportWorker().run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertTrue(job.error)
+        detail = self.client.get(f"/payments/reports/jobs/{job.id}/").data["data"]
+        self.assertEqual(detail["state"], "failed")
+        self.assertNotIn("download_url", detail)
+        self.assertFalse(any(files for _, _, files in os.walk(self.media.name)))
+
+    def test_claims_are_exclusive_and_stale_jobs_requeued(self):
+        jobs = [ReportJob.objects.create(company=self.company, report_type="bank_transactions") for _ in range(3)]
+        first, second = ReportWorker(name="a"), ReportWorker(name="b")
+        self.assertEqual(first.claim(2), [jobs[0].id, jobs[1].id])
+        self.assertEqual(second.claim(5), [jobs[2].id])
+        self.assertEqual(first.claim(5), [])
+
+        ReportJob.objects.filter(pk=jobs[0].id).update(heartbeat_at=timezone.now() - timezone.timedelta(hours=1))
+        self.assertEqual(ReportWorker.requeue_stale(), 1)
+        self.assertEqual(second.claim(5), [jobs[0].id])
+
+    def test_requeued_job_is_not_finished_by_its_first_run(self):
+        job = ReportJob.objects.create(company=self.company, report_type="sales", filters={"payment_status": self.unpaid.id})
+        first, second = ReportWorker(name="a"), ReportWorker(name="b")
+        first.claim(1)
+        # The slow first run was taken for dead and claimed again
+        ReportJob.objects.filter(pk=job.id).update(heartbeat_at=timezone.now() - timezone.timedelta(hours=1))
+        ReportWorker.requeue_stale()
+        second.claim(1)
+
+        with self.assertLogs("payments.jobs", "WARNING"):
+            run_job(job.id, first.name)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.file), ("running", "b", ""))
+
+        run_job(job.id, second.name)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.rows_written), ("done", "b", 3))
+
+    def test_other_company_cannot_read_the_job(self):
+        job = ReportJob.objects.create(company=self.company, report_type="sales", filters={"payment_status": self.unpaid.id})
+        stranger = User.objects.create_user(username="stranger", password="pass1234")
+        client = APIClient()
+        client.force_authenticate(stranger)
+        self.assertNotEqual(client.get(f"/payments/reports/jobs/{job.id}/").status_code, 200)
+
+
+class ReportCSVTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_invoice_fixture(cls)
+
+    def setUp(self):
+        self.client = company_client(self.owner_user, self.company)
+        self.unpaid = PaymentStatus.objects.get(label="Unpaid")
+        Invoice.objects.filter(company=self.company).update(payment_status=self.unpaid)
+
+    def csv_export(self, **body):
+        response = self.client.post("/payments/reports/csv/", body, format="json")
+        self.assertEqual(response.status_code, 200, getattr(response, "data", None))
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_sales_csv(self):
+        response, body = self.csv_export(report_type="sales", payment_status=self.unpaid.id)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('SalesReport-', response["Content-Disposition"])
+        rows = list(csv.reader(io.StringIO(body.decode())))
+        self.assertEqual(rows[0][:3], ["Invoice Number", "Date", "Party"])
+        self.assertEqual([row[0] for row in rows[1:]], ["INV-1", "INV-2", "INV-3"])
+        self.assertEqual(rows[1][2:], ["Buyer", "0.0", "0.0", "0.0", "100.0", "0.0", "Unpaid"])
+        log = ReportExportLog.objects.get()
+        self.assertEqual((log.report_type, log.export_format), ("sales", "csv"))
+        self.assertEqual((log.cache_key, log.cache_hit, log.file), ("", None, ""))
+
+    def test_gzip_matches_plain(self):
+        _, plain = self.csv_export(report_type="sales", payment_status=self.unpaid.id)
+        response, packed = self.csv_export(report_type="sales", payment_status=self.unpaid.id, format="csv.gz")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertTrue(response["Content-Disposition"].endswith('.csv.gz"'))
+        self.assertEqual(gzip.decompress(packed), plain)
+        self.assertEqual(
+            list(ReportExportLog.objects.order_by("id").values_list("export_format", flat=True)), ["csv", "csv.gz"]
+        )
+
+    @override_settings(REPORT_CHUNK_SIZE=2)
+    def test_invoice_lines_stream_in_chunks(self):
+        unit = UnitType.objects.get(code="pcs")
+        items = [
+            Item.objects.create(name=f"Item {n}", code=f"I{n}", quantity=1, unit=unit, price=1.0, sales_price=2.0,
+                                tax_percent=0.0, company=self.company)
+            for n in range(2)
+        ]
+        for invoice in self.invoices:
+            for item in items:
+                InvoiceItem.objects.create(invoice=invoice, item=item, quantity=3, rate=2.0, amount=6.0)
+        purchase = Invoice.objects.create(
+            company=self.company, party=self.party, created_by=self.owner_user, invoice_number="PUR-1",
+            invoice_type=self.purchase, total=5.0,
+        )
+        InvoiceItem.objects.create(invoice=purchase, item=items[0], quantity=1, rate=5.0, amount=5.0)
+
+        report = REPORTS["invoice_lines"](self.company.id, {"invoice_type": "sales"})
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(iter_csv(report))
+        self.assertEqual(len(chunks), 3)  # two rows each, the headers in the first
+        self.assertEqual(len([q for q in queries if "invoice_invoiceitem" in q["sql"]]), 1)
+
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+        self.assertEqual(rows[0][:6], ["Invoice Number", "Date", "Invoice Type", "Party", "Item Code", "Item"])
+        self.assertEqual(len(rows), 1 + 6)
+        self.assertEqual(rows[1][4:], ["I0", "Item 0", "3", "2.0", "0.0", "6.0", "Unpaid"])
+
+        _, body = self.csv_export(report_type="invoice_lines", format="csv.gz")
+        self.assertEqual(len(gzip.decompress(body).decode().splitlines()), 1 + 7)
+
+    def test_validation(self):
+        self.assertEqual(self.client.post("/payments/reports/csv/", {"report_type": "sales"}, format="json").status_code, 400)
+        response = self.client.post("/payments/reports/csv/", {
+            "report_type": "bank_transactions", "format": "xml",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,106 @@
+"""
+Payments in and out of a company as one stream (payments/timeline/).
+
+Both tables are read as the same .values() shape and combined with a single
+UNION ALL ordered by (payment_date, direction, id), newest first; ids repeat
+across the tables, so the direction is part of the key. Paging is keyset
+based: the position filter is pushed into each branch, where it can use the
+(company, payment_date, id) indexes, and the LIMIT applies to the union, so a
+page costs the same however many payments the company has.
+"""
+from datetime import date
+
+from django.db.models import CharField, F, Q, Value
+
+from company.pagination import InvalidCursor, keyset_after
+from .models import PaymentIn, PaymentOut
+
+
+# Newest first compares directions descending too: "out" sorts before "in"
+DIRECTIONS = {"in": PaymentIn, "out": PaymentOut}
+TIMELINE_ORDERING = ("-payment_date", "-direction", "-id")
+
+
+def branch_after(direction, position):
+    """Rows of one branch that come after `position` (date, direction, id) in timeline order."""
+    payment_date, last_direction, last_id = position
+    if direction == last_direction:
+        return keyset_after(("-payment_date", "-id"), [payment_date, last_id])
+    if direction < last_direction:
+        # The same date still follows in this branch
+        return Q(payment_date__lte=payment_date)
+    return Q(payment_date__lt=payment_date)
+
+
+def parse_position(position):
+    try:
+        payment_date, direction, last_id = position
+        if direction not in DIRECTIONS:
+            raise ValueError(direction)
+        return date.fromisoformat(payment_date), direction, int(last_id)
+    except (TypeError, ValueError):
+        raise InvalidCursor()
+
+
+def position_of(row):
+    return [row["payment_date"].isoformat(), row["direction"], row["id"]]
+
+
+class PaymentTimeline:
+
+    def __init__(self, company_id, directions=None, start_date=None, end_date=None, party_id=None, bank_account_id=None):
+        self.company_id = company_id
+        self.directions = directions or list(DIRECTIONS)
+        self.filters = {}
+        if start_date:
+            self.filters["payment_date__gte"] = start_date
+        if end_date:
+            self.filters["payment_date__lte"] = end_date
+        if party_id:
+            self.filters["invoice__party_id"] = party_id
+        if bank_account_id:
+            self.filters["bank_account_id"] = bank_account_id
+
+    def base(self, direction):
+        return DIRECTIONS[direction].objects.filter(company_id=self.company_id, **self.filters)
+
+    def branch(self, direction, position=None):
+        queryset = self.base(direction)
+        if position is not None:
+            queryset = queryset.filter(branch_after(direction, position))
+        return queryset.values(
+            "id", "amount", "payment_date", "note", "invoice_id", "bank_account_id",
+            direction=Value(direction, output_field=CharField()),
+            invoice_number=F("invoice__invoice_number"),
+            party_id=F("invoice__party_id"),
+            party_name=F("invoice__party__name"),
+            bank_name=F("bank_account__bank_name"),
+        )
+
+    def fetch(self, position, limit):
+        """Up to `limit` rows after `position` (None = from the newest), in one query."""
+        if position is not None:
+            position = parse_position(position)
+        branches = [self.branch(direction, position) for direction in self.directions]
+        queryset = branches[0].union(*branches[1:], all=True) if len(branches) > 1 else branches[0]
+        return list(queryset.order_by(*TIMELINE_ORDERING)[:limit])
+
+    def count(self):
+        return sum(self.base(direction).count() for direction in self.directions)
+
+    @staticmethod
+    def build_row(row):
+        # Same keys as ListPaymentsView, plus party and bank account ids
+        return {
+            "id": row["id"],
+            "type": row["direction"],
+            "amount": row["amount"],
+            "payment_date": row["payment_date"].isoformat() if row["payment_date"] else None,
+            "note": row["note"] or "",
+            "invoice_id": row["invoice_id"],
+            "invoice_number": row["invoice_number"],
+            "party_id": row["party_id"],
+            "party_name": row["party_name"],
+            "bank_account_id": row["bank_account_id"],
+            "bank_name": row["bank_name"] or ("Cash" if row["direction"] == "out" else None),
+        }
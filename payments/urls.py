@@ -4,6 +4,7 @@ from django.conf.urls.static import static
 
 urlpatterns = [
     path('list/', ListPaymentsView.as_view(), name='list-payments'),
+    path('timeline/', PaymentTimelineView.as_view(), name='payment-timeline'),
     path('payment-in/', CreatePaymentInView.as_view(), name='create-payment-in'),
     path('payment-out/', CreatePaymentOutView.as_view(), name='create-payment-out'),
     path('cash-transactions/create/', CreateCashTransactionView.as_view(), name='create-cash-transaction'),
@@ -20,5 +21,9 @@ urlpatterns = [
     path('sales-report/excel/', SalesReportExportExcelView.as_view(), name='sales_excel_export'),
     path('purchase-report/excel/', PurchaseReportExportExcelView.as_view(), name='purchase-report-excel'),
     path('bank-transaction-report/excel/', BankTransactionReportExportExcelView.as_view(), name='export-bank-transaction-excel'),
+    path('reports/csv/', ReportCSVExportView.as_view(), name='report-csv-export'),
+    path('reports/jobs/', CreateReportJobView.as_view(), name='create-report-job'),
+    path('reports/jobs/<int:pk>/', ReportJobDetailView.as_view(), name='report-job-detail'),
+    path('reports/jobs/<int:pk>/download/', ReportJobDownloadView.as_view(), name='report-job-download'),
 
 ]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
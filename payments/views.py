@@ -3,25 +3,26 @@ from rest_framework.response import Response
 from rest_framework import status
 from companies.models import Company
 from invoice.models import *
+from invoice.reference import reference_by_id
 from .models import *
 from .serializers import *
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
 import traceback
 from django.http import HttpResponse
-from openpyxl import Workbook
 from invoice.models import Invoice
-from datetime import datetime
-import openpyxl
-from openpyxl.styles import Font, Alignment,Border,Side
-from openpyxl.utils import get_column_letter
-from datetime import datetime
-from io import BytesIO
 import os
 from .utils import *
-from django.utils.text import slugify
-from django.conf import settings
+from django.utils.dateparse import parse_date
 from staff.permission import get_company_id, IsCompanyAdminOrAssigned, HasModulePermission
+from company.pagination import KeysetPaginator
+from company.streaming import StreamingJSONResponse, stream_rows, wants_stream
+from .timeline import PaymentTimeline, position_of
+from .reports import BankTransactionReport, PurchaseReport, SalesReport
+from .exports import CSV_CONTENT_TYPES, export_to_media, iter_csv, log_stream
+from .jobs import job_path, job_payload
+from .reports import REPORTS
+from django.http import FileResponse, StreamingHttpResponse
 
 class CreatePaymentInView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
@@ -170,9 +171,8 @@ class CreatePaymentOutView(APIView):
                 return Response({"status": 500, "message": "Invoice not found for this company."})
 
         # Validate payment type
-        try:
-            payment_type = PaymentType.objects.get(id=payment_type_id)
-        except PaymentType.DoesNotExist:
+        payment_type = reference_by_id(PaymentType, payment_type_id)
+        if not payment_type:
             return Response({"status": 500, "message": "Invalid payment type."}, status=400)
 
       
@@ -262,23 +262,28 @@ class ListPaymentsView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Payment"
     required_permission = "get_using_post"
+    query_budget = 8
 
     def post(self, request):
         company_id = get_company_id(request, self)
         if not company_id:
             return Response({"detail": "Company ID is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        payment_ins = (
+        # Both lists are paged side by side under one cursor
+        paginator = KeysetPaginator(request)
+        payment_ins = paginator.paginate(
             PaymentIn.objects
             .filter(company_id=company_id)
-            .select_related("invoice", "invoice__party", "bank_account")
-            .order_by("-payment_date", "-id")
+            .select_related("invoice", "invoice__party", "bank_account"),
+            ("-payment_date", "-id"),
+            name="payment_ins",
         )
-        payment_outs = (
+        payment_outs = paginator.paginate(
             PaymentOut.objects
             .filter(company_id=company_id)
-            .select_related("invoice", "invoice__party", "bank_account")
-            .order_by("-payment_date", "-id")
+            .select_related("invoice", "invoice__party", "bank_account"),
+            ("-payment_date", "-id"),
+            name="payment_outs",
         )
 
         def build_in(p):
@@ -307,9 +312,73 @@ class ListPaymentsView(APIView):
                 "bank_name": p.bank_account.bank_name if p.bank_account else "Cash",
             }
 
+        if wants_stream(request) and not paginator.enabled:
+            return StreamingJSONResponse({
+                "payment_ins": stream_rows(payment_ins, build_in),
+                "payment_outs": stream_rows(payment_outs, build_out),
+            })
+
         return Response({
             "payment_ins": [build_in(p) for p in payment_ins],
             "payment_outs": [build_out(p) for p in payment_outs],
+            **paginator.extra(),
+        })
+
+
+class PaymentTimelineView(APIView):
+    """
+    PaymentIn and PaymentOut of a company merged into one stream, newest first, always paged.
+    Filters (POST body): start_date, end_date, party, bank_account, direction ("in" / "out").
+    """
+    permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
+    required_module = "Payment"
+    required_permission = "get_using_post"
+    query_budget = 8
+
+    def post(self, request):
+        company_id = get_company_id(request, self)
+        if not company_id:
+            return Response({"detail": "Company ID is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = request.data
+        direction = data.get("direction") or None
+        if direction not in (None, "in", "out"):
+            return Response({"detail": "direction must be 'in' or 'out'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        def optional(key, convert):
+            if not data.get(key):
+                return None
+            value = convert(str(data[key]))
+            if value is None:
+                raise ValueError(key)
+            return value
+
+        try:
+            start_date = optional("start_date", parse_date)
+            end_date = optional("end_date", parse_date)
+            party_id = optional("party", int)
+            bank_account_id = optional("bank_account", int)
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid filter value."}, status=status.HTTP_400_BAD_REQUEST)
+
+        timeline = PaymentTimeline(
+            company_id,
+            directions=[direction] if direction else None,
+            start_date=start_date,
+            end_date=end_date,
+            party_id=party_id,
+            bank_account_id=bank_account_id,
+        )
+        paginator = KeysetPaginator(request)
+        rows = paginator.paginate_source(timeline.fetch, position_of, name="timeline")
+        if paginator.include_total:
+            paginator.totals["timeline"] = timeline.count()
+
+        return Response({
+            "msg": "Payment timeline fetched successfully.",
+            "data": [timeline.build_row(row) for row in rows],
+            "pagination": paginator.info(),
+            "status": 200,
         })
 
 
@@ -433,6 +502,7 @@ class UpdateCashLedgerView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Cash Ledger" 
     required_permission = "edit"
+    company_lookup = (CashLedger, "company_name_id")
     
 
     def put(self, request, pk):
@@ -454,6 +524,7 @@ class DeleteCashLedgerView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Cash Ledger" 
     required_permission = "delete"
+    company_lookup = (CashLedger, "company_name_id")
  
 
     def delete(self, request, pk):
@@ -475,15 +546,17 @@ class ListCashLedgersView(APIView):
     
 
     def get(self, request, company_id):
-        ledgers = CashLedger.objects.filter(company_name_id=company_id, deleted=False)
+        paginator = KeysetPaginator(request)
+        ledgers = paginator.paginate(CashLedger.objects.filter(company_name_id=company_id, deleted=False), ("id",))
         serializer = CashLedgerSerializer(ledgers, many=True)
-        return Response({"msg": "Success", "data": serializer.data, "status": 200})
+        return Response({"msg": "Success", "data": serializer.data, "status": 200, **paginator.extra()})
     
 # get ledger by id
 class GetCashLedgerByIdView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Cash Ledger" 
     required_permission = "view_specific"
+    company_lookup = (CashLedger, "company_name_id")
     
 
     def get(self, request, pk):
@@ -584,12 +657,16 @@ class ListBankTransfersView(APIView):
         except Company.DoesNotExist:
             return Response({"status": 404, "message": "Company not found."}, status=404)
 
-        transfers = BankToBankTransfer.objects.filter(company=company, deleted=False).order_by('-created_at')
+        paginator = KeysetPaginator(request)
+        transfers = paginator.paginate(
+            BankToBankTransfer.objects.filter(company=company, deleted=False), ("-created_at", "-id")
+        )
         serializer = BankTransferSerializer(transfers, many=True)
         return Response({
             "status": 200,
             "message": f"Bank transfers for company '{company.name}' retrieved successfully.",
-            "data": serializer.data
+            "data": serializer.data,
+            **paginator.extra(),
         }, status=200)
 
 
@@ -598,6 +675,7 @@ class GetBankTransferView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Bank Transfer" 
     required_permission = "view_specific"
+    company_lookup = (BankToBankTransfer, "company_id")
     
 
     def get(self, request, pk):
@@ -747,95 +825,14 @@ class SalesReportExportExcelView(APIView):
                 "message": "company and payment_status are required."
             }, status=400)
 
-        # Default invoice_type = 1 (Sales)
-        invoices = Invoice.objects.filter(
-            company_id=company_id,
-            invoice_type_id=1,
-            payment_status_id=payment_status,
-            is_deleted=False
-        )
-
-        if not invoices.exists():
+        report = SalesReport(company_id, {"payment_status": payment_status})
+        if not report.exists():
             return Response({
                 "status": 404,
                 "message": "No data found for the selected filters. Nothing to export."
             }, status=404)
 
-        # === Create Workbook ===
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Sales Report"
-
-        # === Header Row 1 (Title) ===
-        ws.merge_cells("A1:I1")
-        ws["A1"].value = "Sales Report"
-        ws["A1"].font = Font(bold=True, size=14)
-        ws["A1"].alignment = Alignment(horizontal="center")
-
-        # === Header Row 2 (Company + Date) ===
-        company_name = invoices.first().company.name
-        today = datetime.now().strftime("%d %B %Y")
-        ws.merge_cells("A2:I2")
-        ws["A2"].value = f"{company_name} - {today}"
-        ws["A2"].font = Font(bold=True)
-        ws["A2"].alignment = Alignment(horizontal="center")
-
-        # === Table Headers (Row 3) ===
-        headers = [
-            "Invoice Number", "Date", "Party", "Subtotal", "Tax", "Discount",
-            "Total", "Amount Paid", "Payment Status"
-        ]
-        thin_border = Border(
-            left=Side(style="thin"),
-            right=Side(style="thin"),
-            top=Side(style="thin"),
-            bottom=Side(style="thin")
-        )
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col_num)
-            cell.value = header
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="center")
-            cell.border = thin_border
-
-        # === Data Rows ===
-        for row_num, invoice in enumerate(invoices, start=4):
-            row_data = [
-                invoice.invoice_number,
-                invoice.created_at.strftime("%Y-%m-%d"),
-                invoice.party.name if invoice.party else "",
-                float(invoice.subtotal),
-                float(invoice.tax_amount),
-                float(invoice.discount_amount),
-                float(invoice.total),
-                float(invoice.amount_paid),
-                invoice.payment_status.label if invoice.payment_status else ""
-            ]
-            for col_num, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_num, column=col_num)
-                cell.value = value
-                cell.border = thin_border
-
-        # === Auto Width Columns ===
-        for col in ws.columns:
-            max_length = max(len(str(cell.value)) if cell.value else 0 for cell in col)
-            ws.column_dimensions[get_column_letter(col[0].column)].width = max_length + 3
-
-        # === Unique Filename Handling ===
-        year = datetime.now().year
-        base_name = f"{slugify(company_name)}-SalesReport-{year}"
-        filename = f"{base_name}.xlsx"
-        media_dir = settings.MEDIA_ROOT
-        filepath = os.path.join(media_dir, filename)
-
-        counter = 1
-        while os.path.exists(filepath):
-            filename = f"{base_name}({counter}).xlsx"
-            filepath = os.path.join(media_dir, filename)
-            counter += 1
-
-        wb.save(filepath)
-        download_url = request.build_absolute_uri(f"{settings.MEDIA_URL}{filename}")
+        download_url, _ = export_to_media(report, request)
 
         return Response({
             "msg": "Exported in Excel successfully",
@@ -860,101 +857,11 @@ class PurchaseReportExportExcelView(APIView):
         if not company_id or not payment_status:
             return Response({"status": 400, "message": "company and payment_status are required."})
 
-        # Fetch only purchase-type invoices (assuming id=2 OR use code='purchase')
-        invoices = Invoice.objects.filter(
-            company_id=company_id,
-            invoice_type__code__iexact="purchase",
-            payment_status_id=payment_status,
-            is_deleted=False
-        )
-
-        if not invoices.exists():
-            return Response({
-                "status": 404,
-                "message": "No data found for the selected filters. Nothing to export."
-            }, status=404)
-
-
-        if start_date and end_date:
-            invoices = invoices.filter(created_at__date__range=[start_date, end_date])
-
-        if not invoices.exists():
+        report = PurchaseReport(company_id, {"payment_status": payment_status, "start_date": start_date, "end_date": end_date})
+        if not report.exists():
             return Response({"status": 404, "message": "No matching purchase invoices found."})
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Purchase Report"
-
-        # Title
-        title = "Purchase Report"
-        ws.merge_cells("A1:I1")
-        ws["A1"].value = title
-        ws["A1"].font = Font(bold=True, size=14)
-        ws["A1"].alignment = Alignment(horizontal="center", vertical="center")
-
-        # Company info
-        company_name = invoices.first().company.name
-        today = datetime.now().strftime("%d %B %Y")
-        ws.merge_cells("A2:I2")
-        ws["A2"].value = f"{company_name} - {today}"
-        ws["A2"].font = Font(bold=True)
-        ws["A2"].alignment = Alignment(horizontal="center", vertical="center")
-
-        # Headers
-        headers = [
-            "Invoice Number", "Date", "Supplier", "Subtotal", "Tax", "Discount",
-            "Total", "Amount Paid", "Payment Status"
-        ]
-        header_row = 3
-        thin_border = Border(
-            left=Side(style="thin"),
-            right=Side(style="thin"),
-            top=Side(style="thin"),
-            bottom=Side(style="thin")
-        )
-
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=header_row, column=col_num)
-            cell.value = header
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="center")
-            cell.border = thin_border
-
-        # Data rows
-        for row_num, invoice in enumerate(invoices, start=header_row + 1):
-            row_data = [
-                invoice.invoice_number,
-                invoice.created_at.strftime("%Y-%m-%d"),
-                invoice.party.name if invoice.party else "",
-                float(invoice.subtotal),
-                float(invoice.tax_amount),
-                float(invoice.discount_amount),
-                float(invoice.total),
-                float(invoice.amount_paid),
-                invoice.payment_status.label if invoice.payment_status else ""
-            ]
-            for col_num, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_num, column=col_num)
-                cell.value = value
-                cell.border = thin_border
-
-        # Auto column width
-        for col in ws.columns:
-            max_length = max(len(str(cell.value)) if cell.value else 0 for cell in col)
-            ws.column_dimensions[get_column_letter(col[0].column)].width = max_length + 3
-
-        # Save & respond with download URL
-        year = datetime.now().year
-        safe_name = company_name.replace(" ", "_")
-        base_filename = f"{safe_name}-PurchaseReport-{year}.xlsx"
-        # filepath = os.path.join(settings.MEDIA_ROOT, filename)
-
-        filepath = get_unique_filepath(settings.MEDIA_ROOT, base_filename)
-
-        # Save workbook
-        wb.save(filepath)
-                
-        download_url = request.build_absolute_uri(f"{settings.MEDIA_URL}{filepath}")
+        download_url, _ = export_to_media(report, request)
 
         return Response({
             "msg": "Exported purchase report to Excel successfully.",
@@ -977,82 +884,116 @@ class BankTransactionReportExportExcelView(APIView):
         if not company_id:
             return Response({"status": 400, "message": "Company ID is required."})
 
-        transactions = BankTransaction.objects.filter(
-            bank_account__company_id=company_id
-        )
-
-        if start_date and end_date:
-            transactions = transactions.filter(
-                created_at__date__range=[start_date, end_date]
-            )
-
-        if not transactions.exists():
+        report = BankTransactionReport(company_id, {"start_date": start_date, "end_date": end_date})
+        if not report.exists():
             return Response({"status": 404, "message": "No bank transactions found for given filters."})
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Bank Transactions"
-
-        ws.merge_cells("A1:G1")
-        ws["A1"] = "Bank Transaction Report"
-        ws["A1"].font = Font(bold=True, size=14)
-        ws["A1"].alignment = Alignment(horizontal="center")
-
-        company_name = transactions.first().bank_account.company.name
-        today = datetime.now().strftime("%d %B %Y")
-        ws.merge_cells("A2:G2")
-        ws["A2"] = f"{company_name} - {today}"
-        ws["A2"].font = Font(bold=True)
-        ws["A2"].alignment = Alignment(horizontal="center")
-
-        headers = [
-            "Bank Account", "Type", "Amount", "Balance After Transaction",
-            "Description", "Invoice", "Date"
-        ]
-
-        header_row = 3
-        thin_border = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
-
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=header_row, column=col_num)
-            cell.value = header
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="center")
-            cell.border = thin_border
-
-        for row_num, tx in enumerate(transactions, start=header_row + 1):
-            row_data = [
-                str(tx.bank_account),
-                tx.transaction_type.capitalize(),
-                tx.amount,
-                tx.balance_after_transaction,
-                tx.description or "",
-                tx.related_invoice.invoice_number if tx.related_invoice else "",
-                tx.created_at.strftime("%Y-%m-%d %H:%M")
-            ]
-            for col_num, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_num, column=col_num)
-                cell.value = value
-                cell.border = thin_border
-
-        for col in ws.columns:
-            max_len = max(len(str(cell.value)) if cell.value else 0 for cell in col)
-            ws.column_dimensions[get_column_letter(col[0].column)].width = max_len + 3
-
-        year = datetime.now().year
-        safe_name = company_name.replace(" ", "_")
-        filename = f"{safe_name}-BankTransactions-{year}.xlsx"
-
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        file_path = os.path.join(settings.MEDIA_ROOT, filename)
-        wb.save(file_path)
-        download_url = request.build_absolute_uri(f"{settings.MEDIA_URL}{filename}")
+        download_url, _ = export_to_media(report, request)
 
         return Response({
             "msg": "Bank transaction report exported successfully",
             "file_url": download_url,
             "status": 200
         })
+
+
+#! -- report jobs (background exports) --
+def requested_report(request, company_id):
+    """(report, None) from the body's report_type and filters, or (None, error response)."""
+    report_type = request.data.get("report_type")
+    if not company_id:
+        return None, Response({"status": 400, "message": "Company ID is required."}, status=400)
+    if report_type not in REPORTS:
+        return None, Response({
+            "status": 400,
+            "message": f"report_type must be one of: {', '.join(REPORTS)}."
+        }, status=400)
+
+    report = REPORTS[report_type]
+    filters = report.filters_from(request.data)
+    missing = report.missing_filters(filters)
+    if missing:
+        return None, Response({"status": 400, "message": f"{', '.join(missing)} required."}, status=400)
+    return report(company_id, filters), None
+
+
+class CreateReportJobView(APIView):
+    permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
+    required_module = "Reports"
+    required_permission = "view"
+
+    def post(self, request):
+        report, error = requested_report(request, get_company_id(request, self))
+        if error:
+            return error
+
+        # Queued only; manage.py run_report_worker picks it up
+        job = ReportJob.objects.create(
+            company_id=report.company_id, report_type=report.name, filters=report.filters, requested_by=request.user,
+        )
+        return Response({
+            "status": 202,
+            "message": "Report queued.",
+            "data": job_payload(job, request),
+        }, status=202)
+
+
+class ReportJobDetailView(APIView):
+    permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
+    required_module = "Reports"
+    required_permission = "view"
+    company_lookup = (ReportJob, "company_id")
+
+    def get(self, request, pk):
+        job = ReportJob.objects.filter(pk=pk, company_id=get_company_id(request, self)).first()
+        if not job:
+            return Response({"status": 404, "message": "Report job not found."}, status=404)
+        return Response({"status": 200, "data": job_payload(job, request)})
+
+
+class ReportJobDownloadView(APIView):
+    permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
+    required_module = "Reports"
+    required_permission = "view"
+    company_lookup = (ReportJob, "company_id")
+
+    def get(self, request, pk):
+        job = ReportJob.objects.filter(pk=pk, company_id=get_company_id(request, self)).first()
+        if not job:
+            return Response({"status": 404, "message": "Report job not found."}, status=404)
+        if job.status != ReportJob.DONE:
+            return Response({
+                "status": 409,
+                "message": f"Report is {job.status}, not ready for download.",
+                "data": job_payload(job, request),
+            }, status=409)
+        if not os.path.exists(job_path(job)):
+            return Response({"status": 410, "message": "Report file is no longer available."}, status=410)
+
+        return FileResponse(open(job_path(job), "rb"), as_attachment=True, filename=os.path.basename(job.file))
+
+
+#! -- csv (streamed) --
+class ReportCSVExportView(APIView):
+    permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
+    required_module = "Reports"
+    required_permission = "view"
+
+    def post(self, request):
+        report, error = requested_report(request, get_company_id(request, self))
+        if error:
+            return error
+        export_format = request.data.get("format") or "csv"
+        if export_format not in CSV_CONTENT_TYPES:
+            return Response({
+                "status": 400,
+                "message": f"format must be one of: {', '.join(CSV_CONTENT_TYPES)}."
+            }, status=400)
+
+        log_stream(report, export_format, request.user.id)
+        # Rows go from the database cursor to the client as they are read; nothing is stored
+        response = StreamingHttpResponse(
+            iter_csv(report, compress=export_format == "csv.gz"), content_type=CSV_CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{report.filename(export_format)}"'
+        return response
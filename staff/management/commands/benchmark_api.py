@@ -0,0 +1,81 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from company.benchmark import compare_results, create_bench_users, run_benchmark, save_results
+
+
+class Command(BaseCommand):
+    help = "In-process load test of the REST API: latency percentiles and requests/sec per endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+        parser.add_argument("--iterations", type=int, default=5, help="Scenario runs per user")
+        parser.add_argument("--output", help="Write the results as JSON to this file")
+        parser.add_argument("--compare", help="Earlier results JSON to print p95/rps deltas against")
+        parser.add_argument(
+            "--current-db",
+            action="store_true",
+            help="Run against the configured database (e.g. a generated dataset) instead of a throwaway one",
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Pick the database first; the configured one is not touched without --current-db
+        old_name = None
+        if not options["current_db"]:
+            if connection.vendor == "sqlite" and not connection.settings_dict["TEST"].get("NAME"):
+                # A file, not the shared in-memory DB: the users write from several threads
+                connection.settings_dict["TEST"]["NAME"] = str(settings.BASE_DIR / "bench_db.sqlite3")
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        saved_options = dict(connection.settings_dict["OPTIONS"])
+        if connection.vendor == "sqlite":
+            # Writers from several threads: take the write lock up front and wait for it.
+            # Read when a connection opens, so close the one the setup may have left open.
+            connection.close()
+            connection.settings_dict["OPTIONS"].setdefault("transaction_mode", "IMMEDIATE")
+            connection.settings_dict["OPTIONS"].setdefault("timeout", 30)
+
+        try:
+            accounts = create_bench_users(options["users"])
+            result = run_benchmark(accounts, iterations=options["iterations"])
+        finally:
+            connection.close()
+            connection.settings_dict["OPTIONS"] = saved_options
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.print_table(result)
+
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                previous = json.load(fh)
+            self.stdout.write("\nendpoint                p95 ms (before -> after)      rps (before -> after)")
+            for endpoint, row in compare_results(previous, result).items():
+                p95, rps = row["p95_ms"], row["rps"]
+                self.stdout.write(
+                    f"{endpoint:<22} {p95[0]:>9} -> {p95[1]:<9} ({p95[2]:+})   {rps[0]:>8} -> {rps[1]:<8} ({rps[2]:+})"
+                )
+
+        if options["output"]:
+            save_results(result, options["output"])
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def print_table(self, result):
+        self.stdout.write(
+            f"{result['users']} users x {result['iterations']} iterations on {result['database']} "
+            f"in {result['duration_s']}s"
+        )
+        self.stdout.write(f"{'endpoint':<22} {'req':>6} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+        rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+        for endpoint, stats in rows:
+            self.stdout.write(
+                f"{endpoint:<22} {stats['requests']:>6} {stats['errors']:>5} {stats['rps']:>8} "
+                f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}"
+            )
@@ -0,0 +1,61 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from company.dataset import DATASET_PASSWORD, DEFAULT_END_DATE, DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic dataset (companies, parties, items, invoices, payments, bank/cash transactions)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--companies", type=int, default=10)
+        parser.add_argument("--parties", type=int, default=50, help="Parties per company")
+        parser.add_argument("--items", type=int, default=50, help="Items per company")
+        parser.add_argument("--invoices", type=int, default=1000, help="Invoices per company")
+        parser.add_argument("--lines", type=int, default=3, help="Average line items per invoice")
+        parser.add_argument("--transfers", type=int, default=10, help="Bank-to-bank transfers per company")
+        parser.add_argument("--days", type=int, default=365, help="Spread dates over this many past days")
+        parser.add_argument("--end-date", type=date.fromisoformat, default=DEFAULT_END_DATE,
+                            help="Last day of the spread (YYYY-MM-DD); fixed, so a seed gives the same data on any day")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--tag", help="Prefix for unique names; defaults to s<seed>, change it to load a second dataset")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Rows per bulk insert")
+        parser.add_argument("--companies-per-batch", type=int, default=10, help="Companies per transaction")
+
+    def handle(self, *args, **options):
+        for name in ("companies", "parties", "items", "lines", "days", "batch_size", "companies_per_batch"):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+        for name in ("invoices", "transfers"):
+            if options[name] < 0:
+                raise CommandError(f"--{name} cannot be negative.")
+
+        generator = DatasetGenerator(
+            seed=options["seed"],
+            tag=options["tag"],
+            batch_size=options["batch_size"],
+            days=options["days"],
+            end_date=options["end_date"],
+            log=self.stdout.write,
+        )
+
+        started = time.perf_counter()
+        counts = generator.generate(
+            companies=options["companies"],
+            parties=options["parties"],
+            items=options["items"],
+            invoices=options["invoices"],
+            lines=options["lines"],
+            companies_per_batch=options["companies_per_batch"],
+            transfers=options["transfers"],
+        )
+        elapsed = time.perf_counter() - started
+
+        for model, count in counts.items():
+            self.stdout.write(f"{model:<20} {count:>12}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {generator.total_rows()} rows in {elapsed:.1f}s. "
+            f"Owners log in as {generator.tag}-owner-<n> / {DATASET_PASSWORD}"
+        ))
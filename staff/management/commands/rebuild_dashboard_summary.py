@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from companies.models import Company
+from companies.summary import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-company dashboard totals from the invoice, bank account and cash ledger tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, action="append", help="Only this company (repeatable)")
+
+    def handle(self, *args, **options):
+        companies = Company.objects.order_by("id").values_list("id", flat=True)
+        if options["company"]:
+            companies = companies.filter(id__in=options["company"])
+
+        started = time.perf_counter()
+        count = 0
+        for company_id in companies.iterator():
+            rebuild_summary(company_id)
+            count += 1
+        self.stdout.write(f"{count} company summaries rebuilt in {time.perf_counter() - started:.2f}s")
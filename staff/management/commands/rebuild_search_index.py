@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from items.search import ITEM_SEARCH
+from parties.search import PARTY_SEARCH
+
+
+class Command(BaseCommand):
+    help = "Rebuild the party/item typeahead index (after bulk loads or raw SQL edits)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, action="append", help="Only this company (repeatable)")
+
+    def handle(self, *args, **options):
+        for label, index in (("parties", PARTY_SEARCH), ("items", ITEM_SEARCH)):
+            if not index.available:
+                self.stdout.write(f"{label}: no FTS5 index on this database, search uses icontains")
+                continue
+            started = time.perf_counter()
+            count = index.rebuild(company_ids=options["company"])
+            self.stdout.write(f"{label}: {count} rows indexed in {time.perf_counter() - started:.2f}s")
@@ -2,9 +2,10 @@ from rest_framework.permissions import BasePermission
 from companies.models import Company
 from staff.models import StaffProfile
 from customer.models import Customer
-from .models import ModulePermission
+from .permission_cache import PERMISSION_BITS, role_has_permission
+from .tokens import get_token_company_claims
+from django.utils.functional import cached_property
 from rest_framework.response import Response
-from parties.models import *
 
 
 # def get_company_id(request, view=None):
@@ -29,38 +30,132 @@ def get_company_id(request, view=None):
     )
 
 def get_company_from_instance(view, request):
-    try:
-        if hasattr(view, 'kwargs') and 'pk' in view.kwargs:
-            party = Party.objects.get(pk=view.kwargs['pk'], deleted=False)
-            return party.company_id
-    except Party.DoesNotExist:
+    """
+    Resolves the company of the object named by the URL's pk through the view's
+    company_lookup = (Model, "field path"), e.g. (Invoice, "company_id") or
+    (BankTransaction, "bank_account__company_id"). An optional third element
+    filters the row, e.g. (Party, "company_id", {"deleted": False}), so a
+    soft-deleted object resolves to no company.
+    Only the company id is fetched, once per request.
+    """
+    lookup = getattr(view, 'company_lookup', None)
+    if not lookup or not hasattr(view, 'kwargs') or 'pk' not in view.kwargs:
         return None
 
+    if not hasattr(request, '_instance_company_id'):
+        model, field_path, *conditions = lookup
+        filters = conditions[0] if conditions else {}
+        request._instance_company_id = (
+            model.objects.filter(pk=view.kwargs['pk'], **filters).values_list(field_path, flat=True).first()
+        )
+    return request._instance_company_id
 
-class IsCompanyAdminOrAssigned(BasePermission):
-    def has_permission(self, request, view):
-        company_id = get_company_id(request, view)
-        #print(f" [IsCompanyAdminOrAssigned] Company ID: {company_id}")
 
-        if not company_id:
-            # #print("No company ID found.")
-            return False
+#! auth context (resolved once per request)
+class AuthContext:
+    """
+    Who the user is for one company: owner (Customer) or staff (StaffProfile),
+    plus the staff role.
+    Permission checks go through the compiled matrix in permission_cache,
+    or through the signed token claims when those are present and current.
+    Every DB lookup is lazy and done at most once.
+    """
+
+    def __init__(self, user, company_id, claims=None):
+        self.user = user
+        self.company_id = company_id
+        # Company entry of the token claims (see staff.tokens); None means ask the DB
+        self.claims = claims
 
-        try:
-            customer = Customer.objects.get(user=request.user)
-            #print(f" Customer found: {customer}")
-        except Customer.DoesNotExist:
-            customer = None
-            #print(" Customer does not exist.")
+    @cached_property
+    def customer(self):
+        return Customer.objects.filter(user=self.user).first()
 
-        if customer and Company.objects.filter(id=company_id, owner=customer, is_active=True).exists():
-            #print(" User is the company owner")
+    @cached_property
+    def owned_company(self):
+        # Company is linked to Customer via the 'owner' relation
+        if not self.customer:
+            return None
+        return Company.objects.filter(id=self.company_id, owner=self.customer).first()
+
+    @cached_property
+    def is_owner(self):
+        if self.claims is not None:
+            return bool(self.claims.get("o"))
+        return bool(self.owned_company and self.owned_company.is_active)
+
+    @cached_property
+    def staff(self):
+        return StaffProfile.objects.select_related("company", "job_role").filter(
+            user=self.user, company_id=self.company_id, is_active=True
+        ).first()
+
+    @property
+    def company(self):
+        if self.owned_company:
+            return self.owned_company
+        return self.staff.company if self.staff else None
+
+    @property
+    def is_staff(self):
+        if self.claims is not None:
+            return "r" in self.claims
+        return self.staff is not None
+
+    @property
+    def role(self):
+        return self.staff.job_role if self.staff else None
+
+    @property
+    def role_id(self):
+        if self.claims is not None:
+            return self.claims.get("r")
+        return self.staff.job_role_id if self.staff else None
+
+    def has_module_permission(self, required_module, required_permission):
+        if self.is_owner:
             return True
+        if self.claims is not None:
+            bit = PERMISSION_BITS.get(required_permission, 0)
+            return bool(self.claims.get("p", {}).get(required_module.lower(), 0) & bit)
+        if not self.role_id:
+            return False
+        # Compiled bitmask lookup, no SQL on a warm cache
+        return role_has_permission(self.company_id, self.role_id, required_module, required_permission)
+
+
+def resolve_auth_context(request, company_id):
+    """Returns the AuthContext of request.user for company_id, memoized on the request."""
+    contexts = getattr(request, "_auth_contexts", None)
+    if contexts is None:
+        contexts = {}
+        request._auth_contexts = contexts
+
+    key = str(company_id)
+    if key not in contexts:
+        contexts[key] = AuthContext(request.user, company_id, get_token_company_claims(request, company_id))
+    return contexts[key]
+
 
-        is_staff = StaffProfile.objects.filter(user=request.user, company_id=company_id, is_active=True).exists()
-        #print(f"Staff assigned to company: {is_staff}")
+def get_auth_context(request, view=None):
+    """
+    Returns the AuthContext for the company of this request (or None when no
+    company can be found) and attaches it as request.auth_context.
+    """
+    if not hasattr(request, "auth_context"):
+        company_id = get_company_id(request, view)
+        request.auth_context = resolve_auth_context(request, company_id) if company_id else None
+    return request.auth_context
+
+
+class IsCompanyAdminOrAssigned(BasePermission):
+    def has_permission(self, request, view):
+        context = get_auth_context(request, view)
+
+        if not context:
+            return False
 
-        return is_staff
+        return context.is_owner or context.is_staff
 
 
 class HasModulePermission(BasePermission):
@@ -71,46 +166,17 @@ class HasModulePermission(BasePermission):
         if not required_module or not required_permission:
             return False
 
-        company_id = get_company_id(request, view)
-        if not company_id:
+        context = get_auth_context(request, view)
+        if not context:
             return False
 
-        try:
-            customer = Customer.objects.get(user=request.user)
-        except Customer.DoesNotExist:
-            customer = None
-
-        if customer and Company.objects.filter(id=company_id, owner=customer, is_active=True).exists():
+        if context.is_owner:
             return True
 
-        staff = StaffProfile.objects.filter(user=request.user, company_id=company_id, is_active=True).first()
-        if not staff or not staff.job_role:
-            #print("❌ No staff or no job role.")
-            return False
-        
-        #print("🔐 Module:", required_module)
-        #print("🔐 Permission:", required_permission)
-        #print("🔐 Company:", company_id)
-        #print("🔐 Role ID:",  staff.job_role.id if staff.job_role else None)
-
-        permission_qs = ModulePermission.objects.filter(
-            job_role=staff.job_role,
-            required_module__iexact=required_module,
-            company_id=company_id
-        ).first()
-
-        if not permission_qs:
-            #print("❌ No permission found for this module and role.")
+        if not context.role_id:
             return False
-    
-
-        #print("🔐 Module:", required_module)
-        #print("🔐 Permission:", required_permission)
-        #print("🔐 Company:", company_id)
-        #print("🔐 Role ID:",  staff.job_role.id if staff.job_role else None)
-        #print("🔐 Permission Check Result:", getattr(permission_qs, f"can_{required_permission}", False))
 
-        return getattr(permission_qs, f"can_{required_permission}", False)
+        return context.has_module_permission(required_module, required_permission)
 
 
 #! check the staff and customer
@@ -137,22 +203,18 @@ def get_user_context(request, company_id):
     """
     Returns a tuple: (customer, company, error Response or None)
     """
-    customer = Customer.objects.filter(user=request.user).first()
-    staff = None
-    company = None
+    context = resolve_auth_context(request, company_id)
 
-    if customer:
+    if context.customer:
         # Company is linked to Customer via the 'owner' relation
-        company = Company.objects.filter(id=company_id, owner=customer).first()
-        if not company:
-            return customer, None, Response({"detail": "Invalid company for this customer."}, status=403)
-    else:
-        staff = StaffProfile.objects.filter(user=request.user, company_id=company_id, is_active=True).first()
-        if not staff:
-            return None, None, Response({"detail": "Unauthorized staff."}, status=403)
-        company = staff.company
-
-    return customer or staff, company, None
+        if not context.owned_company:
+            return context.customer, None, Response({"detail": "Invalid company for this customer."}, status=403)
+        return context.customer, context.owned_company, None
+
+    if not context.staff:
+        return None, None, Response({"detail": "Unauthorized staff."}, status=403)
+
+    return context.staff, context.staff.company, None
 
 
 
@@ -0,0 +1,108 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ModulePermission
+
+
+# One bit per ModulePermission flag; required_permission "edit" -> can_edit -> EDIT bit
+PERMISSION_BITS = {
+    "view": 1,
+    "create": 2,
+    "edit": 4,
+    "delete": 8,
+    "view_specific": 16,
+    "get_using_post": 32,
+}
+
+VERSION_KEY = "perm_matrix_version:{company_id}"
+MATRIX_KEY = "perm_matrix:{company_id}:{version}"
+MATRIX_TIMEOUT = 60 * 60 * 24
+
+# company_id -> (version, {role_id: {module: bitmask}})
+_local_matrices = {}
+
+
+def permission_mask(permission_row):
+    """Packs the can_* flags of a ModulePermission (row or values dict) into a bitmask."""
+    mask = 0
+    for name, bit in PERMISSION_BITS.items():
+        value = permission_row[f"can_{name}"] if isinstance(permission_row, dict) else getattr(permission_row, f"can_{name}")
+        if value:
+            mask |= bit
+    return mask
+
+
+def compile_permission_matrix(company_id):
+    """Builds {role_id: {module (lowercase): bitmask}} for every active role of a company in one query."""
+    rows = ModulePermission.objects.filter(
+        company_id=company_id, job_role__deleted=False
+    ).values("job_role_id", "required_module", *[f"can_{name}" for name in PERMISSION_BITS])
+
+    matrix = {}
+    for row in rows:
+        modules = matrix.setdefault(row["job_role_id"], {})
+        modules.setdefault(row["required_module"].lower(), permission_mask(row))
+    return matrix
+
+
+def _new_version():
+    # Time based, so a version line restarted after eviction never matches an older one
+    return int(time.time() * 1000)
+
+
+def get_permission_version(company_id):
+    return cache.get_or_set(VERSION_KEY.format(company_id=company_id), _new_version, timeout=None)
+
+
+def get_permission_matrix(company_id):
+    """
+    Returns the compiled matrix of a company.
+    Served from process memory while the shared version is unchanged,
+    then from the shared cache, and only compiled from the DB on a miss.
+    """
+    company_id = int(company_id)
+    version = get_permission_version(company_id)
+
+    local = _local_matrices.get(company_id)
+    if local and local[0] == version:
+        return local[1]
+
+    matrix_key = MATRIX_KEY.format(company_id=company_id, version=version)
+    matrix = cache.get(matrix_key)
+    if matrix is None:
+        matrix = compile_permission_matrix(company_id)
+        cache.set(matrix_key, matrix, timeout=MATRIX_TIMEOUT)
+
+    _local_matrices[company_id] = (version, matrix)
+    return matrix
+
+
+def role_has_permission(company_id, role_id, required_module, required_permission):
+    bit = PERMISSION_BITS.get(required_permission)
+    if not bit:
+        return False
+    mask = get_permission_matrix(company_id).get(role_id, {}).get(required_module.lower(), 0)
+    return bool(mask & bit)
+
+
+def bump_permission_version(company_id):
+    """
+    Invalidates the compiled matrix of a company everywhere.
+    Runs after the surrounding transaction commits, so no process can cache
+    the old rows under the new version.
+    """
+    def _bump():
+        key = VERSION_KEY.format(company_id=int(company_id))
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Key missing or evicted: start a new version line
+            cache.set(key, _new_version(), timeout=None)
+
+    transaction.on_commit(_bump)
+
+
+def clear_permission_cache():
+    _local_matrices.clear()
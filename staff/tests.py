@@ -1,3 +1,404 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from company.benchmark import SimulatedUser, create_bench_users, percentile, summarize
+from company.dataset import DatasetGenerator
+from companies.models import Company
+from customer.models import Customer
+from invoice.models import Invoice, InvoiceItem, InvoiceType
+from invoice.views import InvoiceDetailView
+from parties.models import Party
+from parties.views import PartyUpdateView
+from payments.models import PaymentIn
+from staff.models import Module, ModulePermission, Role, StaffProfile
+from staff.permission import get_company_from_instance
+from staff.permission_cache import (
+    clear_permission_cache,
+    compile_permission_matrix,
+    get_permission_matrix,
+    role_has_permission,
+)
+from staff.tokens import bump_user_auth_version
+from staff.views import RetrieveModuleView
+
+
+class AuthContextQueryCountTests(TestCase):
+    """The auth context is resolved once per request, whatever the number of permission checks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner_user = User.objects.create_user(username="owner", password="pass1234")
+        cls.customer = Customer.objects.create(user=cls.owner_user, phone="9999999999")
+        cls.company = Company.objects.create(
+            user=cls.owner_user,
+            owner=cls.customer,
+            name="Acme",
+            address="Somewhere",
+            phone="9000000001",
+            gst_number="GST-ACME",
+        )
+
+        cls.role = Role.objects.create(company=cls.company, name="Sales")
+        ModulePermission.objects.create(
+            job_role=cls.role,
+            company=cls.company,
+            required_module="Party",
+            can_view=True,
+            can_get_using_post=True,
+        )
+
+        cls.staff_user = User.objects.create_user(username="clerk", password="pass1234")
+        StaffProfile.objects.create(
+            user=cls.staff_user,
+            company=cls.company,
+            job_role=cls.role,
+            username="clerk",
+            email="clerk@example.com",
+            password="unused",
+        )
+
+    def setUp(self):
+        cache.clear()
+        clear_permission_cache()
+        self.client = APIClient()
+
+    def test_owner_party_list_query_count(self):
+        self.client.force_authenticate(self.owner_user)
+        # customer + owned company + catalog version (ETag) + party list
+        with self.assertNumQueries(4):
+            response = self.client.post("/parties/", {"company": self.company.id}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_staff_party_list_query_count(self):
+        self.client.force_authenticate(self.staff_user)
+        # customer + staff profile (with role and company) + permission matrix compile + catalog version + party list
+        with self.assertNumQueries(5):
+            response = self.client.post("/parties/", {"company": self.company.id}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        # Warm matrix: the permission check is a dictionary lookup
+        with self.assertNumQueries(4):
+            response = self.client.post("/parties/", {"company": self.company.id}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_staff_without_module_permission_is_denied(self):
+        self.client.force_authenticate(self.staff_user)
+        response = self.client.post("/items/", {"company": self.company.id}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_unassigned_user_is_denied(self):
+        outsider = User.objects.create_user(username="outsider", password="pass1234")
+        self.client.force_authenticate(outsider)
+        response = self.client.post("/parties/", {"company": self.company.id}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+
+class PermissionMatrixTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner_user = User.objects.create_user(username="owner", password="pass1234")
+        cls.customer = Customer.objects.create(user=cls.owner_user, phone="9999999999")
+        cls.company = Company.objects.create(
+            user=cls.owner_user,
+            owner=cls.customer,
+            name="Acme",
+            address="Somewhere",
+            phone="9000000001",
+            gst_number="GST-ACME",
+        )
+        cls.role = Role.objects.create(company=cls.company, name="Sales")
+        ModulePermission.objects.create(
+            job_role=cls.role,
+            company=cls.company,
+            required_module="Invoice",
+            can_view=True,
+            can_create=True,
+        )
+        Module.objects.create(name="Invoice")
+
+    def setUp(self):
+        cache.clear()
+        clear_permission_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner_user)
+
+    def test_compiled_bitmask(self):
+        matrix = compile_permission_matrix(self.company.id)
+        self.assertEqual(matrix, {self.role.id: {"invoice": 1 | 2}})
+
+    def test_lookup_is_case_insensitive_and_cached(self):
+        get_permission_matrix(self.company.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(role_has_permission(self.company.id, self.role.id, "INVOICE", "create"))
+            self.assertFalse(role_has_permission(self.company.id, self.role.id, "Invoice", "delete"))
+            self.assertFalse(role_has_permission(self.company.id, self.role.id, "Party", "view"))
+            self.assertFalse(role_has_permission(self.company.id, self.role.id, "Invoice", "update"))
+
+    def test_update_role_bumps_version(self):
+        self.assertFalse(role_has_permission(self.company.id, self.role.id, "Invoice", "delete"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f"/staff/update-role/{self.role.id}/", {
+                "name": "Sales",
+                "company_id": self.company.id,
+                "module_permissions": [{"required_module": "Invoice", "can_view": True, "can_delete": True}],
+            }, format="json")
+        self.assertEqual(response.data["status"], 200)
+
+        self.assertTrue(role_has_permission(self.company.id, self.role.id, "Invoice", "delete"))
+        self.assertFalse(role_has_permission(self.company.id, self.role.id, "Invoice", "create"))
+
+    def test_soft_deleted_role_loses_permissions(self):
+        self.assertTrue(role_has_permission(self.company.id, self.role.id, "Invoice", "view"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/staff/roles/{self.role.id}/delete/", HTTP_COMPANY=str(self.company.id))
+
+        self.assertFalse(role_has_permission(self.company.id, self.role.id, "Invoice", "view"))
+
+
+@override_settings(JWT_PERMISSION_CLAIMS=True)
+class TokenPermissionClaimsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner_user = User.objects.create_user(username="owner", password="pass1234")
+        cls.customer = Customer.objects.create(user=cls.owner_user, phone="9999999999")
+        cls.company = Company.objects.create(
+            user=cls.owner_user,
+            owner=cls.customer,
+            name="Acme",
+            address="Somewhere",
+            phone="9000000001",
+            gst_number="GST-ACME",
+        )
+        cls.role = Role.objects.create(company=cls.company, name="Sales")
+        ModulePermission.objects.create(
+            job_role=cls.role,
+            company=cls.company,
+            required_module="Party",
+            can_get_using_post=True,
+        )
+        Module.objects.create(name="Party")
+        cls.staff_user = User.objects.create_user(username="clerk", password="pass1234")
+        StaffProfile.objects.create(
+            user=cls.staff_user,
+            company=cls.company,
+            job_role=cls.role,
+            username="clerk",
+            email="clerk@example.com",
+            password="unused",
+        )
+
+    def setUp(self):
+        cache.clear()
+        clear_permission_cache()
+        self.client = APIClient()
+
+    def login(self, username):
+        response = self.client.post("/api/token/", {"username": username, "password": "pass1234"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def list_parties(self, company_id=None):
+        return self.client.post("/parties/", {"company": company_id or self.company.id}, format="json")
+
+    def test_owner_checks_skip_the_database(self):
+        self.login("owner")
+        # token user + get_user_context (customer + company) + catalog version + party list
+        with self.assertNumQueries(5):
+            self.assertEqual(self.list_parties().status_code, 200)
+
+    def test_staff_checks_skip_the_database(self):
+        self.login("clerk")
+        # token user + get_user_context (customer + staff) + catalog version + party list
+        with self.assertNumQueries(5):
+            self.assertEqual(self.list_parties().status_code, 200)
+
+    def test_non_member_is_denied_from_claims(self):
+        self.login("clerk")
+        # token user only
+        with self.assertNumQueries(1):
+            self.assertEqual(self.list_parties(company_id=self.company.id + 1).status_code, 403)
+
+    def test_role_change_revokes_claims(self):
+        self.login("clerk")
+        self.client_owner = APIClient()
+        self.client_owner.force_authenticate(self.owner_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_owner.put(f"/staff/update-role/{self.role.id}/", {
+                "name": "Sales",
+                "company_id": self.company.id,
+                "module_permissions": [{"required_module": "Party", "can_view": True}],
+            }, format="json")
+
+        self.assertEqual(self.list_parties().status_code, 403)
+
+    def test_user_version_bump_falls_back_to_database(self):
+        self.login("clerk")
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_user_auth_version(self.staff_user.id)
+
+        # token user + customer + staff lookup
+        with self.assertNumQueries(3):
+            self.assertEqual(self.list_parties(company_id=self.company.id + 1).status_code, 403)
+
+    def test_refresh_issues_fresh_claims(self):
+        tokens = self.login("clerk")
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_user_auth_version(self.staff_user.id)
+
+        response = self.client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        # token user only, the claims are current again
+        with self.assertNumQueries(1):
+            self.assertEqual(self.list_parties(company_id=self.company.id + 1).status_code, 403)
+
+
+class CompanyLookupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner_user = User.objects.create_user(username="owner", password="pass1234")
+        cls.customer = Customer.objects.create(user=cls.owner_user, phone="9999999999")
+        cls.company = Company.objects.create(
+            user=cls.owner_user,
+            owner=cls.customer,
+            name="Acme",
+            address="Somewhere",
+            phone="9000000001",
+            gst_number="GST-ACME",
+        )
+        cls.party = party = Party.objects.create(name="Buyer", company=cls.company)
+        invoice_type = InvoiceType.objects.get(code="sales")
+        cls.invoice = Invoice.objects.create(
+            company=cls.company,
+            party=party,
+            created_by=cls.owner_user,
+            invoice_number="INV-1",
+            invoice_type=invoice_type,
+        )
+
+    def setUp(self):
+        cache.clear()
+        clear_permission_cache()
+
+    def make_view(self, view_class, pk):
+        view = view_class()
+        view.kwargs = {"pk": pk}
+        return view
+
+    def test_resolves_company_id_once_per_request(self):
+        view = self.make_view(InvoiceDetailView, self.invoice.id)
+        request = APIRequestFactory().get("/")
+        with self.assertNumQueries(1):
+            self.assertEqual(get_company_from_instance(view, request), self.company.id)
+            self.assertEqual(get_company_from_instance(view, request), self.company.id)
+
+    def test_view_without_lookup_does_not_query(self):
+        view = self.make_view(RetrieveModuleView, self.invoice.id)
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_company_from_instance(view, APIRequestFactory().get("/")))
+
+    def test_soft_deleted_party_resolves_to_no_company(self):
+        view = self.make_view(PartyUpdateView, self.party.id)
+        self.assertEqual(get_company_from_instance(view, APIRequestFactory().get("/")), self.company.id)
+        Party.objects.filter(pk=self.party.id).update(deleted=True)
+        self.assertIsNone(get_company_from_instance(view, APIRequestFactory().get("/")))
+
+    def test_invoice_detail_without_company_header(self):
+        client = APIClient()
+        client.force_authenticate(self.owner_user)
+        response = client.get(f"/invoice/{self.invoice.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["company_id"], self.company.id)
+
+
+class BenchmarkHarnessTests(TestCase):
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_summarize_groups_by_endpoint(self):
+        samples = [("invoice_list", 0.010, False), ("invoice_list", 0.030, True), ("dashboard", 0.020, False)]
+        result = summarize(samples, duration=2.0)
+        self.assertEqual(result["endpoints"]["invoice_list"]["requests"], 2)
+        self.assertEqual(result["endpoints"]["invoice_list"]["errors"], 1)
+        self.assertEqual(result["endpoints"]["invoice_list"]["p95_ms"], 30.0)
+        self.assertEqual(result["total"]["rps"], 1.5)
+
+    def test_scenario_runs_without_errors(self):
+        cache.clear()
+        clear_permission_cache()
+        account = create_bench_users(1, tag="t")[0]
+        samples = SimulatedUser(account).run(iterations=1)
+
+        endpoints = {endpoint for endpoint, _, _ in samples}
+        self.assertEqual(endpoints, {
+            "token_login", "invoice_create", "invoice_list", "invoice_detail",
+            "invoice_pdf", "payment_in", "payments_list", "dashboard",
+        })
+        self.assertEqual([s for s in samples if s[2]], [])
+
+
+class DatasetGeneratorTests(TestCase):
+
+    def generate(self, tag, batch_size, **options):
+        counts = DatasetGenerator(seed=7, tag=tag, batch_size=batch_size, **options).generate(
+            companies=3, parties=4, items=5, invoices=12, lines=2, companies_per_batch=2, transfers=2,
+        )
+        invoices = Invoice.objects.filter(company__gst_number__startswith=f"GST-{tag}-").order_by("company_id", "id")
+        return counts, [(i.invoice_number, i.total, i.amount_paid, i.created_at) for i in invoices]
+
+    def test_counts_and_consistency(self):
+        counts, _ = self.generate("a", batch_size=5)
+        self.assertEqual(counts["Company"], 3)
+        self.assertEqual(counts["Invoice"], 36)
+        self.assertEqual(counts["InvoiceItem"], InvoiceItem.objects.count())
+        self.assertEqual(counts["PaymentIn"] + counts["PaymentOut"], Invoice.objects.filter(amount_paid__gt=0).count())
+
+        for invoice in Invoice.objects.prefetch_related("items"):
+            self.assertAlmostEqual(sum(line.amount for line in invoice.items.all()), invoice.total, places=1)
+
+    def test_same_seed_same_data_whatever_the_batch_size(self):
+        _, first = self.generate("a", batch_size=5)
+        _, second = self.generate("b", batch_size=1000)
+        self.assertEqual(first, second)
+
+    def test_dates_are_anchored_on_the_end_date_not_today(self):
+        _, rows = self.generate("a", batch_size=5, end_date=date(2024, 6, 30))
+        days = {timezone.localdate(created_at) for *_, created_at in rows}
+        self.assertLessEqual(max(days), date(2024, 6, 30))
+        self.assertGreater(min(days), date(2024, 6, 30) - timedelta(days=365))
+
+    def test_backdated_dates_and_payment_statuses(self):
+        self.generate("a", batch_size=5)
+        today = timezone.localdate()
+        self.assertTrue(Invoice.objects.filter(created_at__date__lt=today).exists())
+        self.assertTrue(PaymentIn.objects.filter(payment_date__lt=today).exists())
+        # Nothing global was switched off along the way
+        self.assertTrue(Invoice._meta.get_field("created_at").auto_now_add)
+
+        for invoice in Invoice.objects.select_related("payment_status"):
+            expected = "Unpaid" if invoice.amount_paid == 0 else "Paid" if invoice.amount_paid >= invoice.total else "Partially Paid"
+            self.assertEqual(invoice.payment_status.label, expected)
+
+    def test_command_rejects_empty_catalogs(self):
+        for option in ("parties", "items"):
+            with self.assertRaisesMessage(CommandError, f"--{option} must be at least 1"):
+                call_command("generate_dataset", **{option: 0}, stdout=StringIO())
@@ -0,0 +1,127 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from companies.models import Company
+from .models import StaffProfile
+from .permission_cache import get_permission_matrix, get_permission_version
+
+
+#! signed permission claims (optional, see JWT_PERMISSION_CLAIMS)
+COMPANIES_CLAIM = "companies"
+USER_VERSION_CLAIM = "auth_ver"
+USER_VERSION_KEY = "auth_version:{user_id}"
+
+
+def permission_claims_enabled():
+    return getattr(settings, "JWT_PERMISSION_CLAIMS", False)
+
+
+def get_user_auth_version(user_id):
+    return cache.get_or_set(USER_VERSION_KEY.format(user_id=user_id), lambda: int(time.time() * 1000), timeout=None)
+
+
+def bump_user_auth_version(user_id):
+    """Revokes the permission claims of every token issued to this user so far."""
+    def _bump():
+        key = USER_VERSION_KEY.format(user_id=user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), timeout=None)
+
+    transaction.on_commit(_bump)
+
+
+def build_permission_claims(user):
+    """
+    Returns the claims describing the user's memberships:
+    {"companies": {"<company_id>": {"o": 1} for owners,
+                   "<company_id>": {"r": role_id, "v": matrix version, "p": {module: bitmask}} for staff},
+     "auth_ver": user version}
+    """
+    user_version = get_user_auth_version(user.id)
+    companies = {}
+
+    owned = Company.objects.filter(owner__user=user, is_active=True).values_list("id", flat=True)
+    for company_id in owned:
+        companies[str(company_id)] = {"o": 1}
+
+    staff_rows = StaffProfile.objects.filter(user=user, is_active=True).values_list("company_id", "job_role_id")
+    for company_id, role_id in staff_rows:
+        if str(company_id) in companies:
+            continue
+        # Read the version first: a bump in between only makes the claim look stale
+        version = get_permission_version(company_id)
+        matrix = get_permission_matrix(company_id)
+        companies[str(company_id)] = {"r": role_id, "v": version, "p": matrix.get(role_id, {})}
+
+    return {COMPANIES_CLAIM: companies, USER_VERSION_CLAIM: user_version}
+
+
+def access_token_with_claims(access_token, user=None):
+    """
+    Returns the encoded access token, with permission claims when the mode is enabled.
+    The user is looked up from the token when not given.
+    """
+    if not permission_claims_enabled():
+        return str(access_token)
+
+    if not isinstance(access_token, AccessToken):
+        access_token = AccessToken(access_token)
+    if user is None:
+        user = User.objects.get(**{api_settings.USER_ID_FIELD: access_token[api_settings.USER_ID_CLAIM]})
+
+    for claim, value in build_permission_claims(user).items():
+        access_token[claim] = value
+    return str(access_token)
+
+
+def get_token_company_claims(request, company_id):
+    """
+    Returns the claims entry of company_id from the request's access token:
+    the entry dict, {} when the token says the user has no access,
+    or None when the claims are missing or revoked and the DB must decide.
+    """
+    if not permission_claims_enabled():
+        return None
+
+    token = getattr(request, "auth", None)
+    if token is None or not hasattr(token, "get"):
+        return None
+
+    companies = token.get(COMPANIES_CLAIM)
+    if companies is None:
+        return None
+
+    if token.get(USER_VERSION_CLAIM) != get_user_auth_version(request.user.id):
+        return None
+
+    entry = companies.get(str(company_id))
+    if entry is None:
+        return {}
+
+    if "r" in entry and entry.get("v") != get_permission_version(company_id):
+        return None
+
+    return entry
+
+
+class PermissionClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        data["access"] = access_token_with_claims(data["access"], self.user)
+        return data
+
+
+class PermissionClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        data["access"] = access_token_with_claims(data["access"])
+        return data
@@ -10,6 +10,9 @@ from companies.models import Company
 from django.db import transaction
 from .serializer import *
 from .permission import *
+from .permission_cache import bump_permission_version
+from .tokens import bump_user_auth_version
+from company.pagination import KeysetPaginator
 from django.contrib.auth.models import User
 from rest_framework.viewsets import ModelViewSet
 
@@ -62,6 +65,7 @@ class CreateStaffView(APIView):
             password=make_password(password),  
             is_active=True
         )
+        bump_user_auth_version(user.id)
 
         serializer = StaffProfileSerializer(staff)
         return Response({
@@ -124,6 +128,7 @@ class UpdateStaffView(APIView):
         if password:
             user.set_password(password)
         user.save()
+        bump_user_auth_version(user.id)
 
         return Response({"detail": "Staff updated successfully."})
 
@@ -152,31 +157,35 @@ class CreateStaffRoleView(APIView):
         except Company.DoesNotExist:
             return Response({"msg": "Company not found", "status": 500})
 
-        # Create role
-        role = Role.objects.create(name=name, description=description, company=company)
+        with transaction.atomic():
+            # Recompile the permission matrix once the role and its permissions are committed
+            bump_permission_version(company.id)
 
-        for perm in module_permissions_data:
-            required_module_name = perm.get("required_module")
-            if not required_module_name:
-                return Response({"msg": "Module name is required in permissions", "status": 500})
+            # Create role
+            role = Role.objects.create(name=name, description=description, company=company)
 
-            try:
-                module = Module.objects.get(name=required_module_name)
-            except Module.DoesNotExist:
-                return Response({"msg": f"Module '{required_module_name}' does not exist", "status": 500})
-
-            ModulePermission.objects.create(
-                job_role=role,
-                company=company,
-                # module=module,
-                required_module=module.name,
-                can_view=perm.get("can_view", False),
-                can_create=perm.get("can_create", False),
-                can_edit=perm.get("can_edit", False),
-                can_delete=perm.get("can_delete", False),
-                can_view_specific=perm.get("can_view_specific", False),
-                can_get_using_post=perm.get("can_get_using_post", False),
-            )
+            for perm in module_permissions_data:
+                required_module_name = perm.get("required_module")
+                if not required_module_name:
+                    return Response({"msg": "Module name is required in permissions", "status": 500})
+
+                try:
+                    module = Module.objects.get(name=required_module_name)
+                except Module.DoesNotExist:
+                    return Response({"msg": f"Module '{required_module_name}' does not exist", "status": 500})
+
+                ModulePermission.objects.create(
+                    job_role=role,
+                    company=company,
+                    # module=module,
+                    required_module=module.name,
+                    can_view=perm.get("can_view", False),
+                    can_create=perm.get("can_create", False),
+                    can_edit=perm.get("can_edit", False),
+                    can_delete=perm.get("can_delete", False),
+                    can_view_specific=perm.get("can_view_specific", False),
+                    can_get_using_post=perm.get("can_get_using_post", False),
+                )
 
         return Response({
             "msg": "Role with permissions created successfully",
@@ -204,12 +213,14 @@ class ListStaffRolesView(APIView):
                 "status": 500
             })
 
-        roles = Role.objects.filter(company_id=company_id, deleted=False)
+        paginator = KeysetPaginator(request)
+        roles = paginator.paginate(Role.objects.filter(company_id=company_id, deleted=False), ("id",))
         serializer = StaffRoleSerializer(roles, many=True)
         return Response({
             "msg": "Roles fetched successfully",
             "data": serializer.data,
-            "status": 200
+            "status": 200,
+            **paginator.extra(),
         })
     
 class UpdateStaffRoleView(APIView):
@@ -238,6 +249,8 @@ class UpdateStaffRoleView(APIView):
             return Response({"msg": "Company not found", "status": 500})
 
         with transaction.atomic():
+            bump_permission_version(company.id)
+
             role.name = name
             role.description = description
             role.save()
@@ -274,6 +287,7 @@ class SoftDeleteStaffRoleView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Roles"
     required_permission = "delete"
+    company_lookup = (Role, "company_id")
    
 
     def delete(self, request, pk):
@@ -288,6 +302,7 @@ class SoftDeleteStaffRoleView(APIView):
 
         role.deleted = True
         role.save()
+        bump_permission_version(role.company_id)
 
         return Response({
             "msg": f"Role '{role.name}' soft deleted successfully",
@@ -516,12 +531,28 @@ class ModulePermissionViewSet(ModelViewSet):
     permission_classes = [IsAuthenticated, IsCompanyAdminOrAssigned, HasModulePermission]
     required_module = "Permission"
     required_permission = "view"
+    company_lookup = (ModulePermission, "company_id")
 
     def get_queryset(self):
         company_id = self.request.query_params.get('company_id')
         if company_id:
             return self.queryset.filter(company_id=company_id)
         return self.queryset.none()
+
+    def perform_create(self, serializer):
+        permission = serializer.save()
+        bump_permission_version(permission.company_id)
+
+    def perform_update(self, serializer):
+        old_company_id = serializer.instance.company_id
+        permission = serializer.save()
+        bump_permission_version(permission.company_id)
+        if old_company_id != permission.company_id:
+            bump_permission_version(old_company_id)
+
+    def perform_destroy(self, instance):
+        bump_permission_version(instance.company_id)
+        instance.delete()
     
 #! module
 class CreateModuleView(APIView):